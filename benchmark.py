@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the Werewolf game orchestration.
+
+Measures the hot paths that do not depend on the provider (next_node,
+god, prompt rendering, a single compiled-graph step) and whole-game throughput
+against the offline fake model, so orchestration slowdowns show up
+before they ship.
+
+Usage:
+    python benchmark.py run                 # run and print the results
+    python benchmark.py run --save-baseline # also store them as the baseline
+    python benchmark.py compare             # run and compare with the baseline
+"""
+
+import argparse
+import copy
+import json
+import sys
+import time
+
+from langchain_core.callbacks import UsageMetadataCallbackHandler
+from langgraph.errors import GraphRecursionError
+
+from game.events import EventBus
+from game.fake_llm import FakeWerewolfLLM
+from game.game_logic import god, next_node
+from game.graph import create_game_graph
+from game.prompts import SPEECH_PROMPT, VOTE_PROMPT, player_inputs
+from game.simulate import create_initial_state
+
+
+BASELINE_FILE = "benchmark_baseline.json"
+
+# Metrics where a lower value is better; all others are rates
+LOWER_IS_BETTER = {"tokens_per_game"}
+
+
+def _mid_game_state():
+    """A state in the middle of the second round."""
+    history = []
+    for _ in range(2):
+        history.append("God: Dear players, there are 2 wolves and 3 villagers are alive and playing in the game.")
+        for player in (1, 2, 3, 5, 6):
+            history.append(f"player {player}: I'm a villeger. Player {player % 6 + 1} has been too quiet, that makes me nervous.")
+    return {
+        "turn": 3,
+        "current_iter": 0,
+        "max_iter": 3,
+        "history": history,
+        "alive_players": [1, 2, 3, 5, 6],
+        "dead_players": [4],
+        "voted_to_leave": [3, 6, 3],
+    }
+
+
+def _round_end_state():
+    """A state where god has to count the votes of a round."""
+    state = _mid_game_state()
+    state["turn"] = 6
+    state["voted_to_leave"] = [3, 6, 3, 5, 3]
+    return state
+
+
+def _rate(fn, min_time=0.3, repeats=3, setup=None):
+    """
+    Return the best calls/sec of fn over a few timed runs.
+
+    Each run calls fn for at least min_time seconds; taking the best run
+    keeps scheduler noise out of the comparison. With a setup function,
+    fn is called with a fresh setup() result each time, built outside
+    the timer (e.g. a copy of a state fn changes).
+    """
+    best = 0.0
+    for _ in range(repeats):
+        calls = 0
+        elapsed = 0.0
+        while elapsed < min_time:
+            if setup is None:
+                start = time.perf_counter()
+                for _ in range(100):
+                    fn()
+            else:
+                batch = [setup() for _ in range(100)]
+                start = time.perf_counter()
+                for arg in batch:
+                    fn(arg)
+            elapsed += time.perf_counter() - start
+            calls += 100
+        best = max(best, calls / elapsed)
+    return best
+
+
+def bench_next_node():
+    state = _mid_game_state()
+    events = EventBus()
+    return _rate(lambda: next_node(state, events=events))
+
+
+def bench_god():
+    template = _round_end_state()
+    events = EventBus()
+    return _rate(lambda state: god(state, events=events), setup=lambda: copy.deepcopy(template))
+
+
+def bench_prompt_render():
+    state = _mid_game_state()
+
+    def render():
+        inputs = player_inputs(state, 3, "\n".join(state["history"]))
+        SPEECH_PROMPT.format_messages(**inputs)
+        VOTE_PROMPT.format_messages(**inputs)
+
+    return _rate(render)
+
+
+def bench_graph_step():
+    """Run the first step (god) of a compiled graph, without the model."""
+    template = _round_end_state()
+    app = create_game_graph(FakeWerewolfLLM(), events=EventBus())
+
+    def step(state):
+        for _ in app.stream(state, stream_mode="updates"):
+            break
+
+    return _rate(step, setup=lambda: copy.deepcopy(template))
+
+
+def bench_games(n_games=20, seed=0, recursion_limit=300):
+    """Play offline games and return (games/sec, steps/sec, tokens/game)."""
+    steps = 0
+    usage = UsageMetadataCallbackHandler()
+    start = time.perf_counter()
+    for i in range(n_games):
+        app = create_game_graph(FakeWerewolfLLM(seed=seed + i), events=EventBus())
+        config = {"recursion_limit": recursion_limit, "callbacks": [usage]}
+        try:
+            for _ in app.stream(create_initial_state(), config=config, stream_mode="updates"):
+                steps += 1
+        except GraphRecursionError:
+            pass
+    elapsed = time.perf_counter() - start
+
+    tokens = sum(u.get("total_tokens", 0) for u in usage.usage_metadata.values())
+    return n_games / elapsed, steps / elapsed, tokens / n_games
+
+
+def run_benchmarks(n_games=20):
+    """Run every benchmark and return the results."""
+    games_per_sec, steps_per_sec, tokens_per_game = bench_games(n_games)
+    return {
+        "next_node_per_sec": round(bench_next_node(), 1),
+        "god_per_sec": round(bench_god(), 1),
+        "prompt_renders_per_sec": round(bench_prompt_render(), 1),
+        "graph_steps_per_sec": round(bench_graph_step(), 1),
+        "games_per_sec": round(games_per_sec, 3),
+        "steps_per_sec": round(steps_per_sec, 1),
+        "tokens_per_game": round(tokens_per_game, 1),
+    }
+
+
+def compare(results, baseline, threshold):
+    """
+    Compare results with a baseline.
+
+    Args:
+        results: Current benchmark results
+        baseline: Baseline benchmark results
+        threshold: Allowed relative slowdown, e.g. 0.15 for 15%
+
+    Returns:
+        List of (metric, baseline, current, change, regressed) rows
+    """
+    rows = []
+    for metric, base in baseline.items():
+        if metric not in results or not base:
+            continue
+        current = results[metric]
+        change = (current - base) / base
+        if metric in LOWER_IS_BETTER:
+            regressed = change > threshold
+        else:
+            regressed = change < -threshold
+        rows.append((metric, base, current, change, regressed))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Werewolf game orchestration.")
+    parser.add_argument("command", choices=["run", "compare"])
+    parser.add_argument("--games", type=int, default=20, help="offline games to play (default: 20)")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help=f"baseline file (default: {BASELINE_FILE})")
+    parser.add_argument("--save-baseline", action="store_true", help="store the results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.15,
+                        help="relative change that counts as a regression (default: 0.15)")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.games)
+
+    if args.command == "run":
+        for metric, value in results.items():
+            print(f"{metric:<24} {value:>14,.1f}")
+        if args.save_baseline:
+            with open(args.baseline, "w", encoding="utf-8") as fh:
+                json.dump(results, fh, indent=2)
+                fh.write("\n")
+            print(f"📄 Baseline written to {args.baseline}")
+        return 0
+
+    with open(args.baseline, "r", encoding="utf-8") as fh:
+        baseline = json.load(fh)
+
+    rows = compare(results, baseline, args.threshold)
+    for metric, base, current, change, regressed in rows:
+        flag = "❌ REGRESSION" if regressed else "✅"
+        print(f"{metric:<24} {base:>14,.1f} -> {current:>14,.1f} ({change:+.1%}) {flag}")
+
+    if any(row[-1] for row in rows):
+        print(f"\n❌ Regressions beyond {args.threshold:.0%} found.")
+        return 1
+    print(f"\n✅ No regressions beyond {args.threshold:.0%}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
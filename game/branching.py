@@ -0,0 +1,168 @@
+"""
+What-if branches of a game.
+
+A game can be forked at a round, from a saved checkpoint or from any
+state, and played on from there by several branches at once, each with
+its own model, prompts (through the graph settings) or vote threshold.
+
+Branches do not copy the transcript. fork_state gives each branch a
+SharedHistory (see game.updates): a read-only view of the history up to
+the fork point, shared by every branch, plus a list holding only that
+branch's own entries. The other lists of the state are small and are
+copied.
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+from langgraph.errors import GraphRecursionError
+
+from .events import EventBus
+from .game_logic import game_winner
+from .graph import create_game_graph, default_recursion_limit
+from .state import roles_of
+from .updates import SharedHistory, overlay
+
+
+def fork_state(state, **overrides):
+    """
+    Fork a game state into an independent branch.
+
+    Args:
+        state: State to fork; it is not changed, and may keep being played
+        **overrides: State keys to set in the branch (e.g. vote_threshold)
+
+    Returns:
+        New state sharing the transcript so far with ``state``; its
+        other lists, including the history summary a HistoryContext
+        trims in place, are copies
+    """
+    forked = overlay(state)
+    if state.get("roles"):
+        forked["roles"] = dict(state["roles"])
+    forked.update(overrides)
+    return forked
+
+
+def state_at_round(checkpointer, game_id, round=None):
+    """
+    Return a saved game's state at the start of a round.
+
+    Args:
+        checkpointer: SQLiteCheckpointer the game was saved to
+        game_id: Saved game
+        round: Round to fork at, right after god opened it and before
+            anyone spoke; None for the latest saved state
+
+    Returns:
+        The state, or None if the game or round was not saved
+    """
+    if round is None:
+        return checkpointer.latest_state(game_id)
+    for saved in checkpointer.list({"configurable": {"thread_id": game_id}}):
+        values = saved.checkpoint["channel_values"]
+        if values.get("current_iter") == round and values.get("turn") == 0:
+            return dict(values)
+    return None
+
+
+@dataclass
+class Branch:
+    """One way to play a game on from its fork point."""
+    name: str
+    llm: Any
+    # Fraction of the alive players that must vote for the same player
+    # to eliminate them; None keeps the game's threshold
+    vote_threshold: Optional[float] = None
+    # Extra create_game_graph arguments (e.g. vote_mode, single_call,
+    # context)
+    settings: Dict[str, Any] = field(default_factory=dict)
+
+
+def run_branch(state, branch, recursion_limit=None):
+    """
+    Play one branch of a game to its end.
+
+    Args:
+        state: Fork point; it is forked, not changed
+        branch: Branch to play
+        recursion_limit: Recursion limit of the branch's graph; by
+            default what the game's role table needs
+
+    Returns:
+        Dictionary with the branch's outcome and its final state
+    """
+    overrides = {} if branch.vote_threshold is None else {"vote_threshold": branch.vote_threshold}
+    forked = fork_state(state, **overrides)
+    dead_before = len(forked["dead_players"])
+    app = create_game_graph(branch.llm, events=EventBus(), roles=roles_of(state), **branch.settings)
+    recursion_limit = recursion_limit or default_recursion_limit(roles_of(state))
+
+    final = forked
+    error = None
+    start = time.perf_counter()
+    try:
+        for values in app.stream(forked, config={"recursion_limit": recursion_limit}, stream_mode="values"):
+            final = values
+    except GraphRecursionError:
+        error = "recursion_limit"
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+
+    history = final.get("history") or []
+    return {
+        "name": branch.name,
+        "winner": game_winner(final) if error is None else None,
+        "error": error,
+        "rounds": (final.get("current_iter") or 0) - (state.get("current_iter") or 0),
+        "eliminations": list(final["dead_players"][dead_before:]),
+        "new_messages": len(history.suffix) if isinstance(history, SharedHistory) else len(history),
+        "duration": round(time.perf_counter() - start, 4),
+        "state": final,
+    }
+
+
+def run_branches(state, branches, max_workers=None, recursion_limit=None):
+    """
+    Play several branches of a game concurrently.
+
+    Args:
+        state: Fork point shared by every branch
+        branches: Branches to play
+        max_workers: Branches played at once; defaults to all of them
+        recursion_limit: Recursion limit of each branch's graph; by
+            default what the game's role table needs
+
+    Returns:
+        Outcomes in the order of ``branches`` (see run_branch)
+    """
+    branches = list(branches)
+    if not branches:
+        return []
+    with ThreadPoolExecutor(max_workers=max_workers or len(branches), thread_name_prefix="werewolf-branch") as pool:
+        return list(pool.map(lambda branch: run_branch(state, branch, recursion_limit), branches))
+
+
+def compare_branches(results):
+    """
+    Side-by-side summary of branch outcomes.
+
+    Args:
+        results: Outcomes from run_branches
+
+    Returns:
+        Table rows (header first), one per branch
+    """
+    rows = [("branch", "winner", "rounds", "eliminated", "new messages", "seconds")]
+    for r in results:
+        rows.append((
+            r["name"],
+            r["winner"] or r["error"] or "-",
+            str(r["rounds"]),
+            ", ".join(map(str, r["eliminations"])) or "-",
+            str(r["new_messages"]),
+            f"{r['duration']:.2f}",
+        ))
+    return rows
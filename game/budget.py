@@ -0,0 +1,138 @@
+"""
+Per-game budgets: caps on rounds, tokens, dollars and wall time.
+
+A BudgetGovernor watches one game. It is a LangChain callback handler
+that adds up the tokens and cost of the game's model calls; attach it to
+the game's run config with ``governor.attach(config)``. The graph's
+routing (next_node, and next_speaker between two players) checks it
+before every turn, and once a cap is reached the game ends cleanly: the
+out_of_budget node reports a BudgetExhausted event and records
+``"outcome": "budget_exhausted"`` and the usage report in the state.
+
+Caps are checked between turns, so a game can overshoot its token,
+dollar and time caps by at most one turn.
+"""
+
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from .telemetry import DEFAULT_PRICES, _usage
+
+
+@dataclass(frozen=True)
+class Budget:
+    """Caps of one game; None means no cap."""
+    # Rounds the game may open
+    rounds: Optional[int] = None
+    # Prompt plus completion tokens
+    tokens: Optional[int] = None
+    # Estimated spend in dollars
+    dollars: Optional[float] = None
+    # Wall time in seconds
+    seconds: Optional[float] = None
+
+
+class BudgetGovernor(BaseCallbackHandler):
+    """Tracks one game's usage against its Budget."""
+
+    def __init__(self, budget, prices=None):
+        """
+        Args:
+            budget: Budget of the game
+            prices: Dollars per million tokens, as ``{"input": ..., "output": ...}``
+        """
+        self.budget = budget
+        self.prices = dict(DEFAULT_PRICES, **(prices or {}))
+        self.calls = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def on_llm_end(self, response, **kwargs):
+        input_tokens, output_tokens = _usage(response)
+        with self._lock:
+            self.calls += 1
+            self.input_tokens += input_tokens
+            self.output_tokens += output_tokens
+
+    @property
+    def tokens(self):
+        return self.input_tokens + self.output_tokens
+
+    @property
+    def cost(self):
+        """Estimated spend so far in dollars."""
+        return (self.input_tokens * self.prices["input"] + self.output_tokens * self.prices["output"]) / 1_000_000
+
+    @property
+    def seconds(self):
+        return time.perf_counter() - self.started
+
+    def exhausted(self, state):
+        """
+        Return which cap the game has reached, or None.
+
+        Args:
+            state: Current game state
+
+        Returns:
+            "rounds", "tokens", "dollars", "seconds" or None
+        """
+        budget = self.budget
+        if budget.rounds is not None and (state.get("current_iter") or 0) > budget.rounds:
+            return "rounds"
+        if budget.tokens is not None and self.tokens >= budget.tokens:
+            return "tokens"
+        if budget.dollars is not None and self.cost >= budget.dollars:
+            return "dollars"
+        if budget.seconds is not None and self.seconds >= budget.seconds:
+            return "seconds"
+        return None
+
+    def report(self, state=None):
+        """
+        Return the game's usage so far, with its caps.
+
+        Args:
+            state: Current game state, for the rounds played and the cap
+                reached
+        """
+        with self._lock:
+            calls, input_tokens, output_tokens = self.calls, self.input_tokens, self.output_tokens
+        state = state or {}
+        # A round that was opened but where nobody spoke yet is not counted
+        rounds = (state.get("current_iter") or 0) - (state.get("turn") == 0)
+        return {
+            "rounds": max(rounds, 0),
+            "calls": calls,
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "tokens": input_tokens + output_tokens,
+            "cost": round(self.cost, 6),
+            "seconds": round(self.seconds, 3),
+            "limits": asdict(self.budget),
+            "exhausted": self.exhausted(state) if state else None,
+        }
+
+    def attach(self, config=None):
+        """
+        Return a run config that meters the game and lets its routing
+        find this governor.
+
+        Args:
+            config: Run config to extend; not changed
+        """
+        config = dict(config or {})
+        config["callbacks"] = [*(config.get("callbacks") or []), self]
+        config["configurable"] = dict(config.get("configurable") or {}, budget=self)
+        return config
+
+
+def governor_of(config):
+    """Return the BudgetGovernor attached to a run config, or None."""
+    return ((config or {}).get("configurable") or {}).get("budget")
@@ -0,0 +1,166 @@
+"""
+Record/replay cache for LLM calls.
+
+CassetteLLM wraps the chat model passed to create_game_graph or
+StreamlitGameRunner and stores every response in a SQLite file, keyed by
+a hash of the model name, the rendered messages and the call parameters.
+A recorded game can then be replayed offline, with no network access
+and no API spend, at local CPU speed.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+from typing import Any, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from pydantic import PrivateAttr
+
+
+MODES = ("record", "replay", "passthrough")
+
+
+class CassetteMiss(KeyError):
+    """Raised in replay mode when a call was never recorded."""
+
+
+class CassetteLLM(BaseChatModel):
+    """
+    Chat model wrapper that records responses to, and replays them from, disk.
+
+    Modes:
+        record: Serve recorded responses and call the wrapped model for
+            anything not on the cassette yet, storing the result.
+        replay: Serve recorded responses only; a call that was never
+            recorded raises CassetteMiss. No wrapped model is needed.
+        passthrough: Call the wrapped model and leave the cassette alone.
+
+    A prompt that is sent more than once gets one recorded response per
+    occurrence, so a replayed game sees the same responses in the same
+    order as the recorded one. Call rewind() before replaying another
+    game from the same process.
+    """
+
+    llm: Optional[Any] = None
+    path: str = "cassette.sqlite"
+    mode: str = "replay"
+    model_name: Optional[str] = None
+
+    _conn: Any = PrivateAttr(default=None)
+    _lock: Any = PrivateAttr(default_factory=threading.Lock)
+    _occurrences: dict = PrivateAttr(default_factory=dict)
+
+    def model_post_init(self, __context):
+        if self.mode not in MODES:
+            raise ValueError(f"Unknown cassette mode: {self.mode!r}. Use one of {MODES}.")
+        if self.mode != "replay" and self.llm is None:
+            raise ValueError(f"Cassette mode {self.mode!r} needs a wrapped llm.")
+        if self.mode != "passthrough":
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT, occurrence INTEGER, model TEXT, response TEXT, "
+                "PRIMARY KEY (key, occurrence))"
+            )
+            self._conn.commit()
+
+    @property
+    def _llm_type(self):
+        return "cassette"
+
+    def _model(self):
+        """Name of the wrapped model, used as part of the cache key."""
+        if self.model_name:
+            return self.model_name
+        for attr in ("model_name", "model"):
+            value = getattr(self.llm, attr, None)
+            if isinstance(value, str):
+                return value
+        return type(self.llm).__name__
+
+    def cache_key(self, messages, stop=None, **kwargs):
+        """Hash the model name, rendered messages and call parameters."""
+        payload = {
+            "model": self._model(),
+            "messages": [[message.type, message.content] for message in messages],
+            "params": {"stop": stop, **kwargs},
+        }
+        encoded = json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+        return hashlib.sha256(encoded).hexdigest()
+
+    def rewind(self):
+        """Start serving recorded responses from the first occurrence again."""
+        with self._lock:
+            self._occurrences.clear()
+
+    def _next_occurrence(self, key):
+        with self._lock:
+            occurrence = self._occurrences.get(key, 0)
+            self._occurrences[key] = occurrence + 1
+            return occurrence
+
+    def _load(self, key, occurrence):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response FROM responses WHERE key = ? AND occurrence = ?",
+                (key, occurrence),
+            ).fetchone()
+        if row is None:
+            return None
+        data = json.loads(row[0])
+        return AIMessage(
+            content=data["content"],
+            response_metadata=data.get("response_metadata") or {},
+            usage_metadata=data.get("usage_metadata"),
+        )
+
+    def _store(self, key, occurrence, message):
+        data = {
+            "content": message.content,
+            "response_metadata": message.response_metadata,
+            "usage_metadata": message.usage_metadata,
+        }
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                (key, occurrence, self._model(), json.dumps(data, default=str)),
+            )
+            self._conn.commit()
+
+    def _lookup(self, messages, stop, kwargs):
+        """Return (key, occurrence, recorded message or None)."""
+        key = self.cache_key(messages, stop=stop, **kwargs)
+        occurrence = self._next_occurrence(key)
+        message = self._load(key, occurrence)
+        if message is None and self.mode == "replay":
+            raise CassetteMiss(f"No recorded response for call {key[:12]} (occurrence {occurrence}) in {self.path}")
+        return key, occurrence, message
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        if self.mode == "passthrough":
+            message = self.llm.invoke(messages, stop=stop, **kwargs)
+        else:
+            key, occurrence, message = self._lookup(messages, stop, kwargs)
+            if message is None:
+                message = self.llm.invoke(messages, stop=stop, **kwargs)
+                self._store(key, occurrence, message)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        if self.mode == "passthrough":
+            message = await self.llm.ainvoke(messages, stop=stop, **kwargs)
+        else:
+            key, occurrence, message = self._lookup(messages, stop, kwargs)
+            if message is None:
+                message = await self.llm.ainvoke(messages, stop=stop, **kwargs)
+                self._store(key, occurrence, message)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def close(self):
+        """Close the cassette file."""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
@@ -0,0 +1,307 @@
+"""
+Persistent game checkpoints in a local SQLite file.
+
+SQLiteCheckpointer is a LangGraph checkpointer: compile the game graph
+with it (``create_game_graph(..., checkpointer=...)``) and run with a
+``thread_id`` (the game id) in the config, and every completed step is
+saved as a compact snapshot (msgpack, zlib-compressed). After a crash or
+a provider error the game resumes from the last saved step by running
+the graph again with ``None`` as input and the same game id; steps that
+completed are not run again, so no LLM call is repeated.
+
+Saving after every step (``every="node"``) loses nothing. With
+``every="round"`` only round boundaries and finished games are saved,
+which writes less but replays the current round on resume.
+
+The Streamlit runner does not run the graph; it stores its state with
+``save_state`` in the same file, and ``latest_state`` reads either kind.
+``resume_input`` tells what to run the graph with to continue a game
+saved either way.
+"""
+
+import sqlite3
+import threading
+import time
+import zlib
+from datetime import datetime
+
+from langgraph.checkpoint.base import WRITES_IDX_MAP, BaseCheckpointSaver, CheckpointTuple, get_checkpoint_id, \
+    get_checkpoint_metadata
+
+from .core import GameCore
+
+
+# Default checkpoint file of the CLI and the Streamlit app
+DEFAULT_PATH = "werewolf_checkpoints.sqlite"
+
+SAVE_MODES = ("node", "round")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    parent_id TEXT,
+    type TEXT,
+    checkpoint BLOB,
+    metadata_type TEXT,
+    metadata BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    type TEXT,
+    value BLOB,
+    task_path TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+CREATE TABLE IF NOT EXISTS states (
+    game_id TEXT PRIMARY KEY,
+    updated REAL NOT NULL,
+    type TEXT,
+    state BLOB
+);
+"""
+
+
+def _round_boundary(values):
+    """Whether a state is at the start of a round or at the end of the game."""
+    if not values or "alive_players" not in values:
+        return True
+    return values.get("turn") == 0 or GameCore.from_state(values).winner() is not None
+
+
+class SQLiteCheckpointer(BaseCheckpointSaver):
+    """LangGraph checkpointer storing compressed game snapshots in SQLite."""
+
+    def __init__(self, path=DEFAULT_PATH, every="node", level=6, serde=None):
+        """
+        Args:
+            path: SQLite file; ":memory:" keeps the checkpoints in memory
+            every: "node" to save after every step, or "round" to save
+                only at round boundaries and at the end of the game
+            level: zlib compression level
+            serde: Optional serializer; defaults to LangGraph's
+        """
+        if every not in SAVE_MODES:
+            raise ValueError(f"Unknown checkpoint mode: {every!r}. Use one of {list(SAVE_MODES)}.")
+        super().__init__(serde=serde)
+        self.path = path
+        self.every = every
+        self.level = level
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+        # Checkpoints skipped in "round" mode, whose writes are skipped
+        # too, mapped to their last stored ancestor; dropped once the
+        # checkpoint after them is put
+        self._skipped = {}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _dump(self, value):
+        type_, data = self.serde.dumps_typed(value)
+        return type_, zlib.compress(data, self.level)
+
+    def _load(self, type_, data):
+        return self.serde.loads_typed((type_, zlib.decompress(data)))
+
+    def _tuple(self, thread_id, checkpoint_ns, row):
+        checkpoint_id, parent_id, type_, checkpoint, metadata_type, metadata = row
+        with self._lock:
+            writes = self._conn.execute(
+                "SELECT task_id, channel, type, value FROM writes "
+                "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? ORDER BY task_id, idx",
+                (thread_id, checkpoint_ns, checkpoint_id),
+            ).fetchall()
+
+        def config(id_):
+            return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": id_}}
+
+        return CheckpointTuple(
+            config=config(checkpoint_id),
+            checkpoint=self._load(type_, checkpoint),
+            metadata=self._load(metadata_type, metadata),
+            parent_config=config(parent_id) if parent_id else None,
+            pending_writes=[(task_id, channel, self._load(t, v)) for task_id, channel, t, v in writes],
+        )
+
+    def get_tuple(self, config):
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        query = ("SELECT checkpoint_id, parent_id, type, checkpoint, metadata_type, metadata FROM checkpoints "
+                 "WHERE thread_id = ? AND checkpoint_ns = ?")
+        params = [thread_id, checkpoint_ns]
+        if checkpoint_id := get_checkpoint_id(config):
+            query += " AND checkpoint_id = ?"
+            params.append(checkpoint_id)
+        query += " ORDER BY checkpoint_id DESC LIMIT 1"
+        with self._lock:
+            row = self._conn.execute(query, params).fetchone()
+        return self._tuple(thread_id, checkpoint_ns, row) if row else None
+
+    def list(self, config, *, filter=None, before=None, limit=None):
+        query = ("SELECT thread_id, checkpoint_ns, checkpoint_id, parent_id, type, checkpoint, metadata_type, "
+                 "metadata FROM checkpoints WHERE 1 = 1")
+        params = []
+        if config:
+            query += " AND thread_id = ?"
+            params.append(config["configurable"]["thread_id"])
+            if (checkpoint_ns := config["configurable"].get("checkpoint_ns")) is not None:
+                query += " AND checkpoint_ns = ?"
+                params.append(checkpoint_ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                query += " AND checkpoint_id = ?"
+                params.append(checkpoint_id)
+        if before and (before_id := get_checkpoint_id(before)):
+            query += " AND checkpoint_id < ?"
+            params.append(before_id)
+        query += " ORDER BY checkpoint_id DESC"
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+
+        for thread_id, checkpoint_ns, *row in rows:
+            if limit is not None and limit <= 0:
+                break
+            result = self._tuple(thread_id, checkpoint_ns, row)
+            if filter and not all(result.metadata.get(k) == v for k, v in filter.items()):
+                continue
+            if limit is not None:
+                limit -= 1
+            yield result
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        saved = {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns,
+                                  "checkpoint_id": checkpoint["id"]}}
+        parent_id = config["configurable"].get("checkpoint_id")
+        # The step of a skipped parent is done: point at the checkpoint
+        # actually stored before it
+        parent_id = self._skipped.pop(parent_id, parent_id)
+        if self.every == "round" and not _round_boundary(checkpoint.get("channel_values")):
+            self._skipped[checkpoint["id"]] = parent_id
+            return saved
+
+        type_, data = self._dump(checkpoint)
+        metadata_type, metadata_data = self._dump(get_checkpoint_metadata(config, metadata))
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (thread_id, checkpoint_ns, checkpoint["id"], parent_id,
+                 type_, data, metadata_type, metadata_data),
+            )
+        return saved
+
+    def put_writes(self, config, writes, task_id, task_path=""):
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        if checkpoint_id in self._skipped:
+            return
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        rows = []
+        for idx, (channel, value) in enumerate(writes):
+            type_, data = self._dump(value)
+            rows.append((thread_id, checkpoint_ns, checkpoint_id, task_id, WRITES_IDX_MAP.get(channel, idx),
+                         channel, type_, data, task_path))
+        # Special writes (errors, interrupts) replace earlier ones; regular
+        # writes are kept as first written
+        verb = "INSERT OR REPLACE" if all(channel in WRITES_IDX_MAP for channel, _ in writes) else "INSERT OR IGNORE"
+        with self._lock, self._conn:
+            self._conn.executemany(f"{verb} INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def delete_thread(self, thread_id):
+        with self._lock, self._conn:
+            for table, column in (("checkpoints", "thread_id"), ("writes", "thread_id"), ("states", "game_id")):
+                self._conn.execute(f"DELETE FROM {table} WHERE {column} = ?", (thread_id,))
+
+    async def aget_tuple(self, config):
+        return self.get_tuple(config)
+
+    async def alist(self, config, *, filter=None, before=None, limit=None):
+        for item in self.list(config, filter=filter, before=before, limit=limit):
+            yield item
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        return self.put(config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config, writes, task_id, task_path=""):
+        self.put_writes(config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id):
+        self.delete_thread(thread_id)
+
+    def save_state(self, game_id, state):
+        """
+        Save the state of a game played without the graph.
+
+        Respects ``every``: in "round" mode only round boundaries and
+        finished games are saved.
+
+        Returns:
+            Whether the state was saved
+        """
+        if self.every == "round" and not _round_boundary(state):
+            return False
+        type_, data = self._dump(dict(state))
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO states VALUES (?, ?, ?, ?)",
+                               (game_id, time.time(), type_, data))
+        return True
+
+    def _latest(self, game_id):
+        """Return the newest saved state of a game and whether it is a graph checkpoint."""
+        with self._lock:
+            row = self._conn.execute("SELECT updated, type, state FROM states WHERE game_id = ?",
+                                     (game_id,)).fetchone()
+        saved = self.get_tuple({"configurable": {"thread_id": game_id}})
+        if saved and (not row or datetime.fromisoformat(saved.checkpoint["ts"]).timestamp() >= row[0]):
+            return dict(saved.checkpoint["channel_values"]), True
+        if row:
+            return self._load(*row[1:]), False
+        return None, False
+
+    def latest_state(self, game_id):
+        """
+        Return the last saved state of a game, or None.
+
+        Reads whichever is newer of the state saved with ``save_state``
+        and, for games played on the graph, the values of the latest
+        checkpoint.
+        """
+        return self._latest(game_id)[0]
+
+    def resume_input(self, game_id):
+        """
+        Return the input that continues a saved game on the graph.
+
+        A game whose newest save is a graph checkpoint continues from it,
+        with None as input. A game saved with ``save_state`` (e.g. by the
+        Streamlit runner) has no usable checkpoint, so its state is fed
+        back in as the input; older graph checkpoints of the game are
+        dropped first, so the graph does not run it on top of them.
+
+        Returns:
+            None, or the state to pass to the graph
+        """
+        state, checkpointed = self._latest(game_id)
+        if checkpointed or state is None:
+            return None
+        with self._lock, self._conn:
+            for table in ("checkpoints", "writes"):
+                self._conn.execute(f"DELETE FROM {table} WHERE thread_id = ?", (game_id,))
+        return state
+
+    def list_games(self):
+        """Return the ids of the games with saved checkpoints or states."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT thread_id FROM checkpoints UNION SELECT game_id FROM states ORDER BY 1").fetchall()
+        return [row[0] for row in rows]
@@ -0,0 +1,216 @@
+"""
+Token-budgeted conversation history for player prompts.
+
+Sending the whole transcript on every turn makes prompt size grow with
+the length of the game. HistoryContext sends it as it is while it fits
+in a token budget; past that, it keeps the most recent turns verbatim
+and folds older entries into a compact summary that is updated
+incrementally and stored in the game state, so each entry is only
+summarized once.
+"""
+
+import re
+import threading
+
+
+# A player's turn in the history ("player 3: ..."); god announcements and
+# eliminations fall between turns
+_TURN = re.compile(r"player \d+: ")
+
+
+def count_tokens(text):
+    """Roughly estimate the number of tokens in a text (~4 characters per token)."""
+    return (len(text) + 3) // 4
+
+
+def summarize_entry(entry, max_chars=120):
+    """
+    Fold one history entry into a short summary line.
+
+    God announcements and eliminations are kept as they are; player
+    statements are cut down to their first sentence.
+
+    Args:
+        entry: History entry
+        max_chars: Maximum length of a summarized statement
+
+    Returns:
+        Summary line
+    """
+    if entry.startswith("God:") or "leaves the game" in entry:
+        return entry
+
+    speaker, sep, message = entry.partition(": ")
+    if not sep:
+        speaker, message = "", entry
+
+    message = " ".join(message.split())
+    for end in (". ", "! ", "? "):
+        cut = message.find(end)
+        if cut != -1:
+            message = message[:cut + 1]
+            break
+    if len(message) > max_chars:
+        message = message[:max_chars - 3].rstrip() + "..."
+
+    return f"{speaker}: {message}" if speaker else message
+
+
+class TokenCounter:
+    """Counts the history tokens sent to the model against the full transcript."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.prompts = 0
+        self.full_tokens = 0
+        self.sent_tokens = 0
+
+    def record(self, full_tokens, sent_tokens):
+        """Record one rendered history."""
+        with self._lock:
+            self.prompts += 1
+            self.full_tokens += full_tokens
+            self.sent_tokens += sent_tokens
+
+    @property
+    def saved_tokens(self):
+        """Tokens not sent thanks to summarization."""
+        return self.full_tokens - self.sent_tokens
+
+    def report(self):
+        """Return a dictionary summarizing the savings so far."""
+        saved_pct = 100 * self.saved_tokens / self.full_tokens if self.full_tokens else 0.0
+        return {
+            "prompts": self.prompts,
+            "full_tokens": self.full_tokens,
+            "sent_tokens": self.sent_tokens,
+            "saved_tokens": self.saved_tokens,
+            "saved_pct": round(saved_pct, 1),
+        }
+
+
+class HistoryContext:
+    """
+    Renders the conversation history within a token budget.
+
+    A transcript that fits in ``token_budget`` is sent as it is. Once it
+    does not, the last ``keep_last`` player turns, with the god
+    announcements and eliminations between them, are sent verbatim.
+    Older entries are folded into ``state['history_summary']`` as they
+    fall out of that window, and ``state['summarized_upto']`` records how
+    far the summary has got. If the rendered history is still over the
+    budget, the oldest summary lines and then the oldest verbatim entries
+    are dropped, so prompt size stays bounded however long the game runs.
+    """
+
+    def __init__(self, keep_last=12, token_budget=1500, count=count_tokens):
+        """
+        Args:
+            keep_last: Number of most recent player turns sent verbatim
+            token_budget: Maximum number of history tokens per prompt
+            count: Function estimating the tokens in a text
+        """
+        self.keep_last = keep_last
+        self.token_budget = token_budget
+        self.count = count
+        self.counter = TokenCounter()
+
+    def render(self, state):
+        """
+        Render the history to send in a prompt.
+
+        Args:
+            state: Current game state; its summary fields are updated
+
+        Returns:
+            History string
+        """
+        history = state["history"]
+        full = "\n".join(history)
+        full_tokens = self.count(full)
+        if full_tokens <= self.token_budget:
+            self.counter.record(full_tokens, full_tokens)
+            return full
+
+        cutoff = self._recent_start(history)
+        if not state.get("history_summary"):
+            state["history_summary"] = []
+        summary = state["history_summary"]
+        done = state.get("summarized_upto") or 0
+        if cutoff > done:
+            summary.extend(summarize_entry(entry) for entry in history[done:cutoff])
+            state["summarized_upto"] = cutoff
+
+        # Drop the oldest summary lines, then the oldest verbatim entries,
+        # until the rendered history fits in the budget
+        recent = history[cutoff:]
+        summary_tokens = [self.count(line) for line in summary]
+        recent_tokens = [self.count(entry) for entry in recent]
+        total = sum(summary_tokens) + sum(recent_tokens)
+        first_summary = 0
+        while total > self.token_budget and first_summary < len(summary):
+            total -= summary_tokens[first_summary]
+            first_summary += 1
+        first_recent = 0
+        while total > self.token_budget and first_recent < len(recent) - 1:
+            total -= recent_tokens[first_recent]
+            first_recent += 1
+
+        # Lines dropped for the budget only get older, so forget them
+        del summary[:first_summary]
+
+        text = self._join(summary, recent[first_recent:])
+        self.counter.record(full_tokens, self.count(text))
+        return text
+
+    def _recent_start(self, history):
+        """Return the index of the first of the last ``keep_last`` turns."""
+        if self.keep_last <= 0:
+            return len(history)
+        turns = 0
+        for index in range(len(history) - 1, -1, -1):
+            if _TURN.match(history[index]):
+                turns += 1
+                if turns == self.keep_last:
+                    return index
+        return 0
+
+    @staticmethod
+    def _join(summary, recent):
+        if not summary:
+            return "\n".join(recent)
+        return ("Summary of earlier rounds:\n" + "\n".join(summary)
+                + "\n\nRecent conversation:\n" + "\n".join(recent))
+
+
+def render_history(state, context=None):
+    """
+    Return the history string for a prompt.
+
+    Args:
+        state: Current game state
+        context: Optional HistoryContext; without one the whole
+            transcript is sent
+
+    Returns:
+        History string
+    """
+    if context is None:
+        return "\n".join(state["history"])
+    return context.render(state)
+
+
+def history_context(token_budget=1500, keep_last=12):
+    """
+    Return the HistoryContext for a token budget, or None to send the
+    whole transcript.
+
+    Args:
+        token_budget: Maximum number of history tokens per prompt; 0 or
+            None for no budget
+        keep_last: Number of most recent player turns sent verbatim
+            once the history is over the budget
+    """
+    if not token_budget:
+        return None
+    return HistoryContext(keep_last=keep_last, token_budget=token_budget)
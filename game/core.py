@@ -0,0 +1,211 @@
+"""
+Compact core of the game state: who is alive, who is dead, which team wins.
+
+The graph state keeps players in lists because prompts and the UI read
+them. GameCore keeps the same information as bitmasks over the player
+numbers, with the team of every role looked up once in a TeamTable:
+
+- an elimination clears one bit and updates the team counters
+- the win check compares two counters
+- membership tests and the next-alive-player lookup are bit operations
+
+GameCore.from_state and GameCore.to_state convert to and from a
+GraphState dict. Cores are built fresh for each god step; routing only
+reads the alive players, so it works on their mask (players_mask,
+next_player, round_ends and TeamTable.winner) without building a core.
+A game graph looks up its TeamTable once and passes it to every call.
+"""
+
+from functools import lru_cache
+
+from .state import ROLES, roles_of
+
+
+if hasattr(int, "bit_count"):
+    _popcount = int.bit_count
+else:
+    def _popcount(mask):
+        """Number of set bits; int.bit_count needs Python 3.10."""
+        return bin(mask).count("1")
+
+
+class TeamTable:
+    """Team of every player, precomputed from a role table."""
+
+    __slots__ = ("players", "all_mask", "wolf_mask")
+
+    def __init__(self, roles):
+        """
+        Args:
+            roles: Mapping of player number to role name
+        """
+        self.players = tuple(sorted(roles))
+        self.all_mask = 0
+        self.wolf_mask = 0
+        for player, role in roles.items():
+            self.all_mask |= 1 << player
+            if 'wolf' in role:
+                self.wolf_mask |= 1 << player
+
+    def is_wolf(self, player):
+        return bool(self.wolf_mask >> player & 1)
+
+    def winner(self, alive):
+        """Return the winning team of an alive-player mask, or None."""
+        wolves = _popcount(alive & self.wolf_mask)
+        if wolves == 0:
+            return "villagers"
+        if wolves >= _popcount(alive) - wolves:
+            return "wolves"
+        return None
+
+
+@lru_cache(maxsize=256)
+def _team_table(roles):
+    return TeamTable(dict(roles))
+
+
+def players_mask(players):
+    """Return the bitmask of a list of player numbers."""
+    mask = 0
+    for player in players:
+        mask |= 1 << player
+    return mask
+
+
+def next_player(mask, player):
+    """
+    Return the first player of a mask after the given one, wrapping around.
+
+    Returns:
+        Player number, or None if the mask is empty
+    """
+    if not mask:
+        return None
+    later = mask >> (player + 1) << (player + 1)
+    mask = later or mask
+    # Lowest set bit
+    return (mask & -mask).bit_length() - 1
+
+
+def round_ends(alive, turn):
+    """
+    Whether the round ends after the given player's turn.
+
+    A round ends once the last alive player in seat order has spoken;
+    turn 0 means no round has started yet.
+    """
+    following = next_player(alive, turn)
+    return turn == 0 or following is None or following <= turn
+
+
+# Table of the default game, built once
+DEFAULT_TEAM_TABLE = TeamTable(ROLES)
+
+
+def team_table(roles=None):
+    """Return the (cached) TeamTable of a role table; defaults to ROLES."""
+    if not roles or roles is ROLES:
+        return DEFAULT_TEAM_TABLE
+    return _team_table(tuple(sorted(roles.items())))
+
+
+class GameCore:
+    """Alive and dead players as bitmasks, with per-team counters."""
+
+    __slots__ = ("table", "alive", "dead", "wolves", "villagers")
+
+    def __init__(self, alive_players, dead_players=(), roles=None, table=None):
+        """
+        Args:
+            alive_players: Player numbers still in the game
+            dead_players: Player numbers that left the game
+            roles: Role table; defaults to ROLES
+            table: TeamTable of the role table, if already looked up
+        """
+        if table is None:
+            table = team_table(roles)
+        self.table = table
+        self.alive = players_mask(alive_players)
+        self.dead = players_mask(dead_players)
+        self.wolves = _popcount(self.alive & table.wolf_mask)
+        self.villagers = _popcount(self.alive) - self.wolves
+
+    @classmethod
+    def from_state(cls, state, roles=None, table=None):
+        """
+        Build the core of a GraphState dict.
+
+        Args:
+            state: Game state
+            roles: Role table; defaults to the state's
+            table: TeamTable of the game, if already looked up; takes
+                precedence over ``roles``
+        """
+        if table is None:
+            table = team_table(roles or roles_of(state))
+        return cls(state['alive_players'], state.get('dead_players') or (), table=table)
+
+    def to_state(self, state):
+        """
+        Write the alive and dead players back into a GraphState dict.
+
+        The lists are updated in place, keeping their order, so views
+        shared with the UI stay valid.
+
+        Returns:
+            The state
+        """
+        alive = state['alive_players']
+        alive[:] = [p for p in alive if self.is_alive(p)]
+        dead = state.setdefault('dead_players', [])
+        known = 0
+        for player in dead:
+            known |= 1 << player
+        dead.extend(p for p in self.table.players if (self.dead & ~known) >> p & 1)
+        return state
+
+    def is_alive(self, player):
+        return bool(self.alive >> player & 1)
+
+    def is_dead(self, player):
+        return bool(self.dead >> player & 1)
+
+    def eliminate(self, player):
+        """
+        Move a player from the alive to the dead players.
+
+        Returns:
+            Whether the player was alive
+        """
+        bit = 1 << player
+        self.dead |= bit
+        if not self.alive & bit:
+            return False
+        self.alive &= ~bit
+        if self.table.wolf_mask & bit:
+            self.wolves -= 1
+        else:
+            self.villagers -= 1
+        return True
+
+    def winner(self):
+        """Return "villagers", "wolves", or None while the game is still going."""
+        if self.wolves == 0:
+            return "villagers"
+        if self.wolves >= self.villagers:
+            return "wolves"
+        return None
+
+    def next_alive(self, player):
+        """
+        Return the first alive player after the given one, wrapping around.
+
+        Returns:
+            Player number, or None if nobody is alive
+        """
+        return next_player(self.alive, player)
+
+    def round_over(self, turn):
+        """Whether the round ends after the given player's turn (see round_ends)."""
+        return round_ends(self.alive, turn)
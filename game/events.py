@@ -0,0 +1,233 @@
+"""
+Structured game events and pluggable sinks.
+
+God and the players emit typed events instead of printing strings and
+keeping a copy in the state. An EventBus hands every event to its
+sinks: the console (which prints the familiar game log), a bounded ring
+buffer for the UI, a JSONL file, or any callback. A bus without sinks
+is quiet and costs next to nothing, which is what batch simulations use.
+"""
+
+import json
+import sys
+import threading
+from collections import deque
+from dataclasses import asdict, dataclass
+from typing import Any, ClassVar, Dict, Optional, Tuple
+
+
+@dataclass(frozen=True)
+class Event:
+    """Base class of all game events."""
+
+    # Transient events only matter live; buffers and files skip them
+    transient: ClassVar[bool] = False
+
+    @property
+    def kind(self):
+        return type(self).__name__
+
+    def to_dict(self):
+        return {"type": self.kind, **asdict(self)}
+
+
+@dataclass(frozen=True)
+class RoundStart(Event):
+    """God opens a new round."""
+    round: int
+    wolves: int
+    villagers: int
+
+
+@dataclass(frozen=True)
+class Speech(Event):
+    """A player speaks to the table."""
+    player: int
+    content: str
+
+
+@dataclass(frozen=True)
+class SpeechToken(Event):
+    """Part of a speech that is still being generated."""
+    transient: ClassVar[bool] = True
+    player: int
+    text: str
+
+
+@dataclass(frozen=True)
+class Vote(Event):
+    """A player privately guesses who the wolf is."""
+    player: Optional[int]
+    guessed_wolf: int
+    confidence: int
+    reason: str
+    counted: bool
+
+
+@dataclass(frozen=True)
+class Elimination(Event):
+    """God counts the votes of a round; ``player`` is None if nobody leaves."""
+    votes: Tuple[int, ...]
+    player: Optional[int]
+    dead_players: Tuple[int, ...]
+    alive_before: Optional[Tuple[int, ...]] = None
+    alive_after: Optional[Tuple[int, ...]] = None
+
+
+@dataclass(frozen=True)
+class GameEnd(Event):
+    """One of the teams has won."""
+    winner: str
+
+
+@dataclass(frozen=True)
+class BudgetExhausted(Event):
+    """The game was stopped because it reached one of its budget caps."""
+    reason: Optional[str]
+    usage: Dict[str, Any]
+
+
+def format_event(event):
+    """
+    Render an event as the lines of the console game log.
+
+    Args:
+        event: Game event
+
+    Returns:
+        List of lines
+    """
+    if isinstance(event, Speech):
+        return ['=' * 5, f'player {event.player}): {event.content}']
+    if isinstance(event, SpeechToken):
+        return [event.text]
+    if isinstance(event, Vote):
+        return [f'--> self thoughts and strategies in the brain of this player (not added in game): I think, player {event.guessed_wolf} with conf={event.confidence}% is a wolf. The reason: {event.reason}']
+    if isinstance(event, RoundStart):
+        return [
+            '=' * 20,
+            '---------round started--------',
+            '*' * 15,
+            f"     God: Dear players, so far {event.wolves} wolf palyers and {event.villagers} villagers are still playing.",
+            '*' * 15,
+        ]
+    if isinstance(event, Elimination):
+        lines = [
+            f'These are who looked suspecious for so far: {list(event.votes)}. Lets see who should leave',
+            '-------------voting Started-------------',
+        ]
+        if event.player is None:
+            lines.append('no one leaves the game in this round.')
+        else:
+            lines.append(f'player {event.player} is leaving the game. Collectively players say this.')
+            lines.append(f'most common value: {event.player}')
+            lines.append(f'dead players: {list(event.dead_players)}')
+            if event.alive_before is not None:
+                lines.append(f'alive players before: {list(event.alive_before)}')
+                lines.append(f'alive players after: {list(event.alive_after)}')
+        lines.append('-------------voting Ended-------------')
+        return lines
+    if isinstance(event, GameEnd):
+        team = 'Villegers' if event.winner == 'villagers' else 'Wolves'
+        return [f'===> final result: {team} won and game ended']
+    if isinstance(event, BudgetExhausted):
+        usage = event.usage
+        return [f"===> final result: budget exhausted ({event.reason}) after {usage.get('rounds')} rounds, "
+                f"{usage.get('tokens', 0):,} tokens, ${usage.get('cost', 0):.4f}, {usage.get('seconds', 0):.1f}s"]
+    return [str(event)]
+
+
+class ConsoleSink:
+    """Prints events as the console game log, speeches as they stream in."""
+
+    def __init__(self, stream=None):
+        self.stream = stream
+        self._speaking = None
+
+    def __call__(self, event):
+        stream = self.stream or sys.stdout
+        if isinstance(event, SpeechToken):
+            if self._speaking != event.player:
+                stream.write(f'{"=" * 5}\nplayer {event.player}): ')
+                self._speaking = event.player
+            stream.write(event.text)
+            stream.flush()
+            return
+        if isinstance(event, Speech) and self._speaking == event.player:
+            # Already printed token by token
+            self._speaking = None
+            stream.write("\n")
+            return
+        stream.write("\n".join(format_event(event)) + "\n")
+
+
+class RingBufferSink:
+    """Keeps the most recent events in memory, for the UI."""
+
+    def __init__(self, maxlen=500):
+        self.events = deque(maxlen=maxlen)
+        self.total = 0
+
+    def __call__(self, event):
+        if event.transient:
+            return
+        self.events.append(event)
+        self.total += 1
+
+
+class FileSink:
+    """Appends events to a JSONL file."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def __call__(self, event):
+        if event.transient:
+            return
+        line = json.dumps(event.to_dict()) + "\n"
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as fh:
+                fh.write(line)
+
+
+class CallbackSink:
+    """Hands every event to a function, e.g. a UI update."""
+
+    def __init__(self, callback):
+        self.callback = callback
+
+    def __call__(self, event):
+        self.callback(event)
+
+
+class EventBus:
+    """
+    Delivers game events to a list of sinks.
+
+    A sink is any callable taking an event. A bus with no sinks is quiet.
+    """
+
+    def __init__(self, sinks=None):
+        self.sinks = list(sinks or [])
+
+    @property
+    def quiet(self):
+        return not self.sinks
+
+    def add_sink(self, sink):
+        self.sinks.append(sink)
+        return sink
+
+    def emit(self, event):
+        for sink in self.sinks:
+            sink(event)
+
+
+# Bus used when no other bus is given: prints the game log like before
+CONSOLE = EventBus([ConsoleSink()])
+
+
+def resolve(events):
+    """Return the given bus, or the console bus if there is none."""
+    return CONSOLE if events is None else events
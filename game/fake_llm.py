@@ -0,0 +1,175 @@
+"""
+Deterministic offline chat model for the Werewolf game.
+
+FakeWerewolfLLM stands in for the real provider in create_game_graph or
+StreamlitGameRunner. It reads the player number, role and alive players
+from the rendered prompt, answers speech prompts with short plausible
+statements and vote prompts with valid GuessWhoIsWolf JSON (or
+SpeechAndVote JSON for single-call turns), and can add
+a simulated latency. With it, games run without network access or an
+API key, which makes it possible to measure the orchestration on its own.
+
+Every reply, and its latency, is drawn from a random generator seeded
+with the model's seed and the rendered prompt, so a seeded game plays
+out the same way whatever order concurrent calls (round votes, batches,
+branches) happen to run in.
+"""
+
+import asyncio
+import json
+import random
+import re
+import time
+import zlib
+from collections import Counter
+from typing import Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from .context import count_tokens
+
+
+SPEECHES = [
+    "I'm a villeger. Player {target} has been too quiet, that makes me nervous.",
+    "I'm a villeger. Player {target} keeps changing the subject, I don't trust that.",
+    "I'm a villeger and I have nothing to hide. I think player {target} is the one we should watch.",
+    "I'm a villeger. Player {target} was quick to blame others last round, that is what a wolf would do.",
+    "I'm a villeger. Let's not rush, but player {target} has not given us one clear answer.",
+    "I'm a villeger. My vote is leaning towards player {target}, his story does not add up.",
+]
+
+REASONS = [
+    "He avoided answering direct questions.",
+    "He pushed the blame around too quickly.",
+    "His statements contradict what he said before.",
+    "He defended a suspicious player without a reason.",
+    "He has been unusually quiet.",
+]
+
+_PLAYER = re.compile(r"you are player (\d+)", re.IGNORECASE)
+_ROLE = re.compile(r"your role is:? ([a-z ]+?)[.\n]", re.IGNORECASE)
+_ALIVE = re.compile(r"from players \[([\d, ]*)\]")
+_ACCUSED = re.compile(r"^player \d+: .*?[Pp]layer (\d+)", re.MULTILINE)
+
+
+class FakeWerewolfLLM(BaseChatModel):
+    """
+    Seedable offline chat model that plays the Werewolf game.
+
+    Players mostly follow the table and pick the alive player accused
+    most often in the conversation so far, and otherwise a random alive
+    player other than themselves, so votes can reach a majority even at
+    large tables. Latency is drawn from a normal
+    distribution with ``latency_mean``/``latency_std`` seconds, clipped
+    at zero. When streamed, the reply comes word by word with the
+    latency spread over the words.
+    """
+
+    seed: Optional[int] = None
+    latency_mean: float = 0.0
+    latency_std: float = 0.0
+    model_name: str = "fake-werewolf"
+
+    @property
+    def _llm_type(self):
+        return "fake-werewolf"
+
+    @property
+    def _identifying_params(self):
+        return {"model_name": self.model_name, "seed": self.seed}
+
+    def _rng(self, text):
+        """Random generator of one call, seeded by the seed and the prompt."""
+        if self.seed is None:
+            return random.Random()
+        return random.Random((self.seed << 32) ^ zlib.crc32(text.encode()))
+
+    def _respond(self, messages):
+        """Build the reply for a rendered prompt, and its latency."""
+        text = "\n".join(str(message.content) for message in messages)
+        rng = self._rng(text)
+
+        match = _PLAYER.search(text)
+        player_number = int(match.group(1)) if match else 0
+        match = _ROLE.search(text)
+        role = match.group(1).strip() if match else "villeger"
+        match = _ALIVE.search(text)
+        alive = [int(p) for p in match.group(1).split(",") if p.strip()] if match else list(range(1, 7))
+
+        candidates = [p for p in alive if p != player_number] or alive
+        accused = Counter(int(p) for p in _ACCUSED.findall(text) if int(p) in candidates)
+        target = rng.choice(candidates)
+        if accused and rng.random() < 0.75:
+            target = max(sorted(accused), key=accused.get)
+        if "JSON" in text:
+            vote = {
+                "guessed_wolf": target,
+                "percentage_assureness": rng.randint(30, 95),
+                "question": "Which of the players do you think is a wolf",
+                "description": rng.choice(REASONS),
+            }
+            if '"speech"' in text:
+                # Single-call turn: the speech comes with the vote
+                vote = {"speech": rng.choice(SPEECHES).format(target=target), **vote}
+                del vote["question"]
+            content = json.dumps(vote)
+        else:
+            content = rng.choice(SPEECHES).format(target=target)
+
+        input_tokens = count_tokens(text)
+        output_tokens = count_tokens(content)
+        delay = 0.0
+        if self.latency_mean > 0 or self.latency_std > 0:
+            delay = max(0.0, rng.gauss(self.latency_mean, self.latency_std))
+        return AIMessage(
+            content=content,
+            response_metadata={"model_name": self.model_name, "role": role},
+            usage_metadata={
+                "input_tokens": input_tokens,
+                "output_tokens": output_tokens,
+                "total_tokens": input_tokens + output_tokens,
+            },
+        ), delay
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        message, delay = self._respond(messages)
+        if delay:
+            time.sleep(delay)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        message, delay = self._respond(messages)
+        if delay:
+            await asyncio.sleep(delay)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _chunks(self, message):
+        """Split a reply into word chunks, the usage on the last one."""
+        words = message.content.split(" ")
+        for i, word in enumerate(words):
+            last = i == len(words) - 1
+            yield ChatGenerationChunk(message=AIMessageChunk(
+                content=word if last else word + " ",
+                response_metadata=message.response_metadata if last else {},
+                usage_metadata=message.usage_metadata if last else None,
+            )), len(words)
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        message, delay = self._respond(messages)
+        for chunk, n_words in self._chunks(message):
+            if delay:
+                time.sleep(delay / n_words)
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        message, delay = self._respond(messages)
+        for chunk, n_words in self._chunks(message):
+            if delay:
+                await asyncio.sleep(delay / n_words)
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
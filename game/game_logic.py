@@ -3,135 +3,180 @@ Core game mechanics and logic for the Werewolf game.
 """
 
 from collections import Counter
-from .state import ROLES
+from .core import GameCore, next_player, players_mask, round_ends, team_table
+from .events import BudgetExhausted, Elimination, GameEnd, RoundStart, resolve
+from .state import roles_of
 
 
-def god(state):
+def god(state, events=None, table=None):
     """
     God function that manages game state, voting, and round transitions.
     
     Args:
         state: Current game state
+        events: Optional EventBus to report to; defaults to the console
+        table: TeamTable of the game, if already looked up
     
     Returns:
         Updated game state
     """
-    if state['turn'] in state['dead_players']:
+    core = GameCore.from_state(state, table=table)
+    
+    # Nothing to do until the last alive player of the round has spoken,
+    # nor when the round was already opened (a resumed or forked state)
+    if not core.round_over(state['turn']) or (state['turn'] == 0 and state.get('current_iter')):
         return state
     
-    print('='*5)
-    
-    # Add to debug log if it exists
-    if 'debug_log' not in state:
-        state['debug_log'] = []
-    state['debug_log'].append('='*5)
-    
-    # Handle voting when turn reaches 6 (end of round)
-    if state['turn'] % 6 == 0:
-        if state["voted_to_leave"] != []:
-            voted_to_leave = state["voted_to_leave"]
-
-            # Count frequencies
-            counter = Counter(voted_to_leave)
-            print(f'These are who looked suspecious for so far: {voted_to_leave}. Lets see who should leave')
-            if 'debug_log' not in state:
-                state['debug_log'] = []
-            state['debug_log'].append(f'These are who looked suspecious for so far: {voted_to_leave}. Lets see who should leave')
-            
-            print('-------------voting Started-------------')
-            state['debug_log'].append('-------------voting Started-------------')
-            
-            # Most common value and its count
-            most_common_value, count = counter.most_common(1)[0]
-
-            # If more than half of alive_players vote for the suspect, they should leave the game
-            if count >= len(state['alive_players']) / 2:
-                print(f'player {most_common_value} is leaving the game. Collectively players say this.')
-                state['debug_log'].append(f'player {most_common_value} is leaving the game. Collectively players say this.')
-                
-                state['dead_players'].append(int(most_common_value))
-                value_to_remove = int(most_common_value)
-                print('most common value:', most_common_value)
-                state['debug_log'].append(f'most common value: {most_common_value}')
-                print('dead players:', state['dead_players'])
-                state['debug_log'].append(f'dead players: {state["dead_players"]}')
-                if value_to_remove in state['alive_players']:
-                    print('alive players before:', state['alive_players'])
-                    state['debug_log'].append(f'alive players before: {state["alive_players"]}')
-                    state['alive_players'].remove(value_to_remove)
-                    print('alive players after:', state['alive_players'])
-                    state['debug_log'].append(f'alive players after: {state["alive_players"]}')
-                    state['history'].append(f"player {value_to_remove} leaves the game based on voted collected.")
-                    
-            else:
-                print('no one leaves the game in this round.')
-                state['debug_log'].append('no one leaves the game in this round.')
-            print('-------------voting Ended-------------')
-            state['debug_log'].append('-------------voting Ended-------------')
-            state["voted_to_leave"] = []
-            state['turn'] = state['turn'] + 1
-        
-        print('='*20)
-        state['debug_log'].append('='*20)
-        print('---------round started--------')
-        state['debug_log'].append('---------round started--------')
+    events = resolve(events)
+    
+    # Count the votes of the round that just ended
+    if state["voted_to_leave"] != []:
+        voted_to_leave = state["voted_to_leave"]
+
+        # Count frequencies
+        counter = Counter(voted_to_leave)
         
-        # Count wolves and villagers
-        wolf_num = 0
-        vilg_num = 0
-        for i in state['alive_players']:
-            if 'wolf' in ROLES[i]:
-                wolf_num += 1
-            else:
-                vilg_num += 1
-                
-        state['history'].append(f"God: Dear players, there are {wolf_num} wolves and {vilg_num} villagers are alive and playing in the game.")
-        print('*'*15)
-        state['debug_log'].append('*'*15)
-        print(f"     God: Dear players, so far {wolf_num} wolf palyers and {vilg_num} villagers are still playing.")
-        state['debug_log'].append(f"     God: Dear players, so far {wolf_num} wolf palyers and {vilg_num} villagers are still playing.")
-        print('*'*15)
-        state['debug_log'].append('*'*15)
+        # Most common value and its count
+        most_common_value, count = counter.most_common(1)[0]
+
+        # If at least vote_threshold (half by default) of alive_players vote
+        # for the suspect, they should leave the game
+        if count >= len(state['alive_players']) * (state.get('vote_threshold') or 0.5):
+            value_to_remove = int(most_common_value)
+            alive_before = alive_after = None
+            if core.is_alive(value_to_remove):
+                alive_before = tuple(state['alive_players'])
+            core.eliminate(value_to_remove)
+            core.to_state(state)
+            if alive_before is not None:
+                alive_after = tuple(state['alive_players'])
+                state['history'].append(f"player {value_to_remove} leaves the game based on voted collected.")
+            events.emit(Elimination(
+                votes=tuple(voted_to_leave),
+                player=value_to_remove,
+                dead_players=tuple(state['dead_players']),
+                alive_before=alive_before,
+                alive_after=alive_after,
+            ))
+        else:
+            events.emit(Elimination(
+                votes=tuple(voted_to_leave),
+                player=None,
+                dead_players=tuple(state['dead_players']),
+            ))
+        state["voted_to_leave"] = []
+    
+    # The next round starts again from the first alive player
+    state['turn'] = 0
+    state['current_iter'] = (state.get('current_iter') or 0) + 1
+    
+    state['history'].append(f"God: Dear players, there are {core.wolves} wolves and {core.villagers} villagers are alive and playing in the game.")
+    events.emit(RoundStart(round=state['current_iter'], wolves=core.wolves, villagers=core.villagers))
     
     return state
 
 
-def next_node(state):
+async def agod(state, events=None, table=None):
+    """
+    Async version of god for graphs driven by ``ainvoke``/``astream``.
+    
+    God does no I/O, so this only lets the node be awaited like the
+    async player nodes.
+    """
+    return god(state, events=events, table=table)
+
+
+def next_node(state, events=None, budget=None, table=None):
     """
     Determine the next node in the game graph based on current state.
     
     Args:
         state: Current game state
+        events: Optional EventBus to report the end of the game to;
+            defaults to the console
+        budget: Optional BudgetGovernor of the game
+        table: TeamTable of the game, if already looked up
     
     Returns:
-        String indicating next node or "to_end" if game should end
+        String indicating next node, "to_end" if the game should end or
+        "out_of_budget" if its budget is spent
     """
-    wolf_num = 0
-    vilg_num = 0
-    
-    for i in state['alive_players']:
-        if 'wolf' in ROLES[i]:
-            wolf_num += 1
-        else:
-            vilg_num += 1
+    if table is None:
+        table = team_table(roles_of(state))
+    alive = players_mask(state['alive_players'])
     
     # Check winning conditions
-    if wolf_num == 0:
-        print('===> final result: Villegers won and game ended')
+    winner = table.winner(alive)
+    if winner is not None:
+        resolve(events).emit(GameEnd(winner=winner))
         return "to_end"
-    elif wolf_num >= vilg_num:
-        print('===> final result: Wolves won and game ended')
-        return "to_end"  
-    
-    # Find next alive player
-    flag = True
-    next_player = (state['turn'] + 1) % 7
-    
-    while flag:
-        if next_player not in state['dead_players']:
-            flag = False
-            if next_player == 0:
-                return "to_1"
-            return f"to_{next_player}"
-        elif next_player in state['dead_players']:
-            next_player = (next_player + 1) % 6 
\ No newline at end of file
+    
+    # Stop before the next turn once the game's budget is spent
+    if budget is not None and budget.exhausted(state):
+        return "out_of_budget"
+    
+    # Next alive player in seat order; god has reset the turn to 0 at
+    # the end of the previous round
+    return f"to_{next_player(alive, state['turn'])}"
+
+
+def next_speaker(state, budget=None):
+    """
+    Route from a player's turn without going through god.
+    
+    Nobody is eliminated within a round, so no team can win between two
+    speeches; only the end of the round needs god.
+    
+    Args:
+        state: Game state after the player's turn
+        budget: Optional BudgetGovernor of the game
+    
+    Returns:
+        "to_god" once the last alive player of the round has spoken,
+        "out_of_budget" if the game's budget is spent, otherwise
+        "to_<n>" for the next alive player
+    """
+    alive = players_mask(state['alive_players'])
+    if round_ends(alive, state['turn']):
+        return "to_god"
+    if budget is not None and budget.exhausted(state):
+        return "out_of_budget"
+    return f"to_{next_player(alive, state['turn'])}"
+
+
+def end_over_budget(state, budget=None, events=None):
+    """
+    End a game whose budget is spent.
+    
+    Args:
+        state: Current game state
+        budget: BudgetGovernor of the game
+        events: Optional EventBus to report to; defaults to the console
+    
+    Returns:
+        Updated game state, with outcome "budget_exhausted" and the usage
+        report
+    """
+    usage = budget.report(state) if budget is not None else {}
+    state['outcome'] = "budget_exhausted"
+    state['usage'] = usage
+    resolve(events).emit(BudgetExhausted(reason=usage.get("exhausted"), usage=usage))
+    return state
+
+
+def round_over(state):
+    """Whether the player who just spoke was the last of the round."""
+    return round_ends(players_mask(state['alive_players']), state['turn'])
+
+
+def game_winner(state):
+    """
+    Return which team has won the game, if any.
+    
+    Args:
+        state: Current game state
+    
+    Returns:
+        "villagers", "wolves", or None while the game is still going
+    """
+    return team_table(roles_of(state)).winner(players_mask(state['alive_players']))
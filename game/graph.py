@@ -2,59 +2,218 @@
 LangGraph configuration for the Werewolf game.
 """
 
+import asyncio
 from langgraph.graph import StateGraph, START, END
-from .state import GraphState
-from .players import create_player_functions
-from .game_logic import god, next_node
+from .state import ROLES, GraphState
+from .players import (
+    create_player_functions,
+    create_async_player_functions,
+    collect_round_votes,
+    acollect_round_votes,
+)
+from .budget import governor_of
+from .core import team_table
+from .game_logic import god, agod, end_over_budget, next_node, next_speaker, round_over
+from .updates import as_node
 
 
-def create_game_graph(llm):
+# Rounds a game may take by default, per player: a round eliminates at
+# most one player, and votes do not always reach the threshold
+ROUNDS_PER_PLAYER = 4
+
+
+def default_recursion_limit(roles=None, rounds=None):
+    """
+    Return a recursion limit that lets a game on a role table finish.
+    
+    A round of n alive players takes n + 1 graph steps, so a game of
+    p players and r rounds takes at most about (p + 1) * r steps.
+    
+    Args:
+        roles: Role table; defaults to ROLES
+        rounds: Rounds to allow (e.g. the budget's cap); defaults to
+            ROUNDS_PER_PLAYER per player
+    
+    Returns:
+        Recursion limit, at least 2000
+    """
+    players = len(roles or ROLES)
+    if rounds is None:
+        rounds = ROUNDS_PER_PLAYER * players
+    return max(2000, (players + 1) * (rounds + 1))
+
+
+def _votes_due(state):
+    """Whether god is about to count the votes of a finished round."""
+    return state['turn'] != 0 and round_over(state)
+
+
+def create_game_graph(llm, vote_mode="turn", max_concurrency=None, parallel=False, use_async=False,
+                      context=None, events=None, stream=False, single_call=False, roles=None,
+                      checkpointer=None):
     """
     Create the LangGraph for the Werewolf game.
     
+    Within a round each player hands over straight to the next alive
+    player; god only runs at round boundaries (and at the start), where
+    it counts votes, eliminates and opens the next round. A round of n
+    players therefore takes n + 1 steps.
+    
+    Nodes return only what they changed (see game.updates); a player's
+    turn, for example, returns its turn number, its speech and its vote.
+    
+    A game run with a BudgetGovernor attached to its config
+    (``governor.attach(config)``) is checked before every turn and ends
+    through the out_of_budget node once a cap is reached.
+    
     Args:
         llm: Language model instance
+        vote_mode: "turn" to have each player vote right after speaking,
+            or "round" to collect all votes at once when the round ends
+        max_concurrency: Maximum number of vote calls in flight in
+            "round" mode, or None for no limit
+        parallel: Run each player's speech and vote calls at the same time
+            (only applies to "turn" mode)
+        use_async: Build async nodes, for driving the graph with
+            ``ainvoke``/``astream`` (see arun_game)
+        context: Optional HistoryContext bounding the history sent in
+            each prompt; without one the whole transcript is sent
+        events: Optional EventBus the game reports to; defaults to the
+            console. Pass ``EventBus()`` for a quiet game.
+        stream: Stream each speech, reporting its tokens as SpeechToken
+            events while it is generated
+        single_call: Ask for each player's speech and vote in one
+            structured call, falling back to two calls when it does not
+            parse (only applies to "turn" mode)
+        roles: Role table of the games played on this graph, one node
+            per player; defaults to ROLES. Initial states should carry
+            the same table under "roles".
+        checkpointer: Optional checkpointer (e.g. SQLiteCheckpointer)
+            saving every step, so a game run with a ``thread_id`` in its
+            config can be resumed after a crash
     
     Returns:
         Compiled LangGraph application
     """
+    if vote_mode not in ("turn", "round"):
+        raise ValueError(f"Unknown vote_mode: {vote_mode!r}. Use 'turn' or 'round'.")
+    
+    players = sorted(roles or ROLES)
+    # Looked up once for every god step and win check of the graph's games
+    table = team_table(roles)
+    
     # Create the graph
     graph = StateGraph(GraphState)
     
     # Create player functions
-    player_functions = create_player_functions(llm)
+    make_players = create_async_player_functions if use_async else create_player_functions
+    player_functions = make_players(llm, vote=(vote_mode == "turn"), parallel=parallel, context=context,
+                                    events=events, stream=stream, single_call=single_call, players=players)
     
     # Add player nodes
     for name, fn in player_functions.items():
-        graph.add_node(name, fn)
+        graph.add_node(name, as_node(fn))
     
     # Add god node
-    graph.add_node("god", god)
+    if vote_mode == "round" and use_async:
+        async def round_god(state):
+            # Gather every alive player's vote before god counts them
+            if _votes_due(state):
+                await acollect_round_votes(state, llm, max_concurrency=max_concurrency, context=context, events=events)
+            return god(state, events=events, table=table)
+
+        graph.add_node("god", as_node(round_god))
+    elif vote_mode == "round":
+        def round_god(state):
+            # Gather every alive player's vote before god counts them
+            if _votes_due(state):
+                collect_round_votes(state, llm, max_concurrency=max_concurrency, context=context, events=events)
+            return god(state, events=events, table=table)
+
+        graph.add_node("god", as_node(round_god))
+    elif use_async:
+        async def async_god(state):
+            return await agod(state, events=events, table=table)
+
+        graph.add_node("god", as_node(async_god))
+    else:
+        graph.add_node("god", as_node(lambda state: god(state, events=events, table=table)))
+    
+    # Ends a game whose budget is spent
+    def out_of_budget(state, config):
+        return end_over_budget(state, budget=governor_of(config), events=events)
+
+    graph.add_node("out_of_budget", as_node(out_of_budget))
+    graph.add_edge("out_of_budget", END)
     
     # Add edges
     graph.add_edge(START, "god")
     
-    graph.add_conditional_edges(
-        "god", 
-        next_node,
-        {    
-            "to_1": "player_1",
-            "to_2": "player_2", 
-            "to_3": "player_3",
-            "to_4": "player_4",
-            "to_5": "player_5",
-            "to_6": "player_6",
-            "to_end": END,
-        }
-    )
-    
-    # Add edges from players back to god
-    graph.add_edge("player_1", "god")
-    graph.add_edge("player_2", "god")
-    graph.add_edge("player_3", "god")
-    graph.add_edge("player_4", "god")
-    graph.add_edge("player_5", "god")
-    graph.add_edge("player_6", "god")
+    routes = {f"to_{n}": f"player_{n}" for n in players}
+    routes["to_end"] = END
+    routes["out_of_budget"] = "out_of_budget"
+
+    def route_god(state, config):
+        return next_node(state, events=events, budget=governor_of(config), table=table)
+
+    graph.add_conditional_edges("god", route_god, routes)
+    
+    # Players hand over to the next player, and to god when the round ends
+    player_routes = {**routes, "to_god": "god"}
+    del player_routes["to_end"]
+
+    def route_player(state, config):
+        return next_speaker(state, budget=governor_of(config))
+
+    for name in player_functions:
+        graph.add_conditional_edges(name, route_player, player_routes)
     
     # Compile the graph
-    return graph.compile() 
\ No newline at end of file
+    return graph.compile(checkpointer=checkpointer)
+
+
+async def arun_game(app, initial_state, config=None):
+    """
+    Run one game on the current event loop by streaming the graph.
+    
+    Args:
+        app: Graph compiled with ``use_async=True``
+        initial_state: Initial game state
+        config: Optional run config; defaults to the recursion limit
+            the game's role table needs (see default_recursion_limit)
+    
+    Returns:
+        Final game state
+    """
+    if config is None:
+        config = {"recursion_limit": default_recursion_limit(initial_state.get("roles"))}
+    
+    final_state = initial_state
+    async for values in app.astream(initial_state, config=config, stream_mode="values"):
+        final_state = values
+    return final_state
+
+
+async def arun_games(app, initial_states, max_concurrency=None, config=None):
+    """
+    Run many games concurrently on one event loop.
+    
+    Args:
+        app: Graph compiled with ``use_async=True``
+        initial_states: Initial states, one per game
+        max_concurrency: Maximum number of games in flight, or None for
+            no limit
+        config: Optional run config shared by all games
+    
+    Returns:
+        Final game states in the order of ``initial_states``
+    """
+    semaphore = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+
+    async def run_one(state):
+        if semaphore is None:
+            return await arun_game(app, state, config=config)
+        async with semaphore:
+            return await arun_game(app, state, config=config)
+
+    return await asyncio.gather(*(run_one(state) for state in initial_states))
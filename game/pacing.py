@@ -0,0 +1,74 @@
+"""
+Pacing of the Streamlit live view.
+
+The live runner used to sleep between its steps so spectators can follow
+the game. A Pacing policy names those pauses and decides how long each
+one lasts:
+
+- ``turbo``: no server-side pauses and no "typing" steps; the thinking
+  dots are animated by the browser
+- ``realtime``: the original pace
+- ``cinematic``: twice as slow, for presentations
+"""
+
+import time
+
+
+# Seconds to pause after each step of the live runner
+REALTIME = {
+    "turn_start": 0.5,       # after highlighting the next player
+    "thinking": 0.5,         # before the typing animation
+    "typing": 0.3,           # between the frames of the typing animation
+    "speaking": 0.5,         # before a speech is shown
+    "spoken": 1.0,           # after a speech is shown
+    "deciding": 0.5,         # before the vote decision animation
+    "deciding_typing": 0.4,  # between the frames of the decision animation
+    "thoughts": 2.0,         # while the internal thoughts are shown
+    "voted": 1.0,            # after the vote is shown
+    "god": 1.0,              # before god counts the votes
+    "announcement": 2.0,     # while god's announcement is shown
+    "between_turns": 1.0,    # between turns of a full game
+    "auto_advance": 2.0,     # between auto-advanced turns in the app
+}
+
+PACING_MODES = {
+    "turbo": {},
+    "realtime": REALTIME,
+    "cinematic": {step: delay * 2 for step, delay in REALTIME.items()},
+}
+
+
+class Pacing:
+    """Pause policy for the live runner."""
+
+    def __init__(self, mode="realtime", sleep=time.sleep):
+        """
+        Args:
+            mode: "turbo", "realtime" or "cinematic"
+            sleep: Function used to pause, replaceable in tests
+        """
+        if mode not in PACING_MODES:
+            raise ValueError(f"Unknown pacing mode: {mode!r}. Use one of {sorted(PACING_MODES)}.")
+        self.mode = mode
+        self.delays = PACING_MODES[mode]
+        self._sleep = sleep
+
+    @property
+    def animate(self):
+        """Whether to send animation frames from the server."""
+        return bool(self.delays)
+
+    def pause(self, step):
+        """Pause for the given step, if this mode pauses there."""
+        delay = self.delays.get(step, 0)
+        if delay:
+            self._sleep(delay)
+
+
+def resolve_pacing(pacing):
+    """Return a Pacing for a mode name, a Pacing, or None (realtime)."""
+    if pacing is None:
+        return Pacing()
+    if isinstance(pacing, str):
+        return Pacing(pacing)
+    return pacing
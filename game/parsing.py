@@ -0,0 +1,219 @@
+"""
+Parsing, repair and outcome counters for structured model outputs.
+
+Votes are read with the GuessWhoIsWolf schema and must name one of the
+turn's candidates, the alive players other than the voter; the format
+instructions of a turn list those candidates. A reply that does not
+fit is repaired locally before anyone re-asks the model: the JSON is
+extracted from the surrounding text, the confidence is clamped to
+0-100 and an invalid player id is mapped to a valid one. PARSE_STATS
+counts how every vote and single-call turn went, so simulations and the
+CLI can report wasted votes and fallbacks.
+"""
+
+import json
+import re
+import threading
+from collections import Counter
+from functools import lru_cache
+
+from langchain_core.output_parsers import BaseOutputParser
+from langchain_core.output_parsers.format_instructions import JSON_FORMAT_INSTRUCTIONS
+from pydantic import ValidationError
+
+from .state import GuessWhoIsWolf
+
+
+class ParseStats:
+    """Thread-safe counters of structured output outcomes."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = Counter()
+
+    def record(self, outcome, count=1):
+        """Count one (or ``count``) occurrences of an outcome."""
+        with self._lock:
+            self._counts[outcome] += count
+
+    def snapshot(self):
+        """Return the counts so far as a plain dictionary."""
+        with self._lock:
+            return dict(self._counts)
+
+    def since(self, snapshot):
+        """Return the counts recorded after an earlier snapshot."""
+        now = self.snapshot()
+        return {outcome: count - snapshot.get(outcome, 0)
+                for outcome, count in now.items() if count != snapshot.get(outcome, 0)}
+
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
+
+
+# Counters shared by every game in the process
+PARSE_STATS = ParseStats()
+
+
+# JSON schema of a vote, as PydanticOutputParser shows it to the model
+# (the class docstring is left out of the prompt)
+_VOTE_SCHEMA = {k: v for k, v in GuessWhoIsWolf.model_json_schema().items()
+                if k not in ("title", "type", "description")}
+
+
+@lru_cache(maxsize=256)
+def vote_format_instructions(candidates):
+    """
+    Return the format instructions of a turn's vote.
+
+    They are those of GuessWhoIsWolf, with guessed_wolf limited to the
+    candidates. Only the most recent sets of candidates are cached.
+
+    Args:
+        candidates: Tuple of the players the voter may pick
+
+    Returns:
+        Format instructions text
+    """
+    description = f"""
+        One integer of: {", ".join(map(str, candidates))}
+                       which each represents a player"""
+    # Same keys, in the same order, as pydantic's schema of a Literal
+    if len(candidates) == 1:
+        guessed_wolf = {"const": candidates[0], "description": description}
+    else:
+        guessed_wolf = {"description": description, "enum": list(candidates)}
+    guessed_wolf.update(title="Guessed Wolf", type="integer")
+    schema = dict(_VOTE_SCHEMA, properties=dict(_VOTE_SCHEMA["properties"], guessed_wolf=guessed_wolf))
+    return JSON_FORMAT_INSTRUCTIONS.format(schema=json.dumps(schema, ensure_ascii=False))
+
+
+_PLAYER_MENTION = re.compile(r"player\s*(\d+)", re.IGNORECASE)
+_NUMBER = re.compile(r"-?\d+")
+
+
+def extract_json(text):
+    """Return the first JSON object in a text, or None."""
+    try:
+        data = json.loads(text)
+        if isinstance(data, dict):
+            return data
+    except ValueError:
+        pass
+    decoder = json.JSONDecoder()
+    start = text.find("{")
+    while start != -1:
+        try:
+            data, _ = decoder.raw_decode(text, start)
+            if isinstance(data, dict):
+                return data
+        except ValueError:
+            pass
+        start = text.find("{", start + 1)
+    return None
+
+
+def _as_int(value):
+    """Read an integer from a number or text like "player 3" or "80%"."""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    if isinstance(value, str):
+        match = _PLAYER_MENTION.search(value) or _NUMBER.search(value)
+        if match:
+            return int(match.group(1) if match.re is _PLAYER_MENTION else match.group(0))
+    return None
+
+
+def repair_vote_fields(data, candidates):
+    """
+    Make the vote fields of a reply fit the turn's schema.
+
+    guessed_wolf is mapped to a candidate: first one the reply mentions
+    as "player N" in its reasoning, otherwise the numerically closest.
+    percentage_assureness is clamped to 0-100.
+
+    Args:
+        data: Reply fields
+        candidates: Tuple of the players the voter may pick
+
+    Returns:
+        (repaired fields, whether anything was changed)
+    """
+    fixed = dict(data)
+    wolf = _as_int(data.get("guessed_wolf"))
+    if wolf not in candidates:
+        mentioned = [int(n) for key in ("description", "question")
+                     for n in _PLAYER_MENTION.findall(str(data.get(key, "")))]
+        mentioned = [n for n in mentioned if n in candidates]
+        if mentioned:
+            wolf = mentioned[0]
+        elif wolf is not None:
+            wolf = min(candidates, key=lambda c: (abs(c - wolf), c))
+        else:
+            wolf = candidates[0]
+    fixed["guessed_wolf"] = wolf
+
+    confidence = _as_int(data.get("percentage_assureness"))
+    fixed["percentage_assureness"] = min(100, max(0, confidence if confidence is not None else 0))
+    fixed.setdefault("question", "Which of the players do you think is a wolf")
+    fixed.setdefault("description", "")
+    fixed["question"], fixed["description"] = str(fixed["question"]), str(fixed["description"])
+    return fixed, fixed != data
+
+
+def parse_vote(text, candidates, stats=None):
+    """
+    Parse a vote reply, repairing it locally if needed.
+
+    Args:
+        text: Model reply
+        candidates: Tuple of the players the voter may pick
+        stats: ParseStats to count the outcome in; defaults to PARSE_STATS
+
+    Returns:
+        The vote, or None if no vote could be read from the reply
+    """
+    stats = stats or PARSE_STATS
+    data = extract_json(text)
+    if data is None:
+        stats.record("vote_invalid")
+        return None
+    try:
+        vote = GuessWhoIsWolf.model_validate(data)
+        if vote.guessed_wolf in candidates:
+            stats.record("vote_valid")
+            return vote
+    except ValidationError:
+        pass
+    fixed, _ = repair_vote_fields(data, candidates)
+    try:
+        vote = GuessWhoIsWolf.model_validate(fixed)
+    except ValidationError:
+        stats.record("vote_invalid")
+        return None
+    stats.record("vote_repaired")
+    return vote
+
+
+class VoteOutputParser(BaseOutputParser):
+    """
+    Vote parser for one turn's candidates, repairing replies locally.
+
+    Returns None instead of raising when nothing can be read from the
+    reply, so the player can re-ask.
+    """
+
+    candidates: tuple
+
+    def parse(self, text):
+        return parse_vote(text, self.candidates)
+
+    def get_format_instructions(self):
+        return vote_format_instructions(self.candidates)
+
+    @property
+    def _type(self):
+        return "vote"
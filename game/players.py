@@ -2,152 +2,372 @@
 Player logic and role-based behavior for the Werewolf game.
 """
 
-from langchain.prompts import ChatPromptTemplate
-from langchain.output_parsers import PydanticOutputParser
-from .state import ROLES, RULES, GuessWhoIsWolf
+from langchain_core.exceptions import OutputParserException
+from pydantic import ValidationError
+from .prompts import get_player_chains, player_inputs, call_config, reask_config
+from .context import render_history
+from .events import Speech, SpeechToken, Vote, resolve
+from .parsing import PARSE_STATS, repair_vote_fields
+from .state import ROLES
 
 
-def run_player_turn(state, player_number, llm):
+def _record_speech(state, player_number, content, events=None):
+    """Report a player's statement and add it to the public history."""
+    state['history'].append(f"player {player_number}: {content}")
+    resolve(events).emit(Speech(player=player_number, content=content))
+
+
+def _speech_chunk(chunk, player_number, parts, events=None):
+    """
+    Collect one streamed chunk of a turn and report its speech tokens.
+    
+    Args:
+        chunk: Message chunk of the speech chain, or a dict with a
+            "speech" chunk and/or the "vote" from the speech_and_vote chain
+        player_number: Speaking player
+        parts: List the speech text is collected into
+        events: Optional EventBus to report the tokens to
+    
+    Returns:
+        The vote, if the chunk carried it
+    """
+    guess = None
+    if isinstance(chunk, dict):
+        guess = chunk.get("vote")
+        chunk = chunk.get("speech")
+    if chunk is not None and chunk.content:
+        parts.append(chunk.content)
+        resolve(events).emit(SpeechToken(player=player_number, text=chunk.content))
+    return guess
+
+
+# Errors that make a single-call turn fall back to two calls
+_TURN_ERRORS = (OutputParserException, ValidationError, ValueError)
+
+
+# Times a player is asked for a vote before abstaining
+VOTE_ASKS = 2
+
+
+def _single_call_result(result, candidates):
+    """Count the outcome of a single-call turn and repair its vote; None means fall back."""
+    if result is None:
+        PARSE_STATS.record("single_call_failed")
+        return None
+    PARSE_STATS.record("single_call_ok")
+    fixed, _ = repair_vote_fields(result.model_dump(), candidates)
+    # SpeechAndVote has no question field, so only the vote itself counts
+    changed = (fixed["guessed_wolf"], fixed["percentage_assureness"]) != \
+        (result.guessed_wolf, result.percentage_assureness)
+    PARSE_STATS.record("vote_repaired" if changed else "vote_valid")
+    return type(result)(**fixed) if changed else result
+
+
+def _single_call_turn(chains, inputs, config):
+    """Return the SpeechAndVote of a single-call turn, or None if it did not parse."""
+    try:
+        result = chains.turn.invoke(inputs, config=config)
+    except _TURN_ERRORS:
+        result = None
+    return _single_call_result(result, inputs["vote_candidates"])
+
+
+async def _asingle_call_turn(chains, inputs, config):
+    """Async version of _single_call_turn."""
+    try:
+        result = await chains.turn.ainvoke(inputs, config=config)
+    except _TURN_ERRORS:
+        result = None
+    return _single_call_result(result, inputs["vote_candidates"])
+
+
+def _ask_vote(chains, inputs, config, guess=None, asked=False):
+    """
+    Return the player's vote, asking for it if needed.
+    
+    A reply the vote parser could not read even after local repair is
+    re-asked once, tagged with its attempt number for telemetry; after
+    that the player abstains (None).
+    
+    Args:
+        chains: PlayerChains of the model
+        inputs: Prompt variables of the turn
+        config: Run config of the turn
+        guess: Vote already obtained, if any
+        asked: Whether the vote was already asked for (and gave guess)
+    
+    Returns:
+        The vote, or None
+    """
+    for attempt in range(int(asked), VOTE_ASKS):
+        if guess is not None:
+            break
+        if attempt:
+            PARSE_STATS.record("vote_reasked")
+        guess = chains.vote.invoke(inputs, config=reask_config(config, attempt) if attempt else config)
+    return guess
+
+
+async def _aask_vote(chains, inputs, config, guess=None, asked=False):
+    """Async version of _ask_vote."""
+    for attempt in range(int(asked), VOTE_ASKS):
+        if guess is not None:
+            break
+        if attempt:
+            PARSE_STATS.record("vote_reasked")
+        guess = await chains.vote.ainvoke(inputs, config=reask_config(config, attempt) if attempt else config)
+    return guess
+
+
+def _record_vote(state, vote, player_number=None, events=None):
+    """Report a player's wolf guess and count it if the player is confident."""
+    if vote is None:
+        # No readable vote: the player abstains
+        return
+    
+    counted = vote.percentage_assureness > 50
+    if counted:
+        state["voted_to_leave"].append(vote.guessed_wolf)
+    
+    resolve(events).emit(Vote(
+        player=player_number,
+        guessed_wolf=vote.guessed_wolf,
+        confidence=vote.percentage_assureness,
+        reason=vote.description,
+        counted=counted,
+    ))
+
+
+def run_player_turn(state, player_number, llm, vote=True, parallel=False, context=None, events=None,
+                    stream=False, single_call=False):
     """
     Execute a player's turn in the game.
     
     Args:
         state: Current game state
-        player_number: Player number (1-6)
+        player_number: Player number
         llm: Language model instance
+        vote: Whether the player also votes during the turn. When False,
+            votes are expected to be gathered by collect_round_votes.
+        parallel: Run the speech and vote calls at the same time. The vote
+            prompt only sees the history from before the speech, so the
+            outcome is the same as running them one after the other.
+        context: Optional HistoryContext bounding the history sent in
+            the prompts; without one the whole transcript is sent
+        events: Optional EventBus to report the turn to; defaults to
+            the console
+        stream: Stream the speech and report its tokens as SpeechToken
+            events while it is generated; the history gets the full text
+            once the stream completes
+        single_call: Ask for the speech and the vote in one structured
+            call (takes precedence over ``parallel`` and ``stream``).
+            If its output does not parse, the turn falls back to the
+            two-call path; PARSE_STATS counts both outcomes.
     
     Returns:
         Updated game state
     """
-    player_role = ROLES[player_number]
-    history_str = "\n".join(state["history"])
+    history_str = render_history(state, context)
     
     state['turn'] = player_number
     
-    # First prompt for player response
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", 
-         "You are playing werewolf. Rules: {rules}. "
-         "You are player {player_number} and your role is {role}."),
-        ("human", 
-         """Conversation so far:\n\n{history}\n\n. 
-         Please respond as your role and if you are a wolf never 
-         realve yourslef and pretend and act like a villeger. if
-         you are a villeger don't say I'm a doctor or sth. Just say I'm 
-         a villeger. your target should be from players {alive_players} who is most likely to be shown as a wolf to decieve villegers.
-     players {dead_players} are already dead and not in the game and should not pick these.
-         you should challenge others and convince the villegers. you should know that {your_teammates_if_wolf}.
-         leave clear statements and shortly.  please diverge the blames and attention from
-         your teammates (other wolves if you are a wolf) and defend yourself or teammates.
-         
-         """)
-    ])
-
-    chain = prompt | llm
-    
-    # Determine teammate information for wolves
-    if player_number == 1:
-        other_wolves_teammates = "player 2 is a wolf too and is your teammate and you should protect him and diverge the attention from him"
-    elif player_number == 2:
-        other_wolves_teammates = "player 1 is a wolf too and is your teammate and you should protect him and diverge the attention from him"
+    chains = get_player_chains(llm)
+    inputs = player_inputs(state, player_number, history_str)
+    config = call_config(state, player_number)
+    speech = chains.speech_and_vote if vote and parallel else chains.speech
+    guess = None
+    turn = _single_call_turn(chains, inputs, config) if vote and single_call else None
+    if turn is not None:
+        content, guess = turn.speech, turn
+    elif stream:
+        parts = []
+        for chunk in speech.stream(inputs, config=config):
+            guess = _speech_chunk(chunk, player_number, parts, events) or guess
+        content = "".join(parts)
+    elif vote and parallel:
+        results = speech.invoke(inputs, config=config)
+        content, guess = results["speech"].content, results["vote"]
     else:
-        other_wolves_teammates = "you don't know for sure who is a wolf and should find out by guessing from hisoty of conversation and putting pressure on a suspect you think would be a wolf candidate"   
-
-    response = chain.invoke({
-        "player_number": player_number,
-        "role": player_role,
-        "rules": RULES,
-        "history": history_str,
-        "alive_players": state["alive_players"],
-        "dead_players": state["dead_players"],
-        "your_teammates_if_wolf": other_wolves_teammates
-    })
-    
-    print(f'player {player_number}): {response.content}')
-    state['history'].append(f"player {player_number}: {response.content}")
-    
-    # Add to debug log if it exists
-    if 'debug_log' not in state:
-        state['debug_log'] = []
-    state['debug_log'].append(f'player {player_number}): {response.content}')
-    
-    # Second prompt for wolf guessing
-    parser = PydanticOutputParser(pydantic_object=GuessWhoIsWolf)
-
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", 
-     "You are a professional werewolf player who strictly follows the rules: {rules}. "
-     "You MUST respond with valid JSON ONLY — no additional text, no markdown. "
-     "{format_instructions}"),
-
-        ("human", 
-         """you are player {player_number}, based on the flow of conversations:{history} and the fact
-         that you should avoid blames on yourself (who is player {player_number}), which one of other players do you think can be a wolf?
-            Your role is: {role}. you should know that {your_teammates_if_wolf}.
-     If your role is wolf  pick a villeger from players {alive_players} who is most likely to be shown as a wolf to decieve villegers.
-     players {dead_players} are already dead and not in the game and should not pick these.
-    """)
-    ])
-
-    prompt = prompt.partial(format_instructions=parser.get_format_instructions())
-    chain = prompt | llm | parser
-
-    response_2 = chain.invoke({
-        "player_number": player_number,
-        "role": ROLES[player_number],
-        "rules": RULES,
-        "history": history_str,
-        "alive_players": state["alive_players"],
-        "dead_players": state["dead_players"],
-        "your_teammates_if_wolf": other_wolves_teammates
-    })
-    
-    print(f'--> self thoughts and strategies in the brain of this player (not added in game): I think, player {response_2.guessed_wolf} with conf={response_2.percentage_assureness}% is a wolf. The reason: {response_2.description}')
-    
-    # Add to debug log if it exists
-    if 'debug_log' not in state:
-        state['debug_log'] = []
-    state['debug_log'].append(f'--> self thoughts and strategies in the brain of this player (not added in game): I think, player {response_2.guessed_wolf} with conf={response_2.percentage_assureness}% is a wolf. The reason: {response_2.description}')
-    
-    if response_2.percentage_assureness > 50:
-        state["voted_to_leave"].append(response_2.guessed_wolf)
+        content = speech.invoke(inputs, config=config).content
+    
+    _record_speech(state, player_number, content, events)
+    
+    if vote:
+        guess = _ask_vote(chains, inputs, config, guess, asked=parallel)
+        _record_vote(state, guess, player_number, events)
 
     return state
 
 
-def create_player_functions(llm):
+async def arun_player_turn(state, player_number, llm, vote=True, parallel=False, context=None, events=None,
+                           stream=False, single_call=False):
+    """
+    Async version of run_player_turn.
+    
+    Uses ``ainvoke`` so the event loop stays free while waiting on the
+    provider; see run_player_turn for the arguments.
+    
+    Returns:
+        Updated game state
+    """
+    history_str = render_history(state, context)
+    
+    state['turn'] = player_number
+    
+    chains = get_player_chains(llm)
+    inputs = player_inputs(state, player_number, history_str)
+    config = call_config(state, player_number)
+    speech = chains.speech_and_vote if vote and parallel else chains.speech
+    guess = None
+    turn = await _asingle_call_turn(chains, inputs, config) if vote and single_call else None
+    if turn is not None:
+        content, guess = turn.speech, turn
+    elif stream:
+        parts = []
+        async for chunk in speech.astream(inputs, config=config):
+            guess = _speech_chunk(chunk, player_number, parts, events) or guess
+        content = "".join(parts)
+    elif vote and parallel:
+        results = await speech.ainvoke(inputs, config=config)
+        content, guess = results["speech"].content, results["vote"]
+    else:
+        content = (await speech.ainvoke(inputs, config=config)).content
+    
+    _record_speech(state, player_number, content, events)
+    
+    if vote:
+        guess = await _aask_vote(chains, inputs, config, guess, asked=parallel)
+        _record_vote(state, guess, player_number, events)
+
+    return state
+
+
+def collect_round_votes(state, llm, max_concurrency=None, context=None, events=None):
+    """
+    Collect the end-of-round votes of every alive player at once.
+    
+    The vote prompts are sent together with ``batch`` so a round costs
+    about one vote round trip instead of one per player.
+    
+    Args:
+        state: Current game state
+        llm: Language model instance
+        max_concurrency: Maximum number of vote calls in flight, or None
+            for no limit
+        context: Optional HistoryContext bounding the history sent in
+            the prompts
+        events: Optional EventBus to report the votes to
+    
+    Returns:
+        Updated game state
+    """
+    history_str = render_history(state, context)
+    voters = [p for p in state["alive_players"] if p not in state["dead_players"]]
+    chains = get_player_chains(llm)
+    inputs = [player_inputs(state, p, history_str) for p in voters]
+    configs = [dict(call_config(state, p), max_concurrency=max_concurrency) for p in voters]
+    
+    votes = chains.vote.batch(inputs, config=configs)
+    
+    # Re-ask the votes that could not be read, together
+    retry = [i for i, vote in enumerate(votes) if vote is None]
+    if retry:
+        PARSE_STATS.record("vote_reasked", len(retry))
+        retried = chains.vote.batch([inputs[i] for i in retry], config=[reask_config(configs[i], 1) for i in retry])
+        for i, vote in zip(retry, retried):
+            votes[i] = vote
+    
+    for player_number, vote in zip(voters, votes):
+        _record_vote(state, vote, player_number, events)
+    
+    return state
+
+
+async def acollect_round_votes(state, llm, max_concurrency=None, context=None, events=None):
+    """
+    Async version of collect_round_votes, built on ``abatch``.
+    
+    Returns:
+        Updated game state
+    """
+    history_str = render_history(state, context)
+    voters = [p for p in state["alive_players"] if p not in state["dead_players"]]
+    chains = get_player_chains(llm)
+    inputs = [player_inputs(state, p, history_str) for p in voters]
+    configs = [dict(call_config(state, p), max_concurrency=max_concurrency) for p in voters]
+    
+    votes = await chains.vote.abatch(inputs, config=configs)
+    
+    retry = [i for i, vote in enumerate(votes) if vote is None]
+    if retry:
+        PARSE_STATS.record("vote_reasked", len(retry))
+        retried = await chains.vote.abatch([inputs[i] for i in retry], config=[reask_config(configs[i], 1) for i in retry])
+        for i, vote in zip(retry, retried):
+            votes[i] = vote
+    
+    for player_number, vote in zip(voters, votes):
+        _record_vote(state, vote, player_number, events)
+    
+    return state
+
+
+def create_player_functions(llm, vote=True, parallel=False, context=None, events=None, stream=False,
+                            single_call=False, players=None):
     """
     Create player function closures with the LLM instance.
     
     Args:
         llm: Language model instance
+        vote: Whether players vote during their own turn
+        parallel: Whether each turn runs its speech and vote calls together
+        context: Optional HistoryContext shared by all players
+        events: Optional EventBus shared by all players
+        stream: Whether speeches are streamed token by token
+        single_call: Whether each turn asks for speech and vote in one call
+        players: Player numbers to create nodes for; defaults to the
+            players of ROLES
     
     Returns:
         Dictionary of player functions
     """
-    def player_1(state):
-        return run_player_turn(state, player_number=1, llm=llm)
+    # Build the chains once up front so no turn pays for it; the player
+    # functions keep them alive for as long as the graph exists
+    chains = get_player_chains(llm)
 
-    def player_2(state):
-        return run_player_turn(state, player_number=2, llm=llm)
+    def make_player(player_number):
+        def player(state):
+            return run_player_turn(state, player_number=player_number, llm=llm, vote=vote, parallel=parallel, context=context, events=events, stream=stream, single_call=single_call)
+        player.chains = chains
+        return player
 
-    def player_3(state):
-        return run_player_turn(state, player_number=3, llm=llm)
+    return {f"player_{n}": make_player(n) for n in (players or sorted(ROLES))}
 
-    def player_4(state):
-        return run_player_turn(state, player_number=4, llm=llm)
 
-    def player_5(state):
-        return run_player_turn(state, player_number=5, llm=llm)
+def create_async_player_functions(llm, vote=True, parallel=False, context=None, events=None, stream=False,
+                                  single_call=False, players=None):
+    """
+    Create async player node functions with the LLM instance.
+    
+    Args:
+        llm: Language model instance
+        vote: Whether players vote during their own turn
+        parallel: Whether each turn runs its speech and vote calls together
+        context: Optional HistoryContext shared by all players
+        events: Optional EventBus shared by all players
+        stream: Whether speeches are streamed token by token
+        single_call: Whether each turn asks for speech and vote in one call
+        players: Player numbers to create nodes for; defaults to the
+            players of ROLES
+    
+    Returns:
+        Dictionary of async player functions
+    """
+    chains = get_player_chains(llm)
 
-    def player_6(state):
-        return run_player_turn(state, player_number=6, llm=llm)
+    def make_player(player_number):
+        async def player(state):
+            return await arun_player_turn(state, player_number=player_number, llm=llm, vote=vote, parallel=parallel, context=context, events=events, stream=stream, single_call=single_call)
+        player.chains = chains
+        return player
 
-    return {
-        "player_1": player_1,
-        "player_2": player_2,
-        "player_3": player_3,
-        "player_4": player_4,
-        "player_5": player_5,
-        "player_6": player_6,
-    } 
\ No newline at end of file
+    return {f"player_{n}": make_player(n) for n in (players or sorted(ROLES))}
@@ -0,0 +1,265 @@
+"""
+Prompt registry for the Werewolf game.
+
+The prompt templates, the vote parser and its format instructions are
+built once at import time. Chains are built once per language model and
+shared by every turn and every game that uses that model, for as long
+as something (a game graph, a runner) holds on to them.
+"""
+
+import weakref
+from dataclasses import dataclass
+from functools import lru_cache
+from langchain.prompts import ChatPromptTemplate
+from langchain.output_parsers import PydanticOutputParser
+from langchain_core.runnables import RunnableLambda, RunnableParallel
+from .parsing import VoteOutputParser
+from .state import ROLES, RULES, GuessWhoIsWolf, SpeechAndVote, roles_of
+
+
+# Prompt for a player's public statement
+SPEECH_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", 
+     "You are playing werewolf. Rules: {rules}. "
+     "You are player {player_number} and your role is {role}."),
+    ("human", 
+     """Conversation so far:\n\n{history}\n\n. 
+         Please respond as your role and if you are a wolf never 
+         realve yourslef and pretend and act like a villeger. if
+         you are a villeger don't say I'm a doctor or sth. Just say I'm 
+         a villeger. your target should be from players {alive_players} who is most likely to be shown as a wolf to decieve villegers.
+     players {dead_players} are already dead and not in the game and should not pick these.
+         you should challenge others and convince the villegers. you should know that {your_teammates_if_wolf}.
+         leave clear statements and shortly.  please diverge the blames and attention from
+         your teammates (other wolves if you are a wolf) and defend yourself or teammates.
+         
+         """)
+]).partial(rules=str(RULES))
+
+# Parser for a player's private wolf guess
+VOTE_PARSER = PydanticOutputParser(pydantic_object=GuessWhoIsWolf)
+
+# Prompt for a player's private wolf guess
+VOTE_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", 
+ "You are a professional werewolf player who strictly follows the rules: {rules}. "
+ "You MUST respond with valid JSON ONLY — no additional text, no markdown. "
+ "{format_instructions}"),
+
+    ("human", 
+     """you are player {player_number}, based on the flow of conversations:{history} and the fact
+         that you should avoid blames on yourself (who is player {player_number}), which one of other players do you think can be a wolf?
+            Your role is: {role}. you should know that {your_teammates_if_wolf}.
+     If your role is wolf  pick a villeger from players {alive_players} who is most likely to be shown as a wolf to decieve villegers.
+     players {dead_players} are already dead and not in the game and should not pick these.
+    """)
+]).partial(rules=str(RULES), format_instructions=VOTE_PARSER.get_format_instructions())
+
+
+# Parser for a whole turn made in one call
+TURN_PARSER = PydanticOutputParser(pydantic_object=SpeechAndVote)
+
+# Prompt for a player's statement and private wolf guess in one call
+TURN_PROMPT = ChatPromptTemplate.from_messages([
+    ("system",
+     "You are playing werewolf. Rules: {rules}. "
+     "You are player {player_number} and your role is {role}. "
+     "You MUST respond with valid JSON ONLY — no additional text, no markdown. "
+     "{format_instructions}"),
+
+    ("human",
+     """Conversation so far:\n\n{history}\n\n.
+     First, in "speech", respond as your role and if you are a wolf never realve yourslef and
+     pretend and act like a villeger. if you are a villeger don't say I'm a doctor or sth. Just say
+     I'm a villeger. you should challenge others and convince the villegers, leave clear statements
+     and shortly. you should know that {your_teammates_if_wolf}.
+     Then, privately and not shared with the others, pick in "guessed_wolf" from players
+     {alive_players} the one other than you (player {player_number}) you think can be a wolf. If your
+     role is wolf pick a villeger who is most likely to be shown as a wolf to decieve villegers.
+     players {dead_players} are already dead and not in the game and should not pick these.
+    """)
+]).partial(rules=str(RULES), format_instructions=TURN_PARSER.get_format_instructions())
+
+
+def teammates_info(player_number, roles=None):
+    """Return what a player knows about the other wolves, for any number of wolves."""
+    roles = roles or ROLES
+    if 'wolf' not in roles[player_number]:
+        return "you don't know for sure who is a wolf and should find out by guessing from hisoty of conversation and putting pressure on a suspect you think would be a wolf candidate"
+    teammates = [p for p, role in sorted(roles.items()) if 'wolf' in role and p != player_number]
+    if not teammates:
+        return "you are the only wolf and should diverge the attention from yourself"
+    if len(teammates) == 1:
+        return f"player {teammates[0]} is a wolf too and is your teammate and you should protect him and diverge the attention from him"
+    names = ", ".join(map(str, teammates[:-1])) + f" and {teammates[-1]}"
+    return f"players {names} are wolves too and are your teammates and you should protect them and diverge the attention from them"
+
+
+@lru_cache(maxsize=None)
+def _player_profiles(roles):
+    roles = dict(roles)
+    return {
+        player_number: {
+            "player_number": player_number,
+            "role": role,
+            "your_teammates_if_wolf": teammates_info(player_number, roles),
+        }
+        for player_number, role in roles.items()
+    }
+
+
+def player_profiles(roles=None):
+    """Return the per-player prompt variables of a role table, built once per table."""
+    return _player_profiles(tuple(sorted((roles or ROLES).items())))
+
+
+# Per-player prompt variables that never change during a game
+PLAYER_PROFILES = player_profiles()
+
+
+def vote_candidates(state, player_number):
+    """Return the players a player may vote for: alive and not themselves."""
+    dead = state.get("dead_players") or []
+    candidates = tuple(p for p in state["alive_players"] if p != player_number and p not in dead)
+    return candidates or tuple(state["alive_players"])
+
+
+def player_inputs(state, player_number, history_str):
+    """
+    Build the prompt variables shared by the speech and vote chains.
+    
+    Args:
+        state: Current game state
+        player_number: Player number
+        history_str: Conversation history to show the player
+    
+    Returns:
+        Dictionary of prompt variables, plus the turn's vote candidates
+    """
+    return {
+        **player_profiles(roles_of(state))[player_number],
+        "history": history_str,
+        "alive_players": state["alive_players"],
+        "dead_players": state["dead_players"],
+        "vote_candidates": vote_candidates(state, player_number),
+    }
+
+
+def call_config(state, player_number, callbacks=None):
+    """
+    Build the run config for a player's model calls.
+    
+    The player and round are attached as metadata so telemetry can
+    attribute every call.
+    
+    Args:
+        state: Current game state
+        player_number: Player number
+        callbacks: Optional callback handlers for the calls
+    
+    Returns:
+        Run config dictionary
+    """
+    config = {"metadata": {"player": player_number, "round": state.get("current_iter")}}
+    if callbacks:
+        config["callbacks"] = callbacks
+    return config
+
+
+def reask_config(config, attempt):
+    """
+    Return a copy of a run config that tags its calls as a re-ask.
+    
+    Args:
+        config: Run config of the turn (see call_config)
+        attempt: Number of the attempt; 0 is the first ask
+    
+    Returns:
+        Run config dictionary
+    """
+    return dict(config, metadata=dict(config.get("metadata") or {}, attempt=attempt))
+
+
+@dataclass(frozen=True)
+class PlayerChains:
+    """The chains a player turn runs against one language model."""
+    speech: object
+    vote: object
+    speech_and_vote: object
+    turn: object
+
+
+def vote_chain(llm):
+    """
+    Return the vote chain of a language model.
+    
+    Each turn's call gets format instructions and a parser that only
+    allow that turn's vote candidates. The chain returns None when no
+    vote can be read from the reply, even after local repair.
+    
+    Args:
+        llm: Language model instance
+    
+    Returns:
+        Runnable taking player_inputs and producing a vote or None
+    """
+    def route(inputs):
+        parser = VoteOutputParser(candidates=tuple(inputs["vote_candidates"]))
+        return VOTE_PROMPT.partial(format_instructions=parser.get_format_instructions()) | llm | parser
+    
+    return RunnableLambda(route, name="vote")
+
+
+def structured_turn(llm):
+    """
+    Return a runnable turning a rendered turn prompt into a SpeechAndVote.
+    
+    Uses the model's native JSON mode or structured output when it has
+    one, and otherwise parses the JSON the prompt asks for.
+    
+    Args:
+        llm: Language model instance
+    
+    Returns:
+        Runnable producing SpeechAndVote
+    """
+    for kwargs in ({"method": "json_mode"}, {}):
+        try:
+            return llm.with_structured_output(SpeechAndVote, **kwargs)
+        except (NotImplementedError, ValueError, TypeError):
+            continue
+    return llm | TURN_PARSER
+
+
+# Chains per language model, keyed by id() since models are not hashable.
+# Entries only live while something holds the chains (the player nodes of
+# a graph, a runner), so models of finished games are not kept around.
+# The chains hold their model, so its id cannot be reused meanwhile.
+_CHAINS = weakref.WeakValueDictionary()
+
+
+def get_player_chains(llm):
+    """
+    Return the speech, vote and single-call turn chains for a language model.
+    
+    The chains are built on first use and reused while the caller, or
+    anything else, keeps a reference to them.
+    
+    Args:
+        llm: Language model instance
+    
+    Returns:
+        PlayerChains for the model
+    """
+    chains = _CHAINS.get(id(llm))
+    if chains is None:
+        # The phase tags every model call for telemetry
+        speech = (SPEECH_PROMPT | llm).with_config(metadata={"phase": "speech"})
+        vote = vote_chain(llm).with_config(metadata={"phase": "vote"})
+        chains = _CHAINS[id(llm)] = PlayerChains(
+            speech=speech,
+            vote=vote,
+            speech_and_vote=RunnableParallel(speech=speech, vote=vote),
+            turn=(TURN_PROMPT | structured_turn(llm)).with_config(metadata={"phase": "turn"}),
+        )
+    return chains
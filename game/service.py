@@ -0,0 +1,508 @@
+"""
+Multi-tenant game service: many isolated games in one process.
+
+GameService hosts games on a thread pool. Every game has its own graph,
+state and output channel, while all of them share one LLM client whose
+calls go through a FairScheduler: a global limit on calls in flight,
+handed out round-robin between the games waiting for one, so a busy
+game cannot starve the others.
+
+The service can be used in-process (the Streamlit app shares the LLM
+client and scheduler the same way) or exposed over HTTP with
+``serve()``, which streams each game's events as Server-Sent Events.
+"""
+
+import asyncio
+import contextvars
+import json
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langgraph.errors import GraphRecursionError
+from pydantic import PrivateAttr
+
+from .budget import BudgetGovernor
+from .events import EventBus, RingBufferSink
+from .game_logic import game_winner
+from .graph import create_game_graph, default_recursion_limit
+from .simulate import create_initial_state
+
+
+# Game on whose behalf the current thread or task calls the LLM
+current_game = contextvars.ContextVar("current_game", default=None)
+
+
+class _AsyncTicket:
+    """Place in line of a coroutine waiting for a FairScheduler slot."""
+
+    __slots__ = ("game_id", "future", "granted")
+
+    def __init__(self, game_id, future):
+        self.game_id = game_id
+        self.future = future
+        self.granted = False
+
+
+def _wake(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class FairScheduler:
+    """
+    Global limit on LLM calls in flight, shared fairly between games.
+
+    Waiting calls queue per game. Whenever a slot frees up it goes to
+    the game that was served least recently, so every game with work
+    waiting gets a call through in turn. Threads wait with acquire and
+    coroutines with aacquire, in the same line.
+    """
+
+    def __init__(self, max_concurrency=4):
+        self.max_concurrency = max_concurrency
+        self.in_flight = 0
+        self._cond = threading.Condition()
+        self._queues = OrderedDict()
+
+    def _next_ticket(self):
+        for waiting in self._queues.values():
+            return waiting[0]
+        return None
+
+    def _take(self, game_id):
+        """Give the first waiting call of a game a slot; the lock is held."""
+        waiting = self._queues[game_id]
+        waiting.popleft()
+        # Served games go to the back of the line
+        del self._queues[game_id]
+        if waiting:
+            self._queues[game_id] = waiting
+        self.in_flight += 1
+
+    def _dispatch(self):
+        """Hand free slots to coroutines at the head of the line and wake
+        the waiting threads; the lock is held."""
+        while self.in_flight < self.max_concurrency:
+            ticket = self._next_ticket()
+            if not isinstance(ticket, _AsyncTicket):
+                break
+            self._take(ticket.game_id)
+            ticket.granted = True
+            ticket.future.get_loop().call_soon_threadsafe(_wake, ticket.future)
+        self._cond.notify_all()
+
+    def acquire(self, game_id):
+        """Block until the game may make one more call."""
+        ticket = object()
+        with self._cond:
+            self._queues.setdefault(game_id, deque()).append(ticket)
+            self._dispatch()
+            while self.in_flight >= self.max_concurrency or self._next_ticket() is not ticket:
+                self._cond.wait()
+            self._take(game_id)
+            self._dispatch()
+
+    async def aacquire(self, game_id):
+        """
+        Wait, without holding a thread, until the game may make one more
+        call.
+
+        A coroutine cancelled while it waits gives up its place in line,
+        or its slot if it was just granted one.
+        """
+        ticket = _AsyncTicket(game_id, asyncio.get_running_loop().create_future())
+        with self._cond:
+            self._queues.setdefault(game_id, deque()).append(ticket)
+            self._dispatch()
+        try:
+            await ticket.future
+        except asyncio.CancelledError:
+            with self._cond:
+                if ticket.granted:
+                    self.in_flight -= 1
+                else:
+                    waiting = self._queues[game_id]
+                    waiting.remove(ticket)
+                    if not waiting:
+                        del self._queues[game_id]
+                self._dispatch()
+            raise
+
+    def release(self):
+        """Free the slot taken by acquire or aacquire."""
+        with self._cond:
+            self.in_flight -= 1
+            self._dispatch()
+
+    @contextmanager
+    def slot(self, game_id):
+        self.acquire(game_id)
+        try:
+            yield
+        finally:
+            self.release()
+
+
+class ScheduledLLM(BaseChatModel):
+    """
+    Chat model wrapper that takes a FairScheduler slot for every call.
+
+    Calls are attributed to the game in ``current_game``, or to the
+    calling thread when no game is set (one Streamlit session per
+    thread).
+    """
+
+    llm: Any
+
+    _scheduler: Any = PrivateAttr(default=None)
+
+    def __init__(self, llm, scheduler=None, **kwargs):
+        super().__init__(llm=llm, **kwargs)
+        self._scheduler = scheduler or FairScheduler()
+
+    @property
+    def scheduler(self):
+        return self._scheduler
+
+    @property
+    def _llm_type(self):
+        return "scheduled"
+
+    def _game(self):
+        game_id = current_game.get()
+        return game_id if game_id is not None else threading.get_ident()
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        with self._scheduler.slot(self._game()):
+            return self.llm._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        await self._scheduler.aacquire(self._game())
+        try:
+            return await self.llm._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        finally:
+            self._scheduler.release()
+
+    def _should_stream(self, *, async_api, run_manager=None, **kwargs):
+        # Stream only if the wrapped model can
+        return self.llm._should_stream(async_api=async_api, run_manager=run_manager, **kwargs)
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        with self._scheduler.slot(self._game()):
+            yield from self.llm._stream(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        await self._scheduler.aacquire(self._game())
+        try:
+            async for chunk in self.llm._astream(messages, stop=stop, run_manager=run_manager, **kwargs):
+                yield chunk
+        finally:
+            self._scheduler.release()
+
+
+class Channel:
+    """
+    Per-game output channel: a bounded backlog plus live subscribers.
+
+    Used as an event sink. A subscriber first gets the backlog, then
+    every new event, then None once the channel is closed.
+    """
+
+    def __init__(self, maxlen=500):
+        self.backlog = RingBufferSink(maxlen)
+        self.closed = False
+        self._subscribers = []
+        self._lock = threading.Lock()
+
+    def __call__(self, event):
+        with self._lock:
+            self.backlog(event)
+            for subscriber in self._subscribers:
+                subscriber.put(event)
+
+    def subscribe(self):
+        """Return a queue with the backlog and all future events."""
+        subscriber = queue.Queue()
+        with self._lock:
+            for event in self.backlog.events:
+                subscriber.put(event)
+            if self.closed:
+                subscriber.put(None)
+            else:
+                self._subscribers.append(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            if subscriber in self._subscribers:
+                self._subscribers.remove(subscriber)
+
+    def close(self):
+        with self._lock:
+            self.closed = True
+            for subscriber in self._subscribers:
+                subscriber.put(None)
+            self._subscribers.clear()
+
+
+class HostedGame:
+    """One game hosted by the service."""
+
+    def __init__(self, game_id, channel):
+        self.id = game_id
+        self.channel = channel
+        self.status = "queued"
+        self.state = None
+        self.winner = None
+        self.error = None
+        self.usage = None
+        self.created = time.time()
+        self.finished = None
+        self.done = threading.Event()
+
+    def to_dict(self):
+        state = self.state or {}
+        return {
+            "id": self.id,
+            "status": self.status,
+            "winner": self.winner,
+            "error": self.error,
+            "usage": self.usage,
+            "round": state.get("current_iter"),
+            "alive_players": list(state.get("alive_players", [])),
+            "dead_players": list(state.get("dead_players", [])),
+            "events": self.channel.backlog.total,
+        }
+
+
+class GameService:
+    """Hosts many concurrent, isolated games sharing one LLM client."""
+
+    def __init__(self, llm, max_concurrent_calls=4, max_games=32, recursion_limit=None,
+                 event_buffer=500, budget=None, keep_finished=100, finished_ttl=3600, **graph_settings):
+        """
+        Args:
+            llm: Language model shared by every game
+            max_concurrent_calls: Global limit on LLM calls in flight
+            max_games: Maximum number of games running at once; more are
+                queued
+            recursion_limit: Recursion limit of each game's graph; by
+                default what the role table needs (see
+                default_recursion_limit)
+            event_buffer: Events each game keeps for late subscribers
+            budget: Optional Budget capping each game; a game that
+                reaches it ends with status "budget_exhausted"
+            keep_finished: Finished games kept for lookup; the oldest
+                are dropped first
+            finished_ttl: Seconds a finished game is kept, or None to
+                keep it until keep_finished pushes it out
+            **graph_settings: Passed to create_game_graph (e.g. vote_mode,
+                parallel, context, roles)
+        """
+        self.scheduler = FairScheduler(max_concurrent_calls)
+        self.llm = ScheduledLLM(llm, scheduler=self.scheduler)
+        self.recursion_limit = recursion_limit
+        self.event_buffer = event_buffer
+        self.budget = budget
+        self.keep_finished = keep_finished
+        self.finished_ttl = finished_ttl
+        self.graph_settings = graph_settings
+        self.games = {}
+        self._executor = ThreadPoolExecutor(max_workers=max_games, thread_name_prefix="werewolf-game")
+        self._lock = threading.Lock()
+
+    def start_game(self, initial_state=None):
+        """
+        Queue a new game.
+
+        Args:
+            initial_state: Optional initial state; defaults to a new game
+
+        Returns:
+            The HostedGame
+        """
+        game = HostedGame(uuid.uuid4().hex[:12], Channel(self.event_buffer))
+        with self._lock:
+            self._prune()
+            self.games[game.id] = game
+        if initial_state is None:
+            initial_state = create_initial_state(self.graph_settings.get("roles"))
+        state = initial_state
+        self._executor.submit(contextvars.copy_context().run, self._run, game, state)
+        return game
+
+    def _prune(self):
+        """Drop expired finished games, then the oldest ones over
+        keep_finished; the lock is held."""
+        finished = sorted((g for g in self.games.values() if g.done.is_set()), key=lambda g: g.finished)
+        expired = 0
+        if self.finished_ttl is not None:
+            cutoff = time.time() - self.finished_ttl
+            expired = sum(1 for g in finished if g.finished < cutoff)
+        for game in finished[:max(expired, len(finished) - self.keep_finished)]:
+            del self.games[game.id]
+
+    def _run(self, game, state):
+        current_game.set(game.id)
+        game.status = "running"
+        app = create_game_graph(self.llm, events=EventBus([game.channel]), **self.graph_settings)
+        limit = self.recursion_limit or default_recursion_limit(
+            self.graph_settings.get("roles"), self.budget and self.budget.rounds)
+        config = {"recursion_limit": limit}
+        governor = BudgetGovernor(self.budget) if self.budget else None
+        if governor:
+            config = governor.attach(config)
+        try:
+            for values in app.stream(state, config=config, stream_mode="values"):
+                game.state = values
+            game.winner = game_winner(game.state)
+            over_budget = game.state.get("outcome") == "budget_exhausted"
+            game.status = "budget_exhausted" if over_budget else "finished"
+        except GraphRecursionError:
+            game.status, game.error = "unfinished", "recursion_limit"
+        except Exception as e:
+            game.status, game.error = "error", f"{type(e).__name__}: {e}"
+        finally:
+            if governor:
+                game.usage = governor.report(game.state)
+            game.finished = time.time()
+            game.channel.close()
+            game.done.set()
+
+    def get(self, game_id):
+        """Return a hosted game, or None."""
+        with self._lock:
+            return self.games.get(game_id)
+
+    def list_games(self):
+        with self._lock:
+            return [game.to_dict() for game in self.games.values()]
+
+    def events(self, game_id, timeout=None):
+        """
+        Yield a game's events, from its backlog until it ends.
+
+        Args:
+            game_id: Game to follow
+            timeout: Seconds to wait for the next event; on timeout None
+                is yielded so callers can send a keep-alive
+
+        Yields:
+            Events, or None on timeout
+        """
+        game = self.get(game_id)
+        if game is None:
+            raise KeyError(game_id)
+        subscriber = game.channel.subscribe()
+        try:
+            while True:
+                try:
+                    event = subscriber.get(timeout=timeout)
+                except queue.Empty:
+                    yield None
+                    continue
+                if event is None:
+                    return
+                yield event
+        finally:
+            game.channel.unsubscribe(subscriber)
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+
+def _handler(service):
+    """Build the HTTP request handler class for a service."""
+
+    class GameServiceHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _json(self, status, body):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            if self.path.rstrip("/") != "/games":
+                return self._json(404, {"error": "not found"})
+            game = service.start_game()
+            self._json(201, game.to_dict())
+
+        def do_GET(self):
+            parts = [part for part in self.path.split("?")[0].split("/") if part]
+            if parts == ["games"]:
+                return self._json(200, service.list_games())
+            if len(parts) < 2 or parts[0] != "games" or service.get(parts[1]) is None:
+                return self._json(404, {"error": "not found"})
+            game = service.get(parts[1])
+            if len(parts) == 2:
+                return self._json(200, dict(game.to_dict(), history=list((game.state or {}).get("history", []))))
+            if parts[2:] == ["events"]:
+                return self._stream(game)
+            self._json(404, {"error": "not found"})
+
+        def _stream(self, game):
+            """Send the game's events as Server-Sent Events."""
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+            try:
+                for event in service.events(game.id, timeout=15):
+                    if event is None:
+                        self.wfile.write(b": keep-alive\n\n")
+                    else:
+                        data = json.dumps(event.to_dict())
+                        self.wfile.write(f"event: {event.kind}\ndata: {data}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+                self.wfile.write(f"event: closed\ndata: {json.dumps(game.to_dict())}\n\n".encode("utf-8"))
+                self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+    return GameServiceHandler
+
+
+def serve(service, host="127.0.0.1", port=8000):
+    """
+    Serve a GameService over HTTP until interrupted.
+
+    Endpoints:
+        POST /games               start a game
+        GET  /games               list games
+        GET  /games/<id>          game status and history
+        GET  /games/<id>/events   Server-Sent Events stream of the game
+
+    Args:
+        service: GameService to expose
+        host: Interface to bind
+        port: Port to listen on
+
+    Returns:
+        The HTTP server (after it stopped)
+    """
+    server = ThreadingHTTPServer((host, port), _handler(service))
+    server.daemon_threads = True
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return server
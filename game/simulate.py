@@ -0,0 +1,223 @@
+"""
+Headless batch runner for the Werewolf game.
+
+Runs many games across a process pool with a concurrency limit, one
+seed per game and no console output, then aggregates win rates, rounds,
+votes and eliminations into a summary. This is the tool for comparing
+prompt and model changes over a large number of games.
+"""
+
+import json
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from langgraph.errors import GraphRecursionError
+
+from .budget import BudgetGovernor
+from .context import history_context
+from .events import CallbackSink, EventBus, RoundStart, Vote
+from .graph import create_game_graph, default_recursion_limit
+from .game_logic import game_winner
+from .parsing import PARSE_STATS
+from .state import ROLES, make_roles
+
+
+def create_initial_state(roles=None):
+    """Create the initial state of a simulated game; ``roles`` defaults to ROLES."""
+    roles = roles or ROLES
+    return {
+        "turn": 0,
+        "current_iter": 0,
+        "max_iter": 3,
+        "history": [],
+        "roles": dict(roles),
+        "alive_players": sorted(roles),
+        "voted_to_leave": [],
+        "dead_players": [],
+    }
+
+
+def _create_llm(spec):
+    """Build the language model for one game."""
+    if spec["llm"] == "fake":
+        from .fake_llm import FakeWerewolfLLM
+        return FakeWerewolfLLM(
+            seed=spec["seed"],
+            latency_mean=spec.get("latency_mean", 0.0),
+            latency_std=spec.get("latency_std", 0.0),
+        )
+
+    from langchain_groq import ChatGroq
+    return ChatGroq(model=spec.get("model", "llama3-8b-8192"))
+
+
+def run_one_game(spec):
+    """
+    Play one game quietly and describe its outcome.
+
+    Args:
+        spec: Game settings; ``seed``, ``llm`` ("fake" or "groq") and
+            optionally ``model``, ``vote_mode``, ``single_call``,
+            ``players``, ``wolves``, ``recursion_limit`` (by default
+            what the table needs, see default_recursion_limit),
+            ``latency_mean``, ``latency_std``, ``budget`` (a Budget
+            capping each game), and ``history_budget`` and ``keep_last``
+            (see history_context; by default the whole transcript is
+            sent)
+
+    Returns:
+        Dictionary with the game's outcome
+    """
+    # Only votes and rounds are kept; nothing is formatted or printed
+    votes = []
+    rounds = []
+    
+    def collect(event):
+        if isinstance(event, Vote):
+            votes.append(event)
+        elif isinstance(event, RoundStart):
+            rounds.append(event.round)
+    
+    events = EventBus([CallbackSink(collect)])
+    roles = make_roles(spec.get("players", 6), spec.get("wolves", 2))
+    app = create_game_graph(_create_llm(spec), vote_mode=spec.get("vote_mode", "turn"), events=events,
+                            single_call=spec.get("single_call", False), roles=roles,
+                            context=history_context(spec.get("history_budget"), spec.get("keep_last", 12)))
+    budget = spec.get("budget")
+    config = {"recursion_limit": spec.get("recursion_limit") or default_recursion_limit(roles, budget and budget.rounds)}
+    governor = BudgetGovernor(budget) if budget else None
+    if governor:
+        config = governor.attach(config)
+
+    final_state = None
+    error = None
+    parse_before = PARSE_STATS.snapshot()
+    start = time.perf_counter()
+    try:
+        for values in app.stream(create_initial_state(roles), config=config, stream_mode="values"):
+            final_state = values
+    except GraphRecursionError:
+        error = "recursion_limit"
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    duration = time.perf_counter() - start
+
+    winner = game_winner(final_state) if final_state and error is None else None
+    over_budget = bool(final_state) and final_state.get("outcome") == "budget_exhausted"
+
+    return {
+        "seed": spec["seed"],
+        "players": len(roles),
+        "winner": winner,
+        "error": error,
+        "budget_exhausted": over_budget,
+        "usage": governor.report(final_state) if governor else None,
+        "rounds": len(rounds),
+        "eliminations": list(dict.fromkeys(final_state["dead_players"])) if final_state else [],
+        "votes_cast": len(votes),
+        "votes_counted": sum(1 for vote in votes if vote.counted),
+        "parse": PARSE_STATS.since(parse_before),
+        "duration": round(duration, 4),
+    }
+
+
+def _usage_summary(usages):
+    """Mean and worst case per game of the budget usage reports, or None."""
+    if not usages:
+        return None
+    return {
+        key: {"mean": round(sum(u[key] for u in usages) / len(usages), 6), "max": max(u[key] for u in usages)}
+        for key in ("tokens", "cost", "seconds")
+    }
+
+
+def summarize(results, elapsed):
+    """
+    Aggregate per-game results into a summary.
+
+    Args:
+        results: Per-game result dictionaries from run_one_game
+        elapsed: Wall time of the whole batch in seconds
+
+    Returns:
+        Summary dictionary
+    """
+    games = len(results)
+    finished = [r for r in results if r["winner"] is not None]
+    winners = Counter(r["winner"] for r in finished)
+    rounds = [r["rounds"] for r in finished]
+    eliminated = Counter(p for r in results for p in r["eliminations"])
+    parse = Counter()
+    for r in results:
+        parse.update(r.get("parse", {}))
+
+    def rate(count, total):
+        return round(count / total, 4) if total else 0.0
+
+    return {
+        "games": games,
+        "players": sorted({r["players"] for r in results if "players" in r}),
+        "finished": len(finished),
+        "unfinished": sum(1 for r in results if r["error"] == "recursion_limit"),
+        "budget_exhausted": sum(1 for r in results if r.get("budget_exhausted")),
+        "errors": sum(1 for r in results if r["error"] not in (None, "recursion_limit")),
+        "win_rate": {
+            "villagers": rate(winners["villagers"], len(finished)),
+            "wolves": rate(winners["wolves"], len(finished)),
+        },
+        "rounds": {
+            "mean": round(sum(rounds) / len(rounds), 2) if rounds else 0.0,
+            "min": min(rounds) if rounds else 0,
+            "max": max(rounds) if rounds else 0,
+        },
+        "votes": {
+            "cast": sum(r["votes_cast"] for r in results),
+            "counted": sum(r["votes_counted"] for r in results),
+            "per_game": round(sum(r["votes_cast"] for r in results) / games, 2) if games else 0.0,
+        },
+        "eliminations": {str(p): eliminated[p] for p in sorted(eliminated)},
+        "parse": dict(sorted(parse.items())),
+        "duration": {
+            "mean": round(sum(r["duration"] for r in results) / games, 4) if games else 0.0,
+            "per_round": round(sum(r["duration"] for r in finished) / sum(rounds), 4) if sum(rounds) else 0.0,
+        },
+        "usage": _usage_summary([r["usage"] for r in results if r.get("usage")]),
+        "elapsed": round(elapsed, 3),
+        "games_per_sec": round(games / elapsed, 2) if elapsed else 0.0,
+    }
+
+
+def simulate(n_games, workers=1, seed=0, llm="fake", output=None, **settings):
+    """
+    Run a batch of games and aggregate the outcomes.
+
+    Args:
+        n_games: Number of games to play
+        workers: Number of worker processes; 1 runs the games in-process
+        seed: Seed of the first game; game i uses ``seed + i``
+        llm: "fake" for the offline model or "groq" for the real one
+        output: Optional path to write the summary to as JSON
+        **settings: Extra game settings passed to run_one_game
+
+    Returns:
+        Summary dictionary, with the per-game results under "results"
+    """
+    specs = [dict(settings, seed=seed + i, llm=llm) for i in range(n_games)]
+
+    start = time.perf_counter()
+    if workers <= 1:
+        results = [run_one_game(spec) for spec in specs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(run_one_game, specs))
+    elapsed = time.perf_counter() - start
+
+    summary = summarize(results, elapsed)
+    summary["results"] = results
+
+    if output:
+        with open(output, "w", encoding="utf-8") as fh:
+            json.dump(summary, fh, indent=2)
+
+    return summary
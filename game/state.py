@@ -2,13 +2,31 @@
 Game state definitions for the Werewolf game.
 """
 
-from typing import Dict, TypedDict, Optional, List
+from typing import Annotated, Dict, TypedDict, Optional, List
 from pydantic import BaseModel, Field
 
 
+def add_entries(entries, new):
+    """
+    Reducer of the history: nodes return only the entries they add.
+    
+    Builds a new list rather than extending the old one, so histories
+    already handed out (streamed values, checkpoints being saved) never
+    change.
+    """
+    if not entries:
+        return new
+    return entries + new if new else entries
+
+
 class GraphState(TypedDict):
-    """State structure for the LangGraph game."""
-    history: Optional[List] = None 
+    """
+    State structure for the LangGraph game.
+    
+    The history is append-only; every other key is replaced by the
+    value a node returns for it.
+    """
+    history: Annotated[Optional[List], add_entries] = None
     turn: Optional[int] = None
     max_iter: Optional[int] = 3
     topic: Optional[str] = None
@@ -16,6 +34,13 @@ class GraphState(TypedDict):
     alive_players: Optional[List] = None
     dead_players: Optional[List] = []
     voted_to_leave: Optional[List] = []
+    history_summary: Optional[List] = []
+    summarized_upto: Optional[int] = 0
+    roles: Optional[Dict[int, str]] = None
+    vote_threshold: Optional[float] = 0.5
+    # Set when a game is stopped by its budget (see game.budget)
+    outcome: Optional[str] = None
+    usage: Optional[Dict] = None
 
 
 class GuessWhoIsWolf(BaseModel):
@@ -29,6 +54,14 @@ class GuessWhoIsWolf(BaseModel):
     description: str = Field(..., description="Shortly, describe what is in you mind that you picked this player as is a wolf")
 
 
+class SpeechAndVote(BaseModel):
+    """Pydantic model for a whole player turn made in one call."""
+    speech: str = Field(..., description="What you say to the other players, shortly and clearly")
+    guessed_wolf: int = Field(..., description="The player number you privately think is a wolf")
+    percentage_assureness: int = Field(..., description="what is the percentage of the player you are sure to be wolf")
+    description: str = Field(..., description="Shortly, describe what is in you mind that you picked this player as is a wolf")
+
+
 # Game roles configuration
 ROLES = {
     1: "wolf",
@@ -39,6 +72,39 @@ ROLES = {
     5: "villeger detective",
 }
 
+# Special villager roles, handed out in this order; any further
+# villagers are plain villegers
+VILLAGER_ROLES = ("villeger doctor", "villeger hunter", "villeger detective", "villeger armor")
+
+
+def make_roles(players=6, wolves=2):
+    """
+    Build a role table for any table size.
+    
+    Players 1 to ``wolves`` are wolves and the others villagers;
+    ``make_roles(6, 2)`` is the classic game's ROLES.
+    
+    Args:
+        players: Number of players
+        wolves: Number of wolves
+    
+    Returns:
+        Dictionary of player number to role
+    """
+    if not 0 < wolves < players - wolves:
+        raise ValueError(f"Need at least one wolf and more villagers than wolves, got {wolves} wolves "
+                         f"among {players} players.")
+    roles = {player: "wolf" for player in range(1, wolves + 1)}
+    for i, player in enumerate(range(wolves + 1, players + 1)):
+        roles[player] = VILLAGER_ROLES[i] if i < len(VILLAGER_ROLES) else "villeger"
+    return roles
+
+
+def roles_of(state):
+    """Return the role table of a game; games without one use ROLES."""
+    return state.get("roles") or ROLES
+
+
 # Game rules
 RULES = {
     'wolf': """wolves know other wolves in the games. 
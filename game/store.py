@@ -0,0 +1,163 @@
+"""
+Versioned, copy-free snapshots of the game state for UI callbacks.
+
+The live runner mutates one state dict in place. StateStore.commit turns
+the current contents into an immutable Snapshot and a Delta naming the
+keys that changed since the previous commit, without copying the lists
+in the state:
+
+- append-only lists (the history, votes and dead players) are shared
+  through a ListView fixed at their length at commit time, so a later
+  append does not show up in an older snapshot
+- other lists are frozen into tuples, but only when they changed
+- dicts (roles, usage) are copied into read-only mappings, compared by
+  content so a change made in place is still reported
+- values that did not change are carried over from the previous
+  snapshot as they are
+
+Callbacks can look at ``delta.changed`` to skip redrawing what did not
+change.
+"""
+
+from collections.abc import Mapping, Sequence
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Dict, FrozenSet, Tuple
+
+
+# Lists that are only ever appended to; god replaces voted_to_leave with
+# a new list instead of clearing it
+APPEND_ONLY = frozenset({"history", "voted_to_leave", "dead_players"})
+
+
+class ListView(Sequence):
+    """Read-only view of the first ``length`` items of a shared list."""
+
+    __slots__ = ("_items", "_length")
+
+    def __init__(self, items, length=None):
+        self._items = items
+        self._length = len(items) if length is None else length
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self._length)
+            if step == 1:
+                return self._items[start:max(start, stop)]
+            return [self._items[i] for i in range(start, stop, step)]
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("list index out of range")
+        return self._items[index]
+
+    def __iter__(self):
+        items = self._items
+        for i in range(self._length):
+            yield items[i]
+
+    def __eq__(self, other):
+        if isinstance(other, (ListView, list, tuple)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def __repr__(self):
+        return f"ListView({list(self)!r})"
+
+
+class Snapshot(Mapping):
+    """Immutable view of the game state at one version."""
+
+    __slots__ = ("_values", "version")
+
+    def __init__(self, values, version):
+        self._values = values
+        self.version = version
+
+    def __getitem__(self, key):
+        return self._values[key]
+
+    def __iter__(self):
+        return iter(self._values)
+
+    def __len__(self):
+        return len(self._values)
+
+    def __repr__(self):
+        return f"Snapshot(version={self.version}, {self._values!r})"
+
+
+@dataclass(frozen=True)
+class Delta:
+    """What changed between two snapshots."""
+    version: int
+    changed: FrozenSet[str] = frozenset()
+    # New items of append-only lists that grew in place
+    appended: Dict[str, Tuple] = field(default_factory=dict)
+
+
+def _fingerprint(value):
+    """Cheap stand-in for a value, to tell whether it changed."""
+    if isinstance(value, list):
+        return ("list", id(value), len(value))
+    if isinstance(value, dict):
+        # A copy, so changes made to the dict in place are seen
+        return ("dict", dict(value))
+    return ("value", value)
+
+
+class StateStore:
+    """Turns a mutable game state into versioned snapshots and deltas."""
+
+    def __init__(self):
+        self.version = 0
+        self.snapshot = Snapshot({}, 0)
+        self._fingerprints = {}
+
+    def commit(self, state):
+        """
+        Record the current contents of the state.
+
+        Args:
+            state: Mutable game state
+
+        Returns:
+            (snapshot, delta); the snapshot is the previous one when
+            nothing changed
+        """
+        previous = self.snapshot._values
+        values = {}
+        changed = []
+        appended = {}
+        for key, value in state.items():
+            fingerprint = _fingerprint(value)
+            old = self._fingerprints.get(key)
+            if old == fingerprint and key in previous:
+                values[key] = previous[key]
+                continue
+            self._fingerprints[key] = fingerprint
+            changed.append(key)
+            if fingerprint[0] == "dict":
+                values[key] = MappingProxyType(fingerprint[1])
+            elif not isinstance(value, list):
+                values[key] = value
+            elif key in APPEND_ONLY:
+                values[key] = ListView(value)
+                if old is not None and old[1] == id(value) and old[2] < len(value):
+                    appended[key] = tuple(value[old[2]:])
+            else:
+                values[key] = tuple(value)
+
+        for key in previous.keys() - values.keys():
+            del self._fingerprints[key]
+            changed.append(key)
+
+        if not changed:
+            return self.snapshot, Delta(version=self.version)
+
+        self.version += 1
+        self.snapshot = Snapshot(values, self.version)
+        return self.snapshot, Delta(version=self.version, changed=frozenset(changed), appended=appended)
@@ -2,33 +2,91 @@
 Streamlit-compatible version of the Werewolf game with real-time updates.
 """
 
+import uuid
 import streamlit as st
-import time
 from collections import Counter
-from langchain.prompts import ChatPromptTemplate
-from langchain.output_parsers import PydanticOutputParser
-from .state import ROLES, RULES, GuessWhoIsWolf
-from .players import run_player_turn
+from .state import ROLES, roles_of
+from .prompts import get_player_chains, player_inputs, call_config
+from .context import render_history
+from .events import ConsoleSink, Elimination, EventBus, RingBufferSink, RoundStart, Speech, Vote, format_event
+from .core import GameCore
 from .game_logic import god, next_node
+from .pacing import resolve_pacing
+from .store import StateStore
+from .players import _ask_vote, _record_speech, _record_vote, _single_call_turn, _speech_chunk
 
 
 class StreamlitGameRunner:
     """Game runner that provides real-time updates for Streamlit."""
     
-    def __init__(self, llm):
+    def __init__(self, llm, parallel=False, context=None, telemetry=None, events=None, pacing=None,
+                 stream=True, single_call=False, checkpointer=None, game_id=None):
         self.llm = llm
+        self.parallel = parallel
+        # Ask for speech and vote in one structured call, like run_player_turn
+        self.single_call = single_call
+        # Show speeches token by token as they are generated
+        self.stream = stream
+        self.context = context
+        self.telemetry = telemetry
+        # "turbo", "realtime" (default) or "cinematic", or a Pacing
+        self.pacing = resolve_pacing(pacing)
+        # Recent game events for the debug view; the state itself no
+        # longer carries a log
+        self.log = RingBufferSink()
+        self.events = events if events is not None else EventBus([ConsoleSink()])
+        self.events.add_sink(self.log)
+        # Build the prompt chains once for every turn of every game; the
+        # runner keeps them cached for as long as it lives
+        self.chains = get_player_chains(llm)
         self.state = None
+        self.store = StateStore()
         self.callback = None
+        # Saves the state after every completed turn, so the game can be
+        # resumed by id (see resume)
+        self.checkpointer = checkpointer
+        self.game_id = game_id or uuid.uuid4().hex[:12]
+    
+    def save(self):
+        """Save the current state, if the runner has a checkpointer."""
+        if self.checkpointer is not None and self.state is not None:
+            self.checkpointer.save_state(self.game_id, self.state)
+    
+    def resume(self, game_id):
+        """
+        Continue a saved game.
+        
+        Args:
+            game_id: Id of a game saved by this runner or played on the
+                graph with the same checkpoint file
+        
+        Returns:
+            The saved state, or None if there is no such game
+        """
+        state = self.checkpointer.latest_state(game_id) if self.checkpointer is not None else None
+        if state is None:
+            return None
+        self.game_id = game_id
+        state['current_action'] = None
+        self.update_state(state)
+        return state
     
     def set_callback(self, callback):
-        """Set callback function for state updates."""
+        """
+        Set callback function for state updates.
+        
+        The callback is called as ``callback(snapshot, delta)`` with an
+        immutable Snapshot of the state and the Delta since the previous
+        call, and only when something changed.
+        """
         self.callback = callback
     
     def update_state(self, new_state):
         """Update state and notify callback."""
         self.state = new_state
-        if self.callback:
-            self.callback(new_state)
+        snapshot, delta = self.store.commit(new_state)
+        if self.callback and delta.changed:
+            self.callback(snapshot, delta)
     
     def run_player_turn_with_updates(self, player_number):
         """Run player turn with real-time updates."""
@@ -37,12 +95,13 @@ class StreamlitGameRunner:
         
         # Update turn
         self.state['turn'] = player_number
-        self.update_state(self.state.copy())
-        time.sleep(0.5)  # Small delay for visual effect
+        self.update_state(self.state)
+        self.pacing.pause("turn_start")  # Small delay for visual effect
         
         # Run the actual turn with live updates
         new_state = self._run_player_turn_live(player_number)
         self.update_state(new_state)
+        self.save()
         
         return new_state
     
@@ -51,144 +110,98 @@ class StreamlitGameRunner:
         if self.state is None:
             return self.state
         
-        player_role = ROLES[player_number]
-        history_str = "\n".join(self.state["history"])
+        history_str = render_history(self.state, self.context)
         
         self.state['turn'] = player_number
         
-        # First prompt for player response
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", 
-             "You are playing werewolf. Rules: {rules}. "
-             "You are player {player_number} and your role is {role}."),
-            ("human", 
-             """Conversation so far:\n\n{history}\n\n. 
-             Please respond as your role and if you are a wolf never 
-             realve yourslef and pretend and act like a villeger. if
-             you are a villeger don't say I'm a doctor or sth. Just say I'm 
-             a villeger. your target should be from players {alive_players} who is most likely to be shown as a wolf to decieve villegers.
-         players {dead_players} are already dead and not in the game and should not pick these.
-             you should challenge others and convince the villegers. you should know that {your_teammates_if_wolf}.
-             leave clear statements and shortly.  please diverge the blames and attention from
-             your teammates (other wolves if you are a wolf) and defend yourself or teammates.
-             
-             """)
-        ])
-
-        chain = prompt | self.llm
+        chains = self.chains
+        inputs = player_inputs(self.state, player_number, history_str)
+        config = call_config(self.state, player_number, [self.telemetry] if self.telemetry else None)
         
-        # Determine teammate information for wolves
-        if player_number == 1:
-            other_wolves_teammates = "player 2 is a wolf too and is your teammate and you should protect him and diverge the attention from him"
-        elif player_number == 2:
-            other_wolves_teammates = "player 1 is a wolf too and is your teammate and you should protect him and diverge the attention from him"
-        else:
-            other_wolves_teammates = "you don't know for sure who is a wolf and should find out by guessing from hisoty of conversation and putting pressure on a suspect you think would be a wolf candidate"   
-
         # Show thinking indicator with typing animation
         self.state['current_action'] = f"🤔 Player {player_number} is thinking..."
-        self.update_state(self.state.copy())
-        time.sleep(0.5)
-        
-        # Simulate typing
-        for i in range(3):
-            self.state['current_action'] = f"🤔 Player {player_number} is thinking{'...'[:i+1]}"
-            self.update_state(self.state.copy())
-            time.sleep(0.3)
-
-        response = chain.invoke({
-            "player_number": player_number,
-            "role": player_role,
-            "rules": RULES,
-            "history": history_str,
-            "alive_players": self.state["alive_players"],
-            "dead_players": self.state["dead_players"],
-            "your_teammates_if_wolf": other_wolves_teammates
-        })
-        
-        # Show player speaking
-        self.state['current_action'] = f"🗣️ Player {player_number} is speaking..."
-        self.update_state(self.state.copy())
-        time.sleep(0.5)
-        
-        # Capture the print output and add to state
-        player_message = f'player {player_number}): {response.content}'
-        print(player_message)  # Keep original print for terminal
-        self.state['history'].append(f"player {player_number}: {response.content}")
-        
-        # Add the print output to a special debug log
-        if 'debug_log' not in self.state:
-            self.state['debug_log'] = []
-        self.state['debug_log'].append(player_message)
-        
-        self.update_state(self.state.copy())
-        time.sleep(1)
-        
-        # Second prompt for wolf guessing
-        parser = PydanticOutputParser(pydantic_object=GuessWhoIsWolf)
-
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", 
-         "You are a professional werewolf player who strictly follows the rules: {rules}. "
-         "You MUST respond with valid JSON ONLY — no additional text, no markdown. "
-         "{format_instructions}"),
-
-            ("human", 
-             """you are player {player_number}, based on the flow of conversations:{history} and the fact
-             that you should avoid blames on yourself (who is player {player_number}), which one of other players do you think can be a wolf?
-                Your role is: {role}. you should know that {your_teammates_if_wolf}.
-         If your role is wolf  pick a villeger from players {alive_players} who is most likely to be shown as a wolf to decieve villegers.
-         players {dead_players} are already dead and not in the game and should not pick these.
-        """)
-        ])
-
-        prompt = prompt.partial(format_instructions=parser.get_format_instructions())
-        chain = prompt | self.llm | parser
-
+        self.update_state(self.state)
+        self.pacing.pause("thinking")
+        
+        # The vote only depends on the history before this speech, so in
+        # parallel mode both calls can be in flight together
+        speech = chains.speech_and_vote if self.parallel else chains.speech
+        response_2 = _single_call_turn(chains, inputs, config) if self.single_call else None
+        
+        if response_2 is not None:
+            # Speech and vote came together in one call
+            content = response_2.speech
+        elif self.stream:
+            # Show the speech as it is generated
+            parts = []
+            for chunk in speech.stream(inputs, config=config):
+                response_2 = _speech_chunk(chunk, player_number, parts, self.events) or response_2
+                self.state['current_action'] = f"🗣️ Player {player_number}: {''.join(parts)}"
+                self.update_state(self.state)
+            content = "".join(parts)
+        else:
+            # Simulate typing; in turbo mode the browser animates the dots
+            if self.pacing.animate:
+                for i in range(3):
+                    self.state['current_action'] = f"🤔 Player {player_number} is thinking{'...'[:i+1]}"
+                    self.update_state(self.state)
+                    self.pacing.pause("typing")
+            
+            if self.parallel:
+                results = speech.invoke(inputs, config=config)
+                content, response_2 = results["speech"].content, results["vote"]
+            else:
+                content = speech.invoke(inputs, config=config).content
+            
+            # Show player speaking
+            self.state['current_action'] = f"🗣️ Player {player_number} is speaking..."
+            self.update_state(self.state)
+            self.pacing.pause("speaking")
+        
+        _record_speech(self.state, player_number, content, self.events)
+        
+        self.update_state(self.state)
+        self.pacing.pause("spoken")
+        
         # Show thinking about voting
         self.state['current_action'] = f"🤔 Player {player_number} is deciding who to vote for..."
-        self.update_state(self.state.copy())
-        time.sleep(0.5)
+        self.update_state(self.state)
+        self.pacing.pause("deciding")
         
         # Simulate decision making
-        for i in range(2):
-            self.state['current_action'] = f"🤔 Player {player_number} is deciding who to vote for{'...'[:i+1]}"
-            self.update_state(self.state.copy())
-            time.sleep(0.4)
+        if self.pacing.animate:
+            for i in range(2):
+                self.state['current_action'] = f"🤔 Player {player_number} is deciding who to vote for{'...'[:i+1]}"
+                self.update_state(self.state)
+                self.pacing.pause("deciding_typing")
 
-        response_2 = chain.invoke({
-            "player_number": player_number,
-            "role": ROLES[player_number],
-            "rules": RULES,
-            "history": history_str,
-            "alive_players": self.state["alive_players"],
-            "dead_players": self.state["dead_players"],
-            "your_teammates_if_wolf": other_wolves_teammates
-        })
+        response_2 = _ask_vote(chains, inputs, config, response_2, asked=self.parallel)
+        
+        if response_2 is None:
+            # No readable vote even after asking again: the player abstains
+            self.state['current_action'] = f"🤷 Player {player_number} did not give a valid vote"
+            self.update_state(self.state)
+            self.pacing.pause("voted")
+            self.state['current_action'] = None
+            return self.state
         
         # Show internal thoughts
         internal_thought = f"🧠 Player {player_number}'s internal thoughts: I think player {response_2.guessed_wolf} is a wolf ({response_2.percentage_assureness}% sure). Reason: {response_2.description}"
         self.state['current_action'] = internal_thought
-        self.update_state(self.state.copy())
-        time.sleep(2)
-        
-        # Capture the internal thoughts print output
-        internal_message = f'--> self thoughts and strategies in the brain of this player (not added in game): I think, player {response_2.guessed_wolf} with conf={response_2.percentage_assureness}% is a wolf. The reason: {response_2.description}'
-        print(internal_message)  # Keep original print for terminal
+        self.update_state(self.state)
+        self.pacing.pause("thoughts")
         
-        # Add to debug log
-        self.state['debug_log'].append(internal_message)
+        _record_vote(self.state, response_2, player_number, self.events)
         
         if response_2.percentage_assureness > 50:
-            self.state["voted_to_leave"].append(response_2.guessed_wolf)
             vote_message = f"🗳️ Player {player_number} voted to eliminate Player {response_2.guessed_wolf}"
             self.state['current_action'] = vote_message
         else:
             no_vote_message = f"🤷 Player {player_number} is not confident enough to vote"
             self.state['current_action'] = no_vote_message
         
-        self.update_state(self.state.copy())
-        time.sleep(1)
+        self.update_state(self.state)
+        self.pacing.pause("voted")
         
         # Clear current action
         self.state['current_action'] = None
@@ -201,50 +214,27 @@ class StreamlitGameRunner:
         
         # Show god processing
         self.state['current_action'] = "🕊️ God is processing the round..."
-        self.update_state(self.state.copy())
-        time.sleep(1)
-        
-        # Capture print output from god function
-        import io
-        import sys
-        
-        # Redirect stdout to capture print statements
-        old_stdout = sys.stdout
-        captured_output = io.StringIO()
-        sys.stdout = captured_output
+        self.update_state(self.state)
+        self.pacing.pause("god")
         
-        try:
-            # Run god logic
-            new_state = god(self.state)
-            
-            # Get captured output
-            god_output = captured_output.getvalue()
-            
-            # Add captured output to debug log
-            if 'debug_log' not in new_state:
-                new_state['debug_log'] = []
-            
-            for line in god_output.strip().split('\n'):
-                if line.strip():
-                    new_state['debug_log'].append(line.strip())
-                    print(line.strip())  # Also print to terminal
-            
-        finally:
-            # Restore stdout
-            sys.stdout = old_stdout
+        # Run god logic; its events reach the terminal and the debug view.
+        # The last snapshot still holds the history from before god ran.
+        history_before = self.store.snapshot.get('history', ())
+        new_state = god(self.state, events=self.events)
         
         # Show god's announcement
-        if new_state.get('history') and new_state['history'] != self.state.get('history', []):
+        if new_state.get('history') and new_state['history'] != history_before:
             latest_announcement = new_state['history'][-1]
             if "God:" in latest_announcement:
                 self.state['current_action'] = f"🕊️ {latest_announcement}"
-                self.update_state(self.state.copy())
-                time.sleep(2)
+                self.update_state(self.state)
+                self.pacing.pause("announcement")
         
         self.update_state(new_state)
         
         # Clear current action
         self.state['current_action'] = None
+        self.save()
         return new_state
     
     def run_full_game(self, initial_state, callback=None):
@@ -258,28 +248,20 @@ class StreamlitGameRunner:
         # Game loop
         while True:
             # Check winning conditions
-            wolf_num = 0
-            vilg_num = 0
-            
-            for i in self.state['alive_players']:
-                if 'wolf' in ROLES[i]:
-                    wolf_num += 1
-                else:
-                    vilg_num += 1
-            
-            if wolf_num == 0:
+            winner = GameCore.from_state(self.state).winner()
+            if winner == "villagers":
                 st.success("🏆 Villagers won!")
                 break
-            elif wolf_num >= vilg_num:
+            elif winner == "wolves":
                 st.success("🏆 Wolves won!")
                 break
             
             # Run god turn
             self.run_god_turn_with_updates()
-            time.sleep(1)
+            self.pacing.pause("between_turns")
             
             # Determine next player
-            next_action = next_node(self.state)
+            next_action = next_node(self.state, events=self.events)
             
             if next_action == "to_end":
                 break
@@ -287,16 +269,19 @@ class StreamlitGameRunner:
             # Run player turn
             if next_action.startswith("to_"):
                 player_num = int(next_action.split("_")[1])
-                if player_num in self.state['alive_players']:
+                if GameCore.from_state(self.state).is_alive(player_num):
                     self.run_player_turn_with_updates(player_num)
-                    time.sleep(1)
+                    self.pacing.pause("between_turns")
         
         return self.state
 
 
-def create_streamlit_game_runner(llm):
+def create_streamlit_game_runner(llm, parallel=False, context=None, telemetry=None, events=None, pacing=None,
+                                 stream=True, single_call=False, checkpointer=None, game_id=None):
     """Create a Streamlit game runner instance."""
-    return StreamlitGameRunner(llm)
+    return StreamlitGameRunner(llm, parallel=parallel, context=context, telemetry=telemetry, events=events,
+                               pacing=pacing, stream=stream, single_call=single_call,
+                               checkpointer=checkpointer, game_id=game_id)
 
 
 def display_game_metrics(state):
@@ -310,12 +295,11 @@ def display_game_metrics(state):
         st.metric("Alive Players", len(state.get("alive_players", [])))
     
     with col2:
-        wolf_count = sum(1 for p in state.get("alive_players", []) if "wolf" in ROLES.get(p, ""))
-        st.metric("🐺 Wolves", wolf_count)
+        core = GameCore(state.get("alive_players", []), roles=roles_of(state))
+        st.metric("🐺 Wolves", core.wolves)
     
     with col3:
-        villager_count = len(state.get("alive_players", [])) - wolf_count
-        st.metric("👥 Villagers", villager_count)
+        st.metric("👥 Villagers", core.villagers)
     
     with col4:
         current_turn = state.get("turn", 0)
@@ -330,6 +314,25 @@ def display_game_metrics(state):
         st.info(f"🔄 **Live Action:** {current_action}")
 
 
+def display_telemetry_panel(telemetry):
+    """Display per-game LLM cost and latency."""
+    if telemetry is None:
+        return
+    
+    summary = telemetry.summary()
+    
+    st.subheader("📈 LLM Usage")
+    col1, col2 = st.columns(2)
+    with col1:
+        st.metric("Calls", summary["calls"])
+        st.metric("Tokens", f"{summary['input_tokens'] + summary['output_tokens']:,}")
+        st.metric("Cost", f"${summary['cost']:.4f}")
+    with col2:
+        st.metric("p50 latency", f"{summary['latency_p50']:.2f}s")
+        st.metric("p95 latency", f"{summary['latency_p95']:.2f}s")
+        st.metric("Errors", summary["errors"])
+
+
 def display_players_status(state):
     """Display players status in a grid."""
     if not state:
@@ -337,13 +340,15 @@ def display_players_status(state):
     
     st.subheader("🎮 Players Status")
     
+    roles = roles_of(state)
+    core = GameCore.from_state(state)
     cols = st.columns(3)
-    for i, player_num in enumerate(range(1, 7)):
+    for i, player_num in enumerate(sorted(roles)):
         col_idx = i % 3
         with cols[col_idx]:
-            role = ROLES.get(player_num, "unknown")
+            role = roles.get(player_num, "unknown")
             
-            if player_num in state.get("alive_players", []):
+            if core.is_alive(player_num):
                 if "wolf" in role:
                     st.success(f"🐺 Player {player_num} - {role}")
                 else:
@@ -381,124 +386,263 @@ def display_voting_status(state):
         st.info(f"📊 Player {most_voted} has the most votes ({max_votes}/{alive_count//2 + 1} needed)")
 
 
-def display_game_history(state):
-    """Display game history with styling."""
-    if not state:
-        return
-    
-    st.subheader("📜 Live Game Chat")
-    
-    history = state.get("history", [])
-    debug_log = state.get("debug_log", [])
-    
-    # Create a chat-like container
-    chat_container = st.container()
-    
-    with chat_container:
-        # Show messages in a chat-like format
-        for i, entry in enumerate(history):
-            if "God:" in entry:
-                # God messages in a special box
-                st.markdown(f"""
-                <div style="background-color: #f0f8ff; padding: 10px; border-radius: 10px; margin: 5px 0; border-left: 4px solid #0066cc;">
-                    <strong>🕊️ {entry}</strong>
-                </div>
-                """, unsafe_allow_html=True)
-            elif "player" in entry and ":" in entry:
-                try:
-                    player_num = entry.split("player ")[1].split(":")[0]
-                    role = ROLES.get(int(player_num), "unknown")
-                    message = entry.split(': ', 1)[1] if ': ' in entry else entry
-                    
-                    if "wolf" in role:
-                        # Wolf messages in red-tinted box
-                        st.markdown(f"""
-                        <div style="background-color: #fff0f0; padding: 10px; border-radius: 10px; margin: 5px 0; border-left: 4px solid #cc0000;">
-                            <strong>🐺 Player {player_num}</strong><br>
-                            {message}
-                        </div>
-                        """, unsafe_allow_html=True)
-                    else:
-                        # Villager messages in green-tinted box
-                        st.markdown(f"""
-                        <div style="background-color: #f0fff0; padding: 10px; border-radius: 10px; margin: 5px 0; border-left: 4px solid #00cc00;">
-                            <strong>👤 Player {player_num}</strong><br>
-                            {message}
-                        </div>
-                        """, unsafe_allow_html=True)
-                except:
-                    st.markdown(f"""
-                    <div style="background-color: #f8f8f8; padding: 10px; border-radius: 10px; margin: 5px 0;">
-                        💬 {entry}
-                    </div>
-                    """, unsafe_allow_html=True)
-            else:
-                st.markdown(f"""
-                <div style="background-color: #f8f8f8; padding: 10px; border-radius: 10px; margin: 5px 0;">
-                    💬 {entry}
-                </div>
-                """, unsafe_allow_html=True)
-    
-    # Show debug log (print statements) in a separate section
-    if debug_log:
-        st.subheader("🔍 Debug Log (Print Statements)")
-        for log_entry in debug_log:
-            if "player" in log_entry and "):" in log_entry:
-                # Player speaking
-                st.markdown(f"""
-                <div style="background-color: #e8f4fd; padding: 8px; border-radius: 8px; margin: 3px 0; font-family: monospace; font-size: 0.9em;">
-                    🗣️ {log_entry}
-                </div>
-                """, unsafe_allow_html=True)
-            elif "--> self thoughts" in log_entry:
-                # Internal thoughts
-                st.markdown(f"""
-                <div style="background-color: #fff2e6; padding: 8px; border-radius: 8px; margin: 3px 0; font-family: monospace; font-size: 0.9em;">
-                    🧠 {log_entry}
-                </div>
-                """, unsafe_allow_html=True)
-            elif "voting Started" in log_entry or "voting Ended" in log_entry:
-                # Voting events
-                st.markdown(f"""
-                <div style="background-color: #f0f8ff; padding: 8px; border-radius: 8px; margin: 3px 0; font-family: monospace; font-size: 0.9em;">
-                    🗳️ {log_entry}
-                </div>
-                """, unsafe_allow_html=True)
-            elif "round started" in log_entry or "God:" in log_entry:
-                # Round events
+def _render_chat_entry(entry, roles=None):
+    """Render one history entry as a chat bubble; ``roles`` defaults to ROLES."""
+    if "God:" in entry:
+        # God messages in a special box
+        st.markdown(f"""
+        <div style="background-color: #f0f8ff; padding: 10px; border-radius: 10px; margin: 5px 0; border-left: 4px solid #0066cc;">
+            <strong>🕊️ {entry}</strong>
+        </div>
+        """, unsafe_allow_html=True)
+    elif "player" in entry and ":" in entry:
+        try:
+            player_num = entry.split("player ")[1].split(":")[0]
+            role = (roles or ROLES).get(int(player_num), "unknown")
+            message = entry.split(': ', 1)[1] if ': ' in entry else entry
+            
+            if "wolf" in role:
+                # Wolf messages in red-tinted box
                 st.markdown(f"""
-                <div style="background-color: #f0fff0; padding: 8px; border-radius: 8px; margin: 3px 0; font-family: monospace; font-size: 0.9em;">
-                    🕊️ {log_entry}
+                <div style="background-color: #fff0f0; padding: 10px; border-radius: 10px; margin: 5px 0; border-left: 4px solid #cc0000;">
+                    <strong>🐺 Player {player_num}</strong><br>
+                    {message}
                 </div>
                 """, unsafe_allow_html=True)
             else:
-                # Other debug messages
+                # Villager messages in green-tinted box
                 st.markdown(f"""
-                <div style="background-color: #f8f8f8; padding: 8px; border-radius: 8px; margin: 3px 0; font-family: monospace; font-size: 0.9em;">
-                    🔍 {log_entry}
+                <div style="background-color: #f0fff0; padding: 10px; border-radius: 10px; margin: 5px 0; border-left: 4px solid #00cc00;">
+                    <strong>👤 Player {player_num}</strong><br>
+                    {message}
                 </div>
                 """, unsafe_allow_html=True)
-    
-    # Show current action if any
+        except:
+            st.markdown(f"""
+            <div style="background-color: #f8f8f8; padding: 10px; border-radius: 10px; margin: 5px 0;">
+                💬 {entry}
+            </div>
+            """, unsafe_allow_html=True)
+    else:
+        st.markdown(f"""
+        <div style="background-color: #f8f8f8; padding: 10px; border-radius: 10px; margin: 5px 0;">
+            💬 {entry}
+        </div>
+        """, unsafe_allow_html=True)
+
+
+def _render_event(event):
+    """Render one game event in the debug log style."""
+    if isinstance(event, Speech):
+        icon, color = "🗣️", "#e8f4fd"
+    elif isinstance(event, Vote):
+        icon, color = "🧠", "#fff2e6"
+    elif isinstance(event, Elimination):
+        icon, color = "🗳️", "#f0f8ff"
+    elif isinstance(event, RoundStart):
+        icon, color = "🕊️", "#f0fff0"
+    else:
+        icon, color = "🔍", "#f8f8f8"
+    for line in format_event(event):
+        if line.strip('=*'):
+            st.markdown(f"""
+            <div style="background-color: {color}; padding: 8px; border-radius: 8px; margin: 3px 0; font-family: monospace; font-size: 0.9em;">
+                {icon} {line.strip()}
+            </div>
+            """, unsafe_allow_html=True)
+
+
+# Ellipsis animated by the browser, so the server sends no typing frames
+_DOTS_CSS = """
+<style>
+.ww-dots::after { content: ""; animation: ww-dots 1.2s steps(4, end) infinite; }
+@keyframes ww-dots { 0% { content: ""; } 25% { content: "."; } 50% { content: ".."; } 75% { content: "..."; } }
+</style>
+"""
+
+
+def _render_current_action(state):
+    """Render the live action banner, if any."""
     current_action = state.get("current_action")
     if current_action:
+        if current_action.endswith("..."):
+            text = f'{current_action[:-3]}<span class="ww-dots"></span>'
+        else:
+            text = current_action
         st.markdown(f"""
+        {_DOTS_CSS}
         <div style="background-color: #fff3cd; padding: 10px; border-radius: 10px; margin: 5px 0; border-left: 4px solid #ffc107;">
-            <strong>🔄 {current_action}</strong>
+            <strong>🔄 {text}</strong>
         </div>
         """, unsafe_allow_html=True)
 
 
-def create_initial_state():
-    """Create initial game state."""
+def history_page(history, page, page_size=50):
+    """
+    Return one page of the history, page 0 being the most recent.
+    
+    Args:
+        history: Full game history
+        page: Page number counted back from the end
+        page_size: Entries per page
+    
+    Returns:
+        (entries, number of pages)
+    """
+    pages = max(1, -(-len(history) // page_size))
+    page = min(max(page, 0), pages - 1)
+    end = len(history) - page * page_size
+    return history[max(0, end - page_size):end], pages
+
+
+def display_game_history(state, events=None, page_size=50):
+    """
+    Display game history with styling.
+    
+    Only the latest ``page_size`` entries are drawn; older ones can be
+    paged through in an expander, so the cost of a redraw does not grow
+    with the length of the game.
+    
+    Args:
+        state: Current game state
+        events: Optional recent game events (e.g. ``runner.log.events``)
+            to show in the debug log
+        page_size: Number of entries drawn at a time
+    """
+    if not state:
+        return
+    
+    st.subheader("📜 Live Game Chat")
+    
+    history = state.get("history", [])
+    
+    latest, pages = history_page(history, 0, page_size)
+    if pages > 1:
+        with st.expander(f"📚 Older messages ({len(history) - len(latest)})"):
+            page = st.number_input("Page (1 = most recent older page)", min_value=1,
+                                   max_value=pages - 1, value=1, step=1)
+            for entry in history_page(history, int(page), page_size)[0]:
+                _render_chat_entry(entry, roles_of(state))
+    
+    # Create a chat-like container
+    with st.container():
+        for entry in latest:
+            _render_chat_entry(entry, roles_of(state))
+    
+    # Show recent game events in a separate section
+    if events:
+        st.subheader("🔍 Debug Log (Game Events)")
+        for event in list(events)[-page_size:]:
+            _render_event(event)
+    
+    # Show current action if any
+    _render_current_action(state)
+
+
+class ChatRenderer:
+    """
+    Append-only live view of the game chat and events.
+    
+    Each update draws only the history entries and events that arrived
+    since the previous one; the banner, players and votes panels are
+    redrawn only when what they show has changed. An update therefore
+    costs the same after fifty rounds as after one. Must be created
+    inside the Streamlit script run it draws into.
+    """
+    
+    def __init__(self, page_size=50):
+        """
+        Args:
+            page_size: Most recent entries drawn on the first update;
+                older ones stay available through display_game_history
+        """
+        self.page_size = page_size
+        self.metrics = st.empty()
+        self.players = st.empty()
+        self.voting = st.empty()
+        st.subheader("📜 Live Game Chat")
+        self.chat = st.container()
+        self.action = st.empty()
+        self.log = st.container()
+        self.shown_history = None
+        self.shown_events = None
+        self._keys = {}
+    
+    def _changed(self, panel, key):
+        if self._keys.get(panel) == key:
+            return False
+        self._keys[panel] = key
+        return True
+    
+    def update(self, state, log=None, delta=None):
+        """
+        Draw what changed since the last update.
+        
+        Args:
+            state: Current game state or Snapshot
+            log: Optional RingBufferSink with the game events
+            delta: Optional Delta from the runner; panels whose keys are
+                not in ``delta.changed`` are not even compared
+        """
+        if not state:
+            return
+        
+        def changed(panel, keys, signature):
+            if delta is not None and panel in self._keys and not delta.changed & keys:
+                return False
+            return self._changed(panel, signature())
+        
+        alive = lambda: tuple(state.get("alive_players", []))
+        turn = state.get("turn")
+        action = state.get("current_action")
+        
+        if changed("metrics", {"alive_players", "turn", "current_action"}, lambda: (alive(), turn, action)):
+            with self.metrics.container():
+                display_game_metrics(state)
+        if changed("players", {"alive_players", "turn"}, lambda: (alive(), turn)):
+            with self.players.container():
+                display_players_status(state)
+        if changed("voting", {"voted_to_leave", "alive_players"},
+                   lambda: (tuple(state.get("voted_to_leave", [])), len(alive()))):
+            with self.voting.container():
+                display_voting_status(state)
+        
+        history = state.get("history", [])
+        if self.shown_history is None:
+            self.shown_history = max(0, len(history) - self.page_size)
+        with self.chat:
+            for entry in history[self.shown_history:]:
+                _render_chat_entry(entry, roles_of(state))
+        self.shown_history = len(history)
+        
+        if log is not None:
+            if self.shown_events is None:
+                self.shown_events = max(0, log.total - self.page_size)
+                with self.log:
+                    st.subheader("🔍 Debug Log (Game Events)")
+            new = min(log.total - self.shown_events, len(log.events))
+            if new > 0:
+                with self.log:
+                    for event in list(log.events)[-new:]:
+                        _render_event(event)
+            self.shown_events = log.total
+        
+        if changed("action", {"current_action"}, lambda: action):
+            with self.action.container():
+                _render_current_action(state)
+
+
+def create_initial_state(roles=None):
+    """Create initial game state; ``roles`` defaults to ROLES."""
+    roles = roles or ROLES
     return {
         "turn": 0,
         "current_iter": 0,
         "max_iter": 3,
         "history": [],
-        "roles": [],
+        "roles": dict(roles),
         "rules": "",
-        "alive_players": [i for i in range(1, 7)],
+        "alive_players": sorted(roles),
         "voted_to_leave": [],
         "dead_players": [],
     } 
\ No newline at end of file
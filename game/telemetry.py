@@ -0,0 +1,251 @@
+"""
+Per-LLM-call latency, token and cost telemetry.
+
+GameTelemetry is a LangChain callback handler. Pass it in the run config
+of the compiled graph (``config={"callbacks": [telemetry]}``) or to
+StreamlitGameRunner and it records every model call made by the player
+chains: wall time, time to first token, prompt and completion tokens,
+parse time, the player, the round, the phase (speech or vote) and the
+attempt (re-asks of an unreadable vote count as retries). The records
+aggregate into histograms that can be exported as JSONL and as
+a Prometheus text file.
+"""
+
+import json
+import threading
+import time
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+
+# Default prices in dollars per million tokens (Groq llama3-8b-8192)
+DEFAULT_PRICES = {"input": 0.05, "output": 0.08}
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+TOKEN_BUCKETS = (64, 128, 256, 512, 1024, 2048, 4096, 8192)
+
+
+class Histogram:
+    """Cumulative histogram with fixed upper bounds, Prometheus style."""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self):
+        """Return (upper bound, cumulative count) pairs, ending with +Inf."""
+        total = 0
+        pairs = []
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            pairs.append((bound, total))
+        return pairs
+
+
+def _usage(response):
+    """Return (input tokens, output tokens) reported for an LLM result."""
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                return usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+    token_usage = (response.llm_output or {}).get("token_usage") or {}
+    return token_usage.get("prompt_tokens", 0), token_usage.get("completion_tokens", 0)
+
+
+class GameTelemetry(BaseCallbackHandler):
+    """
+    Callback handler collecting per-call telemetry for one or more games.
+
+    Player, round, phase and attempt are read from the run metadata that
+    the player chains attach to their calls. Retries count both re-asked
+    calls and calls retried by LangChain's ``with_retry``. Without streaming, the first
+    token arrives with the whole response, so time to first token equals
+    the wall time.
+    """
+
+    def __init__(self, prices=None):
+        """
+        Args:
+            prices: Dollars per million tokens, as ``{"input": ..., "output": ...}``
+        """
+        self.prices = dict(DEFAULT_PRICES, **(prices or {}))
+        self.records = []
+        self.errors = 0
+        self.retries = 0
+        self.latency = {}
+        self.ttft = {}
+        self.tokens = {}
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._parsers = {}
+        self._by_parent = {}
+
+    # Callback hooks
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None,
+                            tags=None, metadata=None, **kwargs):
+        metadata = metadata or {}
+        with self._lock:
+            self._pending[run_id] = {
+                "start": time.perf_counter(),
+                "first_token": None,
+                "parent": parent_run_id,
+                "player": metadata.get("player"),
+                "round": metadata.get("round"),
+                "phase": metadata.get("phase"),
+                "attempt": metadata.get("attempt", 0),
+            }
+
+    def on_llm_new_token(self, token, *, run_id, **kwargs):
+        with self._lock:
+            call = self._pending.get(run_id)
+            if call is not None and call["first_token"] is None:
+                call["first_token"] = time.perf_counter()
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        end = time.perf_counter()
+        with self._lock:
+            call = self._pending.pop(run_id, None)
+        if call is None:
+            return
+
+        input_tokens, output_tokens = _usage(response)
+        wall = end - call["start"]
+        first_token = call["first_token"] or end
+        record = {
+            "player": call["player"],
+            "round": call["round"],
+            "phase": call["phase"],
+            "attempt": call["attempt"],
+            "wall_time": round(wall, 6),
+            "ttft": round(first_token - call["start"], 6),
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "parse_time": None,
+            "cost": round(self.cost(input_tokens, output_tokens), 9),
+        }
+        phase = call["phase"] or "other"
+        with self._lock:
+            self.records.append(record)
+            if call["attempt"]:
+                self.retries += 1
+            self.latency.setdefault(phase, Histogram(LATENCY_BUCKETS)).observe(wall)
+            self.ttft.setdefault(phase, Histogram(LATENCY_BUCKETS)).observe(record["ttft"])
+            self.tokens.setdefault(phase, Histogram(TOKEN_BUCKETS)).observe(input_tokens + output_tokens)
+            if call["parent"] is not None:
+                self._by_parent[call["parent"]] = record
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        with self._lock:
+            self._pending.pop(run_id, None)
+            self.errors += 1
+
+    def on_retry(self, retry_state, *, run_id, **kwargs):
+        with self._lock:
+            self.retries += 1
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, **kwargs):
+        name = kwargs.get("name") or (serialized or {}).get("name") or ""
+        if name.endswith("OutputParser"):
+            with self._lock:
+                self._parsers[run_id] = (parent_run_id, time.perf_counter())
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        with self._lock:
+            parser = self._parsers.pop(run_id, None)
+            if parser is None:
+                self._by_parent.pop(run_id, None)
+                return
+            parent, start = parser
+            record = self._by_parent.pop(parent, None)
+            if record is not None:
+                record["parse_time"] = round(time.perf_counter() - start, 6)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        with self._lock:
+            self._parsers.pop(run_id, None)
+            self._by_parent.pop(run_id, None)
+
+    # Aggregates
+
+    def cost(self, input_tokens, output_tokens):
+        """Dollar cost of a call with the given token counts."""
+        return (input_tokens * self.prices["input"] + output_tokens * self.prices["output"]) / 1_000_000
+
+    def summary(self):
+        """Return totals and latency percentiles over all recorded calls."""
+        with self._lock:
+            records = list(self.records)
+        walls = sorted(r["wall_time"] for r in records)
+
+        def percentile(p):
+            if not walls:
+                return 0.0
+            return walls[min(len(walls) - 1, int(p * len(walls)))]
+
+        return {
+            "calls": len(records),
+            "errors": self.errors,
+            "retries": self.retries,
+            "input_tokens": sum(r["input_tokens"] for r in records),
+            "output_tokens": sum(r["output_tokens"] for r in records),
+            "cost": round(sum(r["cost"] for r in records), 6),
+            "wall_time": round(sum(walls), 3),
+            "latency_p50": percentile(0.5),
+            "latency_p95": percentile(0.95),
+            "ttft_mean": round(sum(r["ttft"] for r in records) / len(records), 6) if records else 0.0,
+        }
+
+    # Exporters
+
+    def export_jsonl(self, path):
+        """Write one JSON line per recorded call."""
+        with self._lock:
+            records = list(self.records)
+        with open(path, "w", encoding="utf-8") as fh:
+            for record in records:
+                fh.write(json.dumps(record) + "\n")
+
+    def export_prometheus(self, path):
+        """Write the histograms and totals in the Prometheus text format."""
+        lines = []
+        with self._lock:
+            for metric, help_text, histograms in (
+                ("werewolf_llm_call_seconds", "Wall time of LLM calls.", self.latency),
+                ("werewolf_llm_ttft_seconds", "Time to first token of LLM calls.", self.ttft),
+                ("werewolf_llm_call_tokens", "Prompt plus completion tokens of LLM calls.", self.tokens),
+            ):
+                lines.append(f"# HELP {metric} {help_text}")
+                lines.append(f"# TYPE {metric} histogram")
+                for phase, histogram in sorted(histograms.items()):
+                    for bound, count in histogram.cumulative():
+                        le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                        lines.append(f'{metric}_bucket{{phase="{phase}",le="{le}"}} {count}')
+                    lines.append(f'{metric}_sum{{phase="{phase}"}} {histogram.sum:g}')
+                    lines.append(f'{metric}_count{{phase="{phase}"}} {histogram.count}')
+
+        summary = self.summary()
+        for name, key, help_text in (
+            ("werewolf_llm_errors_total", "errors", "Failed LLM calls."),
+            ("werewolf_llm_retries_total", "retries", "Retried LLM calls."),
+            ("werewolf_llm_cost_dollars_total", "cost", "Estimated LLM spend in dollars."),
+        ):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name} {summary[key]:g}")
+
+        with open(path, "w", encoding="utf-8") as fh:
+            fh.write("\n".join(lines) + "\n")
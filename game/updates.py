@@ -0,0 +1,175 @@
+"""
+Small updates from graph nodes instead of whole states.
+
+The game functions (god, run_player_turn, collect_round_votes) change
+the state they are given and return it, which suits the live runner.
+Graph nodes must not change the channel values LangGraph hands them, and
+should only return what changed. as_node runs a game function on an
+overlay of the node's state, where the history is a SharedHistory
+(the channel's list, read-only, plus a list of new entries) and the
+other lists are copies, and returns only the keys that changed, with
+just the new history entries. The history channel adds those entries
+with its reducer (state.add_entries), so the transcript is never handed
+around or rewritten in full.
+"""
+
+import inspect
+from collections.abc import MutableSequence, Sequence
+from functools import wraps
+
+from .store import ListView
+
+
+class SharedHistory(MutableSequence):
+    """
+    History list whose prefix is shared with other branches.
+
+    Reads see the prefix followed by this branch's own entries; appends
+    and other changes only ever touch the branch's own entries.
+    """
+
+    __slots__ = ("prefix", "suffix")
+
+    def __init__(self, prefix=(), suffix=None):
+        """
+        Args:
+            prefix: Read-only sequence shared with other branches
+            suffix: This branch's own entries
+        """
+        self.prefix = prefix
+        self.suffix = [] if suffix is None else suffix
+
+    def __len__(self):
+        return len(self.prefix) + len(self.suffix)
+
+    def _own(self, index):
+        """Index into the suffix of an index into the whole history."""
+        shared = len(self.prefix)
+        if index < 0:
+            index += len(self)
+        if index < shared:
+            raise TypeError("the shared part of a forked history is read-only")
+        return index - shared
+
+    def __getitem__(self, index):
+        shared = len(self.prefix)
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            items = list(self.prefix[start:min(stop, shared)]) if start < shared else []
+            if stop > shared:
+                items += self.suffix[max(start - shared, 0):stop - shared]
+            return items
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("list index out of range")
+        return self.prefix[index] if index < shared else self.suffix[index - shared]
+
+    def __setitem__(self, index, value):
+        if isinstance(index, slice):
+            raise TypeError("slice assignment is not supported on a forked history")
+        self.suffix[self._own(index)] = value
+
+    def __delitem__(self, index):
+        if isinstance(index, slice):
+            raise TypeError("slice deletion is not supported on a forked history")
+        del self.suffix[self._own(index)]
+
+    def insert(self, index, value):
+        self.suffix.insert(self._own(min(index, len(self))), value)
+
+    def append(self, value):
+        self.suffix.append(value)
+
+    def __add__(self, other):
+        # A new history with the same shared prefix, like list + list
+        return SharedHistory(self.prefix, self.suffix + list(other))
+
+    def __iter__(self):
+        yield from self.prefix
+        yield from self.suffix
+
+    def __eq__(self, other):
+        if isinstance(other, Sequence) and not isinstance(other, str):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def __repr__(self):
+        return f"SharedHistory({len(self.prefix)} shared, {self.suffix!r})"
+
+
+def share(items):
+    """
+    Return a new branch of a list: it shares the items so far and
+    stores only what is added to it afterwards.
+
+    The parent may keep appending to its own list; the branch only sees
+    the items present when it was forked.
+    """
+    if isinstance(items, SharedHistory):
+        prefix = SharedHistory(items.prefix, ListView(items.suffix))
+    else:
+        prefix = ListView(items)
+    return SharedHistory(prefix)
+
+
+# Lists of the state that nodes may change in place
+_LISTS = ("alive_players", "dead_players", "voted_to_leave", "history_summary")
+
+
+def overlay(state):
+    """
+    Return a copy of a state that can be changed without affecting it.
+
+    The history is shared, not copied (see share); the other lists are
+    small and are copied.
+    """
+    copied = dict(state)
+    if copied.get("history") is not None:
+        copied["history"] = share(copied["history"])
+    for key in _LISTS:
+        if key in copied:
+            copied[key] = list(copied[key] or [])
+    return copied
+
+
+def changes(state, changed):
+    """
+    Return the update that turns a state into its changed overlay.
+
+    Args:
+        state: State the overlay was made from
+        changed: Overlay after a game function ran on it
+
+    Returns:
+        Dictionary of the keys whose value changed; "history" holds only
+        the new entries
+    """
+    update = {}
+    for key, value in changed.items():
+        if key == "history":
+            added = value.suffix if isinstance(value, SharedHistory) else value[len(state.get("history") or []):]
+            if added:
+                update["history"] = list(added)
+        elif key not in state or value != state[key]:
+            update[key] = value
+    return update
+
+
+def as_node(fn):
+    """
+    Turn a game function changing its state in place into a graph node
+    returning only its changes. Works for sync and async functions; other
+    arguments LangGraph passes (e.g. ``config``) are handed through.
+    """
+    if inspect.iscoroutinefunction(fn):
+        @wraps(fn)
+        async def node(state, *args, **kwargs):
+            return changes(state, await fn(overlay(state), *args, **kwargs))
+    else:
+        @wraps(fn)
+        def node(state, *args, **kwargs):
+            return changes(state, fn(overlay(state), *args, **kwargs))
+    return node
@@ -3,10 +3,26 @@
 Main entry point for the Werewolf game.
 """
 
+import argparse
+import itertools
 import os
+import uuid
 from dotenv import load_dotenv
 from langchain_groq import ChatGroq
-from game.graph import create_game_graph
+from game.graph import create_game_graph, default_recursion_limit
+from game.branching import Branch, compare_branches, run_branches, state_at_round
+from game.budget import Budget, BudgetGovernor
+from game.cassette import CassetteLLM
+from game.checkpoint import DEFAULT_PATH, SAVE_MODES, SQLiteCheckpointer
+from game.context import history_context
+from game.fake_llm import FakeWerewolfLLM
+from game.service import GameService, serve
+from game.simulate import simulate
+from game.state import ROLES, make_roles
+from game.telemetry import GameTelemetry
+
+
+MODEL_NAME = "llama3-8b-8192"
 
 
 def setup_llm():
@@ -19,62 +35,135 @@ def setup_llm():
     # Load environment variables
     load_dotenv()
     
+    # Offline stand-in model, no network access or API key needed
+    if os.getenv("WEREWOLF_FAKE_LLM"):
+        seed = os.getenv("WEREWOLF_SEED")
+        return FakeWerewolfLLM(seed=int(seed) if seed else None)
+    
+    # Optional record/replay cassette
+    cassette = os.getenv("WEREWOLF_CASSETTE")
+    cassette_mode = os.getenv("WEREWOLF_CASSETTE_MODE", "record")
+    if cassette and cassette_mode == "replay":
+        # Replaying needs neither network access nor an API key
+        return CassetteLLM(path=cassette, mode="replay", model_name=MODEL_NAME)
+    
     # Get API key
     api_key = os.getenv("GROQ_API_KEY")
     if not api_key:
         raise ValueError("GROQ_API_KEY not found in environment variables. Please set it in your .env file.")
     
     # Create LLM instance
-    llm = ChatGroq(model="llama3-8b-8192")
+    llm = ChatGroq(model=MODEL_NAME)
+    
+    if cassette:
+        llm = CassetteLLM(llm=llm, path=cassette, mode=cassette_mode)
     
     return llm
 
 
-def create_initial_state():
+def create_initial_state(roles=None):
     """
     Create the initial game state.
     
+    Args:
+        roles: Role table of the game; defaults to ROLES
+    
     Returns:
         Initial game state dictionary
     """
+    roles = roles or ROLES
     return {
         "turn": 0,
         "current_iter": 0,
         "max_iter": 3,
         "history": [],
-        "roles": [],
+        "roles": dict(roles),
         "rules": "",
-        "alive_players": [i for i in range(1, 7)],
+        "alive_players": sorted(roles),
         "voted_to_leave": [],
         "dead_players": [],
     }
 
 
-def main():
+def play_game(telemetry_dir=None, single_call=False, players=6, wolves=2, checkpoint_path=DEFAULT_PATH,
+              checkpoint_every="node", resume=None, budget=None, context=None, recursion_limit=None):
     """
-    Main function to run the Werewolf game.
+    Play one game and print it to the console.
+    
+    Every step is saved to a checkpoint file, so a game interrupted by a
+    crash or a provider error can be resumed where it stopped.
+    
+    Args:
+        telemetry_dir: Optional directory to export per-call LLM
+            telemetry to (llm_calls.jsonl and llm_metrics.prom)
+        single_call: Ask for each speech and vote in one structured call
+        players: Number of players
+        wolves: Number of wolves among them
+        checkpoint_path: SQLite file the game is saved to, or None to
+            not save it
+        checkpoint_every: "node" to save after every step, or "round"
+            to save at round boundaries only
+        resume: Id of a saved game to continue instead of starting one
+        budget: Optional Budget; the game stops once it reaches a cap.
+            A resumed game counts its tokens and time afresh.
+        context: Optional HistoryContext bounding the history sent in
+            each prompt; without one the whole transcript is sent
+        recursion_limit: Graph steps the game may take; by default what
+            the table (and the budget's round cap) needs
     """
     print("🐺 Welcome to the Werewolf Game! 🐺")
     print("=" * 50)
     
+    checkpointer = None
+    game_id = resume or uuid.uuid4().hex[:12]
     try:
         # Setup LLM
         print("Setting up language model...")
         llm = setup_llm()
         
+        roles = make_roles(players, wolves)
+        initial_state = None
+        if checkpoint_path or resume:
+            checkpointer = SQLiteCheckpointer(checkpoint_path or DEFAULT_PATH, every=checkpoint_every)
+        if resume:
+            saved = checkpointer.latest_state(resume)
+            if saved is None:
+                print(f"❌ No saved game {resume!r} in {checkpointer.path}")
+                return
+            roles = saved.get("roles") or ROLES
+            # None continues from the last graph checkpoint; a game saved
+            # by the Streamlit runner is fed back in as the input
+            initial_state = checkpointer.resume_input(resume)
+            print(f"Resuming game {resume} at round {saved.get('current_iter')}, "
+                  f"{len(saved.get('history', []))} messages in...")
+        
         # Create game graph
         print("Creating game graph...")
-        app = create_game_graph(llm)
+        app = create_game_graph(llm, stream=True, single_call=single_call, roles=roles, checkpointer=checkpointer,
+                                context=context)
         
-        # Create initial state
-        print("Initializing game state...")
-        initial_state = create_initial_state()
+        if not resume:
+            # Create initial state
+            print("Initializing game state...")
+            initial_state = create_initial_state(roles)
+        if checkpointer:
+            print(f"💾 Game {game_id} is saved to {checkpointer.path}; "
+                  f"resume it with: python main.py play --resume {game_id}")
         
         print("\n🎮 Starting the game...")
         print("=" * 50)
         
-        # Run the game
-        result = app.invoke(initial_state, config={"recursion_limit": 2000})
+        # Run the game; resuming from a checkpoint passes no input and
+        # continues from the last saved step
+        limit = recursion_limit or default_recursion_limit(roles, budget and budget.rounds)
+        config = {"recursion_limit": limit, "configurable": {"thread_id": game_id}}
+        telemetry = GameTelemetry() if telemetry_dir else None
+        if telemetry:
+            config["callbacks"] = [telemetry]
+        governor = BudgetGovernor(budget) if budget else None
+        if governor:
+            config = governor.attach(config)
+        result = app.invoke(initial_state, config=config, durability="sync" if checkpointer else None)
         
         print("\n" + "=" * 50)
         print("🏁 Game finished!")
@@ -86,11 +175,292 @@ def main():
         for entry in result["history"]:
             print(entry)
         
+        if governor:
+            usage = governor.report(result)
+            stopped = f", stopped by the {usage['exhausted']} cap" if result.get("outcome") == "budget_exhausted" else ""
+            print(f"\n💰 {usage['rounds']} rounds, {usage['tokens']:,} tokens, ${usage['cost']:.4f}, "
+                  f"{usage['seconds']:.1f}s{stopped}")
+        
+        if context:
+            saved = context.counter.report()
+            print(f"\n📜 History summarized to {saved['sent_tokens']:,} of {saved['full_tokens']:,} tokens "
+                  f"({saved['saved_pct']}% saved)")
+        
+        if telemetry:
+            os.makedirs(telemetry_dir, exist_ok=True)
+            telemetry.export_jsonl(os.path.join(telemetry_dir, "llm_calls.jsonl"))
+            telemetry.export_prometheus(os.path.join(telemetry_dir, "llm_metrics.prom"))
+            summary = telemetry.summary()
+            print(f"\n📈 {summary['calls']} LLM calls, "
+                  f"{summary['input_tokens'] + summary['output_tokens']:,} tokens, "
+                  f"${summary['cost']:.4f}, p95 latency {summary['latency_p95']:.2f}s")
+            print(f"   Telemetry written to {telemetry_dir}")
+        
     except Exception as e:
         print(f"❌ Error running the game: {e}")
+        if checkpointer:
+            print(f"💾 Continue it later with: python main.py play --resume {game_id}")
         print("\n💡 Make sure you have:")
         print("  1. Set up your .env file with GROQ_API_KEY")
         print("  2. Installed all dependencies with: pip install -r requirements.txt")
+    finally:
+        if checkpointer:
+            checkpointer.close()
+
+
+def budget_from_args(args):
+    """
+    Return the per-game Budget given on the command line, or None.
+    
+    Args:
+        args: Parsed command line arguments with the budget flags
+    """
+    budget = Budget(rounds=args.max_rounds, tokens=args.max_tokens, dollars=args.max_cost,
+                    seconds=args.max_seconds)
+    return budget if budget != Budget() else None
+
+
+def context_from_args(args):
+    """
+    Return the HistoryContext given on the command line, or None.
+    
+    Args:
+        args: Parsed command line arguments with the history flags
+    """
+    return history_context(args.history_budget, args.keep_last)
+
+
+def run_simulation(args):
+    """
+    Run many games headlessly and write a summary file.
+    
+    Args:
+        args: Parsed ``simulate`` command line arguments
+    """
+    load_dotenv()
+    
+    print(f"🎲 Simulating {args.games} games of {args.players} players with {args.workers} worker(s)...")
+    summary = simulate(
+        args.games,
+        workers=args.workers,
+        seed=args.seed,
+        llm=args.llm,
+        output=args.output,
+        model=MODEL_NAME,
+        vote_mode=args.vote_mode,
+        single_call=args.single_call,
+        players=args.players,
+        wolves=args.wolves,
+        recursion_limit=args.recursion_limit,
+        latency_mean=args.latency,
+        latency_std=args.latency_std,
+        budget=budget_from_args(args),
+        history_budget=args.history_budget,
+        keep_last=args.keep_last,
+    )
+    
+    print(f"🏁 {summary['finished']}/{summary['games']} games finished "
+          f"({summary['budget_exhausted']} over budget, {summary['unfinished']} hit the recursion limit, "
+          f"{summary['errors']} errors) "
+          f"in {summary['elapsed']}s ({summary['games_per_sec']} games/sec)")
+    print(f"   Villagers won {summary['win_rate']['villagers']:.0%}, "
+          f"wolves won {summary['win_rate']['wolves']:.0%}, "
+          f"{summary['rounds']['mean']} rounds on average, {summary['duration']['per_round']}s per round")
+    parse = summary["parse"]
+    votes = sum(parse.get(k, 0) for k in ("vote_valid", "vote_repaired", "vote_invalid"))
+    if votes:
+        print(f"   Votes: {parse.get('vote_repaired', 0)}/{votes} repaired locally, "
+              f"{parse.get('vote_invalid', 0)} unreadable, {parse.get('vote_reasked', 0)} re-asked")
+    if summary["usage"]:
+        usage = summary["usage"]
+        print(f"   Per game: {usage['tokens']['mean']:,.0f} tokens on average ({usage['tokens']['max']:,} at most), "
+              f"${usage['cost']['mean']:.4f} (${usage['cost']['max']:.4f} at most)")
+    if args.single_call:
+        calls = parse.get("single_call_ok", 0) + parse.get("single_call_failed", 0)
+        print(f"   Single-call turns: {parse.get('single_call_failed', 0)}/{calls} fell back to two calls")
+    print(f"📄 Summary written to {args.output}")
+
+
+def run_service(args):
+    """
+    Host many concurrent games behind a local HTTP service.
+    
+    Args:
+        args: Parsed ``serve`` command line arguments
+    """
+    service = GameService(
+        setup_llm(),
+        max_concurrent_calls=args.max_calls,
+        max_games=args.max_games,
+        vote_mode=args.vote_mode,
+        roles=make_roles(args.players, args.wolves),
+        budget=budget_from_args(args),
+        context=context_from_args(args),
+        recursion_limit=args.recursion_limit,
+    )
+    print(f"🐺 Werewolf game service on http://{args.host}:{args.port}")
+    print(f"   {args.max_calls} LLM calls in flight at most, {args.max_games} games at once")
+    print("   POST /games to start a game, GET /games/<id>/events to follow it")
+    try:
+        serve(service, host=args.host, port=args.port)
+    finally:
+        service.shutdown(wait=False)
+
+
+def branch_llm(model, seed):
+    """
+    Set up the language model of one branch.
+    
+    Args:
+        model: Groq model name
+        seed: Seed of the offline fake model, used with WEREWOLF_FAKE_LLM
+    
+    Returns:
+        Configured LLM instance
+    """
+    load_dotenv()
+    if os.getenv("WEREWOLF_FAKE_LLM"):
+        return FakeWerewolfLLM(seed=seed)
+    if not os.getenv("GROQ_API_KEY"):
+        raise ValueError("GROQ_API_KEY not found in environment variables. Please set it in your .env file.")
+    return ChatGroq(model=model)
+
+
+def run_branching(args):
+    """
+    Fork a saved game at a round and play the branches side by side.
+    
+    Every combination of model, vote threshold and turn style is a
+    branch; ``--repeat`` plays each one several times.
+    
+    Args:
+        args: Parsed ``branch`` command line arguments
+    """
+    checkpointer = SQLiteCheckpointer(args.checkpoint_db)
+    try:
+        state = state_at_round(checkpointer, args.game_id, args.round)
+    finally:
+        checkpointer.close()
+    if state is None:
+        where = f"round {args.round} of " if args.round is not None else ""
+        raise SystemExit(f"No saved state for {where}game {args.game_id} in {args.checkpoint_db}")
+    
+    branches = []
+    for model, threshold, calls in itertools.product(args.model, args.threshold or [None], args.calls):
+        for i in range(args.repeat):
+            name = " ".join(filter(None, [
+                model if len(args.model) > 1 else "",
+                f"t={threshold}" if threshold is not None else "",
+                f"{calls}-call" if len(args.calls) > 1 else "",
+                f"#{i + 1}" if args.repeat > 1 else "",
+            ])) or "branch"
+            branches.append(Branch(name=name, llm=branch_llm(model, args.seed + len(branches)),
+                                   vote_threshold=threshold,
+                                   settings={"single_call": calls == "single"}))
+    
+    print(f"🌿 Forking game {args.game_id} at round {state.get('current_iter')} "
+          f"into {len(branches)} branches")
+    results = run_branches(state, branches, max_workers=args.workers, recursion_limit=args.recursion_limit)
+    
+    rows = compare_branches(results)
+    widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+    for row in rows:
+        print("   " + "  ".join(cell.ljust(width) for cell, width in zip(row, widths)))
+
+
+def main(argv=None):
+    """
+    Main function to run the Werewolf game.
+    
+    Args:
+        argv: Command line arguments; defaults to ``sys.argv[1:]``
+    """
+    parser = argparse.ArgumentParser(prog="weaverwolf", description="Multi-agent werewolf game.")
+    commands = parser.add_subparsers(dest="command")
+    
+    play = commands.add_parser("play", help="play one game in the console (default)")
+    play.add_argument("--telemetry", metavar="DIR", help="export per-call LLM telemetry to DIR")
+    play.add_argument("--resume", metavar="GAME_ID", help="continue a saved game")
+    play.add_argument("--checkpoint-db", default=DEFAULT_PATH,
+                      help=f"SQLite file games are saved to (default: {DEFAULT_PATH})")
+    play.add_argument("--checkpoint-every", choices=SAVE_MODES, default="node",
+                      help="save after every step (default) or at round boundaries only")
+    play.add_argument("--no-checkpoint", action="store_true", help="do not save the game")
+    play.add_argument("--single-call", action="store_true",
+                      help="ask for speech and vote in one structured call per turn")
+    
+    sim = commands.add_parser("simulate", help="run many games headlessly and summarize them")
+    sim.add_argument("-n", "--games", type=int, default=100, help="number of games (default: 100)")
+    sim.add_argument("-w", "--workers", type=int, default=os.cpu_count() or 1,
+                     help="worker processes (default: CPU count)")
+    sim.add_argument("--seed", type=int, default=0, help="seed of the first game; game i uses seed + i")
+    sim.add_argument("--llm", choices=["fake", "groq"], default="fake",
+                     help="offline fake model or Groq (default: fake)")
+    sim.add_argument("--vote-mode", choices=["turn", "round"], default="turn")
+    sim.add_argument("--single-call", action="store_true",
+                     help="ask for speech and vote in one structured call per turn")
+    sim.add_argument("--latency", type=float, default=0.0, help="mean fake model latency in seconds")
+    sim.add_argument("--latency-std", type=float, default=0.0, help="fake model latency spread in seconds")
+    sim.add_argument("-o", "--output", default="simulation_summary.json", help="summary file")
+    
+    srv = commands.add_parser("serve", help="host many concurrent games over HTTP")
+    srv.add_argument("--host", default="127.0.0.1")
+    srv.add_argument("--port", type=int, default=8000)
+    srv.add_argument("--max-calls", type=int, default=4, help="LLM calls in flight across all games (default: 4)")
+    srv.add_argument("--max-games", type=int, default=32, help="games running at once (default: 32)")
+    srv.add_argument("--vote-mode", choices=["turn", "round"], default="turn")
+    fork = commands.add_parser("branch", help="fork a saved game at a round and compare what-if branches")
+    fork.add_argument("game_id", help="saved game to fork")
+    fork.add_argument("--round", type=int, help="round to fork at (default: the latest saved state)")
+    fork.add_argument("--checkpoint-db", default=DEFAULT_PATH,
+                      help=f"SQLite file the game was saved to (default: {DEFAULT_PATH})")
+    fork.add_argument("--model", nargs="+", default=[MODEL_NAME], help=f"models to try (default: {MODEL_NAME})")
+    fork.add_argument("--threshold", nargs="+", type=float,
+                      help="fractions of the alive players needed to eliminate someone (default: the game's)")
+    fork.add_argument("--calls", nargs="+", choices=["two", "single"], default=["two"],
+                      help="turn styles to try: speech and vote in two calls or in one (default: two)")
+    fork.add_argument("--repeat", type=int, default=1, help="games per branch (default: 1)")
+    fork.add_argument("--seed", type=int, default=0, help="seed of the first fake-model branch")
+    fork.add_argument("-w", "--workers", type=int, help="branches played at once (default: all)")
+    fork.add_argument("--recursion-limit", type=int,
+                      help="graph steps each branch may take (default: what the table needs)")
+    
+    for command in (play, sim, srv):
+        command.add_argument("--players", type=int, default=6, help="number of players (default: 6)")
+        command.add_argument("--wolves", type=int, default=2, help="number of wolves (default: 2)")
+        command.add_argument("--recursion-limit", type=int,
+                             help="graph steps a game may take (default: enough for the table, at least 2000)")
+        command.add_argument("--max-rounds", type=int, help="stop a game after this many rounds")
+        command.add_argument("--max-tokens", type=int, help="stop a game once it used this many tokens")
+        command.add_argument("--max-cost", type=float, help="stop a game once it cost this many dollars")
+        command.add_argument("--max-seconds", type=float, help="stop a game after this much wall time")
+        command.add_argument("--history-budget", type=int, default=1500,
+                             help="history tokens sent per prompt, older turns are summarized; "
+                                  "0 sends the whole transcript (default: 1500)")
+        command.add_argument("--keep-last", type=int, default=12,
+                             help="most recent player turns sent verbatim once the history is over "
+                                  "the budget (default: 12)")
+    
+    args = parser.parse_args(argv)
+    
+    if args.command == "simulate":
+        run_simulation(args)
+    elif args.command == "serve":
+        run_service(args)
+    elif args.command == "branch":
+        run_branching(args)
+    else:
+        play_game(telemetry_dir=getattr(args, "telemetry", None),
+                  single_call=getattr(args, "single_call", False),
+                  players=getattr(args, "players", 6),
+                  wolves=getattr(args, "wolves", 2),
+                  checkpoint_path=None if getattr(args, "no_checkpoint", False)
+                  else getattr(args, "checkpoint_db", DEFAULT_PATH),
+                  checkpoint_every=getattr(args, "checkpoint_every", "node"),
+                  resume=getattr(args, "resume", None),
+                  budget=budget_from_args(args) if args.command else None,
+                  context=context_from_args(args) if args.command else history_context(),
+                  recursion_limit=getattr(args, "recursion_limit", None))
 
 
 if __name__ == "__main__":
@@ -9,31 +9,73 @@ import os
 from dotenv import load_dotenv
 from langchain_groq import ChatGroq
 from game.graph import create_game_graph
-from game.state import ROLES
+from game.cassette import CassetteLLM
+from game.checkpoint import DEFAULT_PATH, SQLiteCheckpointer
+from game.context import history_context
+from game.fake_llm import FakeWerewolfLLM
+from game.pacing import PACING_MODES, Pacing
+from game.service import FairScheduler, ScheduledLLM
+from game.state import make_roles, roles_of
+from game.telemetry import GameTelemetry
 from game.streamlit_game import (
     create_streamlit_game_runner,
     display_game_metrics,
     display_players_status,
     display_voting_status,
     display_game_history,
-    create_initial_state
+    display_telemetry_panel,
+    create_initial_state,
+    ChatRenderer
 )
 
 
+MODEL_NAME = "llama3-8b-8192"
+
+
 def setup_llm():
     """Set up the language model for the game."""
     load_dotenv()
+    if os.getenv("WEREWOLF_FAKE_LLM"):
+        seed = os.getenv("WEREWOLF_SEED")
+        return FakeWerewolfLLM(seed=int(seed) if seed else None)
+    
+    cassette = os.getenv("WEREWOLF_CASSETTE")
+    cassette_mode = os.getenv("WEREWOLF_CASSETTE_MODE", "record")
+    if cassette and cassette_mode == "replay":
+        return CassetteLLM(path=cassette, mode="replay", model_name=MODEL_NAME)
+    
     api_key = os.getenv("GROQ_API_KEY")
     if not api_key:
         st.error("GROQ_API_KEY not found in environment variables. Please set it in your .env file.")
         st.stop()
     
-    return ChatGroq(model="llama3-8b-8192")
+    llm = ChatGroq(model=MODEL_NAME)
+    if cassette:
+        llm = CassetteLLM(llm=llm, path=cassette, mode=cassette_mode)
+    return llm
+
+
+@st.cache_resource
+def get_shared_llm():
+    """
+    One LLM client for every session of this server.
+    
+    Calls go through a fair scheduler so concurrent games share a global
+    limit (WEREWOLF_MAX_LLM_CALLS, default 4) without starving each other.
+    """
+    max_calls = int(os.getenv("WEREWOLF_MAX_LLM_CALLS", "4"))
+    return ScheduledLLM(setup_llm(), scheduler=FairScheduler(max_calls))
+
 
+@st.cache_resource
+def get_checkpointer():
+    """Checkpoint file shared by every session (WEREWOLF_CHECKPOINT_DB)."""
+    return SQLiteCheckpointer(os.getenv("WEREWOLF_CHECKPOINT_DB", DEFAULT_PATH))
 
-def get_player_role(player_num):
+
+def get_player_role(player_num, roles):
     """Get player role with emoji."""
-    role = ROLES.get(player_num, "unknown")
+    role = roles.get(player_num, "unknown")
     if "wolf" in role:
         return f"🐺 {role}"
     elif "doctor" in role:
@@ -63,12 +105,40 @@ def main():
     with st.sidebar:
         st.header("🎮 Game Controls")
         
+        pacing_mode = st.selectbox(
+            "⏩ Pacing",
+            list(PACING_MODES),
+            index=list(PACING_MODES).index("realtime"),
+            help="turbo: no pauses between steps, for evaluation games",
+        )
+        
+        col_players, col_wolves = st.columns(2)
+        n_players = col_players.number_input("👥 Players", min_value=3, max_value=100, value=6, step=1)
+        n_wolves = col_wolves.number_input("🐺 Wolves", min_value=1, max_value=49, value=2, step=1)
+        history_budget = st.number_input(
+            "📜 History budget (tokens)", min_value=0, value=1500, step=100,
+            help="history sent per prompt; once over it, older turns are summarized. 0 sends the whole transcript",
+        )
+        
         if st.button("🚀 Start New Game", type="primary"):
             st.session_state.game_started = True
             st.session_state.game_finished = False
             st.session_state.current_state = None
+            st.session_state.resume_id = None
+            st.rerun()
+        
+        # Continue a saved game, e.g. after the server restarted
+        resume_id = st.text_input("💾 Resume game id", value=st.query_params.get("resume", ""))
+        if st.button("▶️ Resume Game") and resume_id:
+            st.session_state.game_started = True
+            st.session_state.game_finished = False
+            st.session_state.current_state = None
+            st.session_state.resume_id = resume_id.strip()
             st.rerun()
         
+        if st.session_state.get("game_runner"):
+            st.caption(f"💾 Game id: `{st.session_state.game_runner.game_id}`")
+        
         st.header("📊 Game Info")
         st.info("""
         **Game Rules:**
@@ -79,8 +149,14 @@ def main():
         """)
         
         st.header("🎭 Player Roles")
-        for player_num, role in ROLES.items():
-            st.write(f"Player {player_num}: {get_player_role(player_num)}")
+        roles = roles_of(st.session_state.get("current_state") or {})
+        for player_num in sorted(roles):
+            st.write(f"Player {player_num}: {get_player_role(player_num, roles)}")
+        
+        # Live LLM cost and latency of the current game
+        telemetry_placeholder = st.empty()
+        with telemetry_placeholder.container():
+            display_telemetry_panel(st.session_state.get("telemetry"))
     
     # Main game area
     if not st.session_state.get("game_started", False):
@@ -90,15 +166,35 @@ def main():
     # Initialize game if not already done
     if st.session_state.get("current_state") is None:
         with st.spinner("Setting up the game..."):
-            llm = setup_llm()
-            game_runner = create_streamlit_game_runner(llm)
-            initial_state = create_initial_state()
+            llm = get_shared_llm()
+            telemetry = GameTelemetry()
+            game_runner = create_streamlit_game_runner(llm, telemetry=telemetry, pacing=pacing_mode,
+                                                       checkpointer=get_checkpointer(),
+                                                       context=history_context(int(history_budget)))
+            if st.session_state.get("resume_id"):
+                initial_state = game_runner.resume(st.session_state.resume_id)
+                if initial_state is None:
+                    st.error(f"❌ No saved game {st.session_state.resume_id!r}")
+                    st.session_state.game_started = False
+                    return
+            else:
+                try:
+                    roles = make_roles(int(n_players), int(n_wolves))
+                except ValueError as e:
+                    st.error(f"❌ {e}")
+                    return
+                initial_state = create_initial_state(roles)
             
             # Store in session state
+            st.session_state.telemetry = telemetry
             st.session_state.game_runner = game_runner
             st.session_state.current_state = initial_state
             st.session_state.game_started = True
     
+    # Apply a pacing change to the running game
+    if st.session_state.get("game_runner") and st.session_state.game_runner.pacing.mode != pacing_mode:
+        st.session_state.game_runner.pacing = Pacing(pacing_mode)
+    
     # Display game state
     current_state = st.session_state.get("current_state")
     
@@ -113,7 +209,7 @@ def main():
         display_voting_status(current_state)
         
         # Game history
-        display_game_history(current_state)
+        display_game_history(current_state, st.session_state.game_runner.log.events)
         
         # Game controls
         col1, col2, col3 = st.columns(3)
@@ -154,21 +250,13 @@ def main():
                 if st.session_state.get("game_runner"):
                     st.info("Running full game with live updates...")
                     
-                    # Create placeholders for live updates
-                    metrics_placeholder = st.empty()
-                    players_placeholder = st.empty()
-                    voting_placeholder = st.empty()
-                    history_placeholder = st.empty()
+                    # Live view that only draws what changed since the last update
+                    live_view = ChatRenderer()
                     
-                    def update_callback(state):
-                        with metrics_placeholder.container():
-                            display_game_metrics(state)
-                        with players_placeholder.container():
-                            display_players_status(state)
-                        with voting_placeholder.container():
-                            display_voting_status(state)
-                        with history_placeholder.container():
-                            display_game_history(state)
+                    def update_callback(snapshot, delta):
+                        live_view.update(snapshot, st.session_state.game_runner.log, delta)
+                        with telemetry_placeholder.container():
+                            display_telemetry_panel(st.session_state.get("telemetry"))
                     
                     game_runner = st.session_state.game_runner
                     game_runner.set_callback(update_callback)
@@ -186,11 +274,9 @@ def main():
         
         with col5:
             if auto_advance and st.session_state.get("game_runner"):
-                import time
-                time.sleep(2)  # Wait 2 seconds between auto-advances
-                
                 # Auto-advance logic
                 game_runner = st.session_state.game_runner
+                game_runner.pacing.pause("auto_advance")  # Wait between auto-advances
                 current_state = st.session_state.current_state
                 
                 from game.game_logic import next_node
@@ -3,9 +3,24 @@
 Basic tests for the Werewolf game components.
 """
 
+import asyncio
+import gc
+import json
+import re
 import pytest
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
 from game.state import GraphState, GuessWhoIsWolf, ROLES, RULES
-from game.game_logic import next_node
+from game.game_logic import game_winner, god, next_node
+from game.events import EventBus, FileSink, GameEnd, RingBufferSink, RoundStart
+from game.prompts import get_player_chains
+from game.context import HistoryContext
+from game.cassette import CassetteLLM, CassetteMiss
+from game.fake_llm import FakeWerewolfLLM
+from game.graph import create_game_graph
+from game.simulate import simulate
+from game.telemetry import GameTelemetry
+from benchmark import compare
+from game.players import collect_round_votes, run_player_turn, arun_player_turn
 
 
 def test_graph_state():
@@ -64,5 +79,854 @@ def test_guess_who_is_wolf_model():
     assert "suspicious" in guess.description
 
 
+VOTE_JSON = json.dumps({
+    "guessed_wolf": 3,
+    "percentage_assureness": 80,
+    "question": "Which player do you think is a wolf?",
+    "description": "Player 3 seems suspicious"
+})
+
+
+def test_collect_round_votes():
+    """Test that round votes are gathered for every alive player."""
+    vote = VOTE_JSON
+    llm = FakeListChatModel(responses=[vote])
+    state = {
+        "turn": 6,
+        "history": ["player 1: I'm a villeger."],
+        "alive_players": [1, 2, 3, 5, 6],
+        "dead_players": [4],
+        "voted_to_leave": []
+    }
+    
+    log = RingBufferSink()
+    collect_round_votes(state, llm, max_concurrency=2, events=EventBus([log]))
+    # Player 3 may not vote for itself; its vote is repaired to player 2
+    assert state["voted_to_leave"] == [3, 3, 2, 3, 3]
+    assert [e.player for e in log.events] == [1, 2, 3, 5, 6]
+
+
+def test_run_player_turn_parallel():
+    """Test that a parallel turn records both the speech and the vote."""
+    llm = FakeListChatModel(responses=[VOTE_JSON])
+    state = {
+        "turn": 0,
+        "history": [],
+        "alive_players": [1, 2, 3, 4, 5, 6],
+        "dead_players": [],
+        "voted_to_leave": []
+    }
+    
+    run_player_turn(state, player_number=4, llm=llm, parallel=True)
+    assert state["turn"] == 4
+    assert state["history"] == [f"player 4: {VOTE_JSON}"]
+    assert state["voted_to_leave"] == [3]
+
+
+def test_arun_player_turn():
+    """Test the async player turn against the sync one."""
+    llm = FakeListChatModel(responses=[VOTE_JSON])
+    state = {
+        "turn": 0,
+        "history": [],
+        "alive_players": [1, 2, 3, 4, 5, 6],
+        "dead_players": [],
+        "voted_to_leave": []
+    }
+    
+    asyncio.run(arun_player_turn(state, player_number=5, llm=llm, parallel=True))
+    assert state["turn"] == 5
+    assert state["history"] == [f"player 5: {VOTE_JSON}"]
+    assert state["voted_to_leave"] == [3]
+
+
+def test_player_chains_are_cached():
+    """Test that prompt chains are built once per language model."""
+    llm = FakeListChatModel(responses=[VOTE_JSON])
+    other_llm = FakeListChatModel(responses=[VOTE_JSON])
+    
+    assert get_player_chains(llm) is get_player_chains(llm)
+    assert get_player_chains(llm) is not get_player_chains(other_llm)
+
+
+def test_player_chains_do_not_outlive_their_games():
+    """Test that the chain cache does not keep finished games' models alive."""
+    from game import prompts
+    
+    before = len(prompts._CHAINS)
+    app = create_game_graph(FakeListChatModel(responses=[VOTE_JSON]))
+    assert len(prompts._CHAINS) == before + 1
+    
+    del app
+    gc.collect()
+    assert len(prompts._CHAINS) == before
+
+
+def test_history_context_summarizes_old_entries():
+    """Test that old history is folded into a summary within the budget."""
+    context = HistoryContext(keep_last=2, token_budget=45)
+    state = {"history": ["player 1: I'm a villeger."]}
+    
+    assert context.render(state) == "player 1: I'm a villeger."
+    
+    state["history"] += [
+        "player 2: Player 3 is a wolf. He keeps changing his story and "
+        "nobody here believes a single word he says anymore.",
+        "player 3: I'm a villeger.",
+        "God: Dear players, a new round starts.",
+        "player 4: I agree with player 2.",
+    ]
+    # A transcript within the budget is sent as it is
+    fits = {"history": list(state["history"])}
+    assert HistoryContext(keep_last=2, token_budget=1000).render(fits) == "\n".join(fits["history"])
+    assert not fits.get("history_summary")
+    
+    # Over the budget, the last two turns and what falls between them are
+    # kept verbatim
+    text = context.render(state)
+    assert text.endswith("player 3: I'm a villeger.\nGod: Dear players, a new round starts.\n"
+                         "player 4: I agree with player 2.")
+    assert "player 2: Player 3 is a wolf." in text
+    assert "keeps changing" not in text
+    assert state["summarized_upto"] == 2
+    
+    report = context.counter.report()
+    assert report["prompts"] == 2
+    assert report["saved_tokens"] > 0
+
+
+def test_cassette_record_and_replay(tmp_path):
+    """Test that recorded responses are replayed in order without the model."""
+    path = str(tmp_path / "cassette.sqlite")
+    recorder = CassetteLLM(
+        llm=FakeListChatModel(responses=["first", "second"]),
+        path=path,
+        mode="record",
+        model_name="fake",
+    )
+    assert recorder.invoke("hello").content == "first"
+    assert recorder.invoke("hello").content == "second"
+    recorder.close()
+    
+    player = CassetteLLM(path=path, mode="replay", model_name="fake")
+    assert player.invoke("hello").content == "first"
+    assert player.invoke("hello").content == "second"
+    with pytest.raises(CassetteMiss):
+        player.invoke("hello")
+    
+    player.rewind()
+    assert player.invoke("hello").content == "first"
+
+
+def test_fake_llm_votes_are_valid_and_seeded():
+    """Test that the offline model returns valid, reproducible votes."""
+    state = {
+        "turn": 0,
+        "history": [],
+        "alive_players": [1, 2, 3, 5],
+        "dead_players": [4, 6],
+        "voted_to_leave": []
+    }
+    guesses = []
+    for _ in range(2):
+        state["history"], state["voted_to_leave"] = [], []
+        log = RingBufferSink()
+        run_player_turn(state, player_number=3, llm=FakeWerewolfLLM(seed=7), events=EventBus([log]))
+        guesses.append((state["history"][0], log.events[-1]))
+    
+    assert guesses[0] == guesses[1]
+    assert all(v in [1, 2, 5] for v in state["voted_to_leave"])
+
+
+def test_fake_llm_round_votes_are_reproducible():
+    """Test that a seeded game replays exactly with votes collected on threads."""
+    def play():
+        app = create_game_graph(FakeWerewolfLLM(seed=5), vote_mode="round", max_concurrency=6)
+        initial_state = {"turn": 0, "history": [], "alive_players": [1, 2, 3, 4, 5, 6],
+                         "dead_players": [], "voted_to_leave": []}
+        return app.invoke(initial_state, config={"recursion_limit": 500})
+    
+    first = play()
+    assert play()["history"] == first["history"]
+
+
+def test_full_game_with_fake_llm():
+    """Test a complete game through the compiled graph."""
+    app = create_game_graph(FakeWerewolfLLM(seed=9))
+    initial_state = {
+        "turn": 0,
+        "history": [],
+        "alive_players": [1, 2, 3, 4, 5, 6],
+        "dead_players": [],
+        "voted_to_leave": []
+    }
+    
+    result = app.invoke(initial_state, config={"recursion_limit": 500})
+    assert next_node(result) == "to_end"
+
+
+def test_simulate_summary(tmp_path):
+    """Test that a small batch of offline games is summarized."""
+    output = tmp_path / "summary.json"
+    summary = simulate(3, workers=1, seed=9, llm="fake", output=str(output), recursion_limit=300)
+    
+    assert summary["games"] == 3
+    assert summary["finished"] + summary["unfinished"] + summary["errors"] == 3
+    assert len(summary["results"]) == 3
+    assert json.loads(output.read_text())["games"] == 3
+
+
+def test_benchmark_compare_flags_regressions():
+    """Test that rate drops and token increases are flagged."""
+    baseline = {"games_per_sec": 10.0, "tokens_per_game": 1000.0}
+    
+    rows = compare({"games_per_sec": 9.5, "tokens_per_game": 1050.0}, baseline, threshold=0.1)
+    assert not any(row[-1] for row in rows)
+    
+    rows = dict((row[0], row[-1]) for row in compare({"games_per_sec": 8.0, "tokens_per_game": 1200.0}, baseline, threshold=0.1))
+    assert rows == {"games_per_sec": True, "tokens_per_game": True}
+
+
+def test_telemetry_records_each_call(tmp_path):
+    """Test that every model call of a turn is recorded and exported."""
+    telemetry = GameTelemetry()
+    state = {
+        "turn": 0,
+        "current_iter": 2,
+        "history": [],
+        "alive_players": [1, 2, 3, 4, 5, 6],
+        "dead_players": [],
+        "voted_to_leave": []
+    }
+    run_player_turn(state, player_number=4, llm=FakeWerewolfLLM(seed=1).with_config(callbacks=[telemetry]))
+    
+    phases = sorted(r["phase"] for r in telemetry.records)
+    assert phases == ["speech", "vote"]
+    assert all(r["player"] == 4 and r["round"] == 2 for r in telemetry.records)
+    assert all(r["input_tokens"] > 0 for r in telemetry.records)
+    assert telemetry.summary()["calls"] == 2
+    
+    telemetry.export_jsonl(tmp_path / "calls.jsonl")
+    telemetry.export_prometheus(tmp_path / "metrics.prom")
+    assert len((tmp_path / "calls.jsonl").read_text().splitlines()) == 2
+    assert 'werewolf_llm_call_seconds_count{phase="vote"} 1' in (tmp_path / "metrics.prom").read_text()
+
+
+def test_event_bus_sinks(tmp_path, capsys):
+    """Test that god reports typed events to every sink and nothing else."""
+    state = {
+        "turn": 6,
+        "history": [],
+        "alive_players": [1, 2, 3, 4, 5, 6],
+        "dead_players": [],
+        "voted_to_leave": [3, 3, 3, 5],
+    }
+    log = RingBufferSink(maxlen=1)
+    path = tmp_path / "events.jsonl"
+    events = EventBus([log, FileSink(str(path))])
+    
+    god(state, events=events)
+    assert "debug_log" not in state
+    assert capsys.readouterr().out == ""
+    assert log.total == 2
+    assert list(log.events) == [RoundStart(round=1, wolves=2, villagers=3)]
+    
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert lines[0]["type"] == "Elimination"
+    assert lines[0]["player"] == 3
+    
+    state["alive_players"] = [1, 2, 4]
+    assert next_node(state, events=events) == "to_end"
+    assert log.events[-1] == GameEnd(winner="wolves")
+
+
+
+def test_chat_renderer_draws_only_new_entries(monkeypatch):
+    """Test that live updates draw new messages only and page old ones."""
+    from game import streamlit_game
+    
+    drawn = []
+    monkeypatch.setattr(streamlit_game, "_render_chat_entry", lambda entry, roles=None: drawn.append(entry))
+    monkeypatch.setattr(streamlit_game, "display_players_status", lambda state: drawn.append("players"))
+    
+    history = [f"player 1: message {i}" for i in range(120)]
+    state = {"history": history, "alive_players": [1, 2, 3], "voted_to_leave": [], "turn": 1}
+    renderer = streamlit_game.ChatRenderer(page_size=50)
+    
+    renderer.update(state)
+    assert drawn.count("players") == 1
+    assert len(drawn) == 51
+    
+    drawn.clear()
+    history.append("player 2: new")
+    renderer.update(state)
+    assert drawn == ["player 2: new"]
+    
+    entries, pages = streamlit_game.history_page(history, 2, page_size=50)
+    assert pages == 3
+    assert entries == history[:21]
+
+
+def test_turbo_pacing_never_sleeps():
+    """Test that turbo pacing skips every pause and animation frame."""
+    from game.pacing import Pacing
+    from game.streamlit_game import StreamlitGameRunner
+    
+    pauses = []
+    for mode in ("turbo", "realtime"):
+        updates = []
+        runner = StreamlitGameRunner(FakeWerewolfLLM(seed=1), events=EventBus(),
+                                     pacing=Pacing(mode, sleep=lambda delay: pauses.append((mode, delay))))
+        runner.set_callback(lambda snapshot, delta: updates.append(delta))
+        runner.state = {"turn": 0, "history": [], "alive_players": [1, 2, 3, 4, 5, 6],
+                        "dead_players": [], "voted_to_leave": []}
+        runner.run_player_turn_with_updates(1)
+        assert len(runner.state["history"]) == 1
+        if mode == "turbo":
+            assert pauses == []
+            turbo_updates = len(updates)
+    
+    assert sum(delay for _, delay in pauses) > 6
+    assert len(updates) > turbo_updates
+    with pytest.raises(ValueError):
+        Pacing("ludicrous")
+
+
+def test_state_store_shares_unchanged_values():
+    """Test that snapshots share lists, stay frozen and report deltas."""
+    from game.store import StateStore
+    
+    store = StateStore()
+    state = {"turn": 1, "history": ["a"], "alive_players": [1, 2, 3], "voted_to_leave": []}
+    first, delta = store.commit(state)
+    assert delta.changed == {"turn", "history", "alive_players", "voted_to_leave"}
+    
+    second, delta = store.commit(state)
+    assert second is first and not delta.changed
+    
+    state["history"].append("b")
+    state["alive_players"].remove(2)
+    third, delta = store.commit(state)
+    assert delta.changed == {"history", "alive_players"}
+    assert delta.appended == {"history": ("b",)}
+    assert third["voted_to_leave"] is first["voted_to_leave"]
+    assert list(first["history"]) == ["a"] and list(third["history"]) == ["a", "b"]
+    assert first["alive_players"] == (1, 2, 3) and third["alive_players"] == (1, 3)
+    with pytest.raises(TypeError):
+        third["turn"] = 2
+    
+    state["history"].extend(["c", "d"])
+    assert third["history"][-2:] == ["a", "b"] and third["history"][::-1] == ["b", "a"]
+    
+    state["roles"] = {1: "wolf", 3: "villager"}
+    fourth, _ = store.commit(state)
+    state["roles"][3] = "doctor"
+    fifth, delta = store.commit(state)
+    assert delta.changed == {"roles"}
+    assert fourth["roles"][3] == "villager" and fifth["roles"][3] == "doctor"
+
+
+def test_fair_scheduler_serves_games_in_turn():
+    """Test that waiting games take turns for the shared LLM slots."""
+    import threading
+    import time
+    from game.service import FairScheduler
+    
+    scheduler = FairScheduler(max_concurrency=1)
+    served = []
+    scheduler.acquire("busy")
+    
+    def call(game_id):
+        with scheduler.slot(game_id):
+            served.append(game_id)
+    
+    threads = []
+    for game_id in ("a", "a", "b"):
+        thread = threading.Thread(target=call, args=(game_id,))
+        thread.start()
+        threads.append(thread)
+        time.sleep(0.05)
+    scheduler.release()
+    for thread in threads:
+        thread.join(timeout=5)
+    
+    assert served == ["a", "b", "a"]
+    assert scheduler.in_flight == 0
+
+
+def test_game_service_runs_isolated_games():
+    """Test that concurrent hosted games keep their own state and events."""
+    from game.service import GameService
+    
+    service = GameService(FakeWerewolfLLM(seed=9), max_concurrent_calls=2, max_games=3,
+                          recursion_limit=300, keep_finished=2)
+    games = [service.start_game() for _ in range(3)]
+    for game in games:
+        assert game.done.wait(timeout=30)
+    
+    assert len({game.id for game in games}) == 3
+    for game in games:
+        events = list(service.events(game.id))
+        assert game.status in ("finished", "unfinished")
+        assert sum(isinstance(e, RoundStart) for e in events) == game.state["current_iter"]
+    assert service.scheduler.in_flight == 0
+    
+    # Starting a game drops the oldest finished one beyond keep_finished
+    latest = service.start_game()
+    assert latest.done.wait(timeout=30)
+    service.shutdown()
+    oldest = min(games, key=lambda game: game.finished)
+    assert service.get(oldest.id) is None and len(service.games) == 3
+
+
+def test_fair_scheduler_async_waiters_are_cancel_safe():
+    """Test that coroutines wait in line without threads and give up their place on cancel."""
+    from game.service import FairScheduler
+    
+    async def scenario():
+        scheduler = FairScheduler(max_concurrency=1)
+        scheduler.acquire("busy")
+        cancelled = asyncio.create_task(scheduler.aacquire("a"))
+        waiting = asyncio.create_task(scheduler.aacquire("b"))
+        await asyncio.sleep(0.01)
+        cancelled.cancel()
+        await asyncio.sleep(0.01)
+        scheduler.release()
+        await asyncio.wait_for(waiting, timeout=5)
+        assert scheduler.in_flight == 1
+        scheduler.release()
+        return scheduler
+    
+    scheduler = asyncio.run(scenario())
+    assert scheduler.in_flight == 0 and not scheduler._queues
+
+
+def test_streamed_speech_matches_invoked_speech(capsys):
+    """Test that streamed speeches report tokens and record the full text."""
+    from game.events import ConsoleSink, SpeechToken
+    
+    def new_state():
+        return {"turn": 0, "history": [], "alive_players": [1, 2, 3, 4, 5, 6],
+                "dead_players": [], "voted_to_leave": []}
+    
+    invoked = run_player_turn(new_state(), 2, FakeWerewolfLLM(seed=3), events=EventBus())
+    
+    tokens = []
+    log = RingBufferSink()
+    events = EventBus([ConsoleSink(), log, lambda e: isinstance(e, SpeechToken) and tokens.append(e.text)])
+    streamed = run_player_turn(new_state(), 2, FakeWerewolfLLM(seed=3), events=events, stream=True)
+    
+    assert streamed["history"] == invoked["history"]
+    assert len(tokens) > 1
+    assert streamed["history"][0] == "player 2: " + "".join(tokens)
+    assert not any(isinstance(e, SpeechToken) for e in log.events)
+    assert f"player 2): {''.join(tokens)}\n" in capsys.readouterr().out
+    
+    async_state = asyncio.run(arun_player_turn(new_state(), 2, FakeWerewolfLLM(seed=3), events=EventBus(),
+                                               parallel=True, stream=True))
+    assert async_state["history"] == invoked["history"]
+    assert async_state["voted_to_leave"] == invoked["voted_to_leave"]
+
+
+def test_single_call_turn_and_fallback():
+    """Test that a single-call turn speaks and votes, and falls back on bad output."""
+    from game.parsing import PARSE_STATS
+    
+    def new_state():
+        return {"turn": 0, "history": [], "alive_players": [1, 2, 3, 4, 5, 6],
+                "dead_players": [], "voted_to_leave": []}
+    
+    before = PARSE_STATS.snapshot()
+    state = run_player_turn(new_state(), 4, FakeWerewolfLLM(seed=5), events=EventBus(), single_call=True)
+    assert state["history"][0].startswith("player 4: I'm a villeger.")
+    assert PARSE_STATS.since(before) == {"single_call_ok": 1, "vote_valid": 1}
+    
+    # Not JSON: the turn falls back to the speech and vote calls
+    llm = FakeListChatModel(responses=["Just talking.", "I'm a villeger.", VOTE_JSON])
+    state = run_player_turn(new_state(), 4, llm, events=EventBus(), single_call=True)
+    assert state["history"] == ["player 4: I'm a villeger."]
+    assert state["voted_to_leave"] == [3]
+    assert PARSE_STATS.since(before) == {"single_call_ok": 1, "single_call_failed": 1, "vote_valid": 2}
+
+
+def test_vote_parsing_repairs_replies():
+    """Test that votes are constrained to the candidates and repaired locally."""
+    from game.parsing import ParseStats, parse_vote
+    
+    stats = ParseStats()
+    candidates = (1, 2, 5, 6)
+    assert parse_vote(VOTE_JSON.replace("3", "5"), candidates, stats).guessed_wolf == 5
+    
+    # Dead player, mentioned candidate in the reasoning, confidence out of range
+    reply = "```json\n" + json.dumps({"guessed_wolf": 4, "percentage_assureness": "120%",
+                                       "description": "Player 6 lied about player 4"}) + "\n```"
+    vote = parse_vote(reply, candidates, stats)
+    assert (vote.guessed_wolf, vote.percentage_assureness) == (6, 100)
+    
+    # Self vote with no usable mention goes to the closest candidate
+    assert parse_vote(VOTE_JSON, candidates, stats).guessed_wolf == 2
+    assert parse_vote("I have no idea.", candidates, stats) is None
+    assert stats.snapshot() == {"vote_valid": 1, "vote_repaired": 2, "vote_invalid": 1}
+
+
+def test_vote_format_instructions_list_the_candidates():
+    """Test that each turn's instructions only allow its candidates, from a bounded cache."""
+    from game.parsing import vote_format_instructions
+    
+    schema = json.loads(vote_format_instructions((1, 2, 5)).split("```")[-2])
+    assert schema["properties"]["guessed_wolf"]["enum"] == [1, 2, 5]
+    assert schema["required"][0] == "guessed_wolf"
+    
+    for n in range(2, 600):
+        vote_format_instructions(tuple(range(1, n)))
+    assert vote_format_instructions.cache_info().currsize <= vote_format_instructions.cache_info().maxsize
+
+
+def test_unreadable_vote_is_reasked_once():
+    """Test that a vote that cannot be read is asked again, then abstains."""
+    from game.parsing import PARSE_STATS
+    
+    def new_state():
+        return {"turn": 0, "history": [], "alive_players": [1, 2, 3, 4, 5, 6],
+                "dead_players": [], "voted_to_leave": []}
+    
+    before = PARSE_STATS.snapshot()
+    telemetry = GameTelemetry()
+    llm = FakeListChatModel(responses=["I'm a villeger.", "Not sure.", VOTE_JSON]).with_config(callbacks=[telemetry])
+    state = run_player_turn(new_state(), 4, llm, events=EventBus())
+    assert state["voted_to_leave"] == [3]
+    assert [(r["phase"], r["attempt"]) for r in telemetry.records] == [("speech", 0), ("vote", 0), ("vote", 1)]
+    assert telemetry.summary()["retries"] == 1
+    
+    llm = FakeListChatModel(responses=["I'm a villeger.", "Not sure.", "Still not sure."])
+    state = run_player_turn(new_state(), 4, llm, events=EventBus())
+    assert state["voted_to_leave"] == []
+    assert PARSE_STATS.since(before) == {"vote_valid": 1, "vote_invalid": 3, "vote_reasked": 2}
+
+
+def test_game_core_tracks_teams():
+    """Test the bitmask game core against the state lists."""
+    from game import core as core_module
+    from game.core import GameCore
+    
+    state = {"alive_players": [1, 2, 3, 4, 5, 6], "dead_players": []}
+    core = GameCore.from_state(state)
+    assert (core.wolves, core.villagers, core.winner()) == (2, 4, None)
+    
+    assert core.eliminate(1) and not core.eliminate(1)
+    assert core.eliminate(3)
+    assert (core.wolves, core.villagers, core.winner()) == (1, 3, None)
+    assert core.next_alive(1) == 2 and core.next_alive(2) == 4 and core.next_alive(6) == 2
+    
+    core.to_state(state)
+    assert state == {"alive_players": [2, 4, 5, 6], "dead_players": [1, 3]}
+    assert GameCore.from_state(state).is_dead(3)
+    
+    # Cores are built fresh from the lists they are given
+    assert GameCore.from_state(state) is not GameCore.from_state(state)
+    assert core_module._popcount(0b101101) == bin(0b101101).count("1") == 4
+    
+    # Routing reads the alive mask without building a core
+    alive = core_module.players_mask([2, 4, 5])
+    assert core_module.next_player(alive, 5) == 2 and core_module.round_ends(alive, 5)
+    assert core_module.DEFAULT_TEAM_TABLE.winner(alive) is None
+    
+    core.eliminate(4)
+    core.eliminate(5)
+    assert core.winner() == "wolves"
+    core.eliminate(2)
+    assert core.winner() == "villagers"
+
+
+def test_roles_and_teammates_scale_with_table_size():
+    """Test generated role tables and the wolves' teammate text."""
+    from game.state import make_roles
+    from game.prompts import teammates_info
+    
+    assert make_roles(6, 2) == ROLES
+    roles = make_roles(20, 3)
+    assert len(roles) == 20 and [p for p, role in roles.items() if role == "wolf"] == [1, 2, 3]
+    assert teammates_info(2, roles).startswith("players 1 and 3 are wolves too")
+    assert teammates_info(1, ROLES).startswith("player 2 is a wolf too")
+    with pytest.raises(ValueError):
+        make_roles(4, 2)
+    
+    from game.graph import default_recursion_limit
+    assert default_recursion_limit() == 2000
+    assert default_recursion_limit(make_roles(100, 20)) == 101 * 401
+    assert default_recursion_limit(make_roles(100, 20), rounds=30) == 101 * 31
+
+
+def test_turn_order_wraps_rounds_for_any_table():
+    """Test that every alive player speaks once per round, in seat order."""
+    from game.state import make_roles
+    from game.simulate import create_initial_state
+    
+    state = create_initial_state(make_roles(25, 5))
+    state["alive_players"].remove(25)
+    state["dead_players"].append(25)
+    events = EventBus()
+    god(state, events=events)
+    
+    spoken = []
+    while True:
+        player = int(next_node(state, events=events).split("_")[1])
+        spoken.append(player)
+        state["turn"] = player
+        god(state, events=events)
+        if state["turn"] == 0:
+            break
+    assert spoken == list(range(1, 25))
+    assert state["current_iter"] == 2
+    
+    app = create_game_graph(FakeWerewolfLLM(seed=3), events=EventBus(), roles=make_roles(12, 3))
+    result = app.invoke(create_initial_state(make_roles(12, 3)), config={"recursion_limit": 3000})
+    assert next_node(result, events=EventBus()) == "to_end"
+
+
+class FlakyLLM(FakeWerewolfLLM):
+    """Offline model whose provider fails after a number of calls."""
+    fail_after: int = 10 ** 9
+    calls: int = 0
+    
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        self.calls += 1
+        if self.calls > self.fail_after:
+            raise RuntimeError("provider error")
+        return super()._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+
+def test_crashed_game_resumes_without_repeating_calls(tmp_path):
+    """Test that a game resumes from its last saved step after a provider error."""
+    from game.checkpoint import SQLiteCheckpointer
+    from game.simulate import create_initial_state
+    
+    path = str(tmp_path / "games.sqlite")
+    config = {"recursion_limit": 500, "configurable": {"thread_id": "g1"}}
+    app = create_game_graph(FlakyLLM(seed=4, fail_after=15), events=EventBus(),
+                            checkpointer=SQLiteCheckpointer(path))
+    with pytest.raises(RuntimeError):
+        app.invoke(create_initial_state(), config=config, durability="sync")
+    
+    checkpointer = SQLiteCheckpointer(path)
+    saved = checkpointer.latest_state("g1")
+    speech = re.compile(r"player \d+: ")
+    spoken = [entry for entry in saved["history"] if speech.match(entry)]
+    assert len(spoken) == 7
+    
+    llm = FlakyLLM(seed=4)
+    result = create_game_graph(llm, events=EventBus(), checkpointer=checkpointer).invoke(None, config=config)
+    assert result["history"][:len(saved["history"])] == saved["history"]
+    assert next_node(result, events=EventBus()) == "to_end"
+    # One speech and one vote per new turn; the 7 saved turns are not replayed
+    new_turns = sum(bool(speech.match(entry)) for entry in result["history"]) - len(spoken)
+    assert llm.calls == 2 * new_turns
+    
+    # Round mode saves only round boundaries and the end of the game
+    rounds = SQLiteCheckpointer(":memory:", every="round")
+    app = create_game_graph(FakeWerewolfLLM(seed=4), events=EventBus(), checkpointer=rounds)
+    final = app.invoke(create_initial_state(), config={"recursion_limit": 500, "configurable": {"thread_id": "g2"}})
+    states = [c.checkpoint["channel_values"] for c in rounds.list({"configurable": {"thread_id": "g2"}})]
+    assert all(s.get("turn") == 0 or game_winner(s) for s in states if "turn" in s)
+    # Each saved checkpoint points at the previous saved one, and no
+    # skipped checkpoint is kept around once the game is over
+    saved = list(rounds.list({"configurable": {"thread_id": "g2"}}))
+    assert [c.parent_config["configurable"]["checkpoint_id"] for c in saved[:-1]] == \
+        [c.config["configurable"]["checkpoint_id"] for c in saved[1:]]
+    assert saved[-1].parent_config is None and not rounds._skipped
+    assert rounds.latest_state("g2")["history"] == final["history"]
+    
+    # The live runner saves after every turn and resumes by game id
+    from game.streamlit_game import StreamlitGameRunner
+    runner = StreamlitGameRunner(FakeWerewolfLLM(seed=1), events=EventBus(), pacing="turbo",
+                                 checkpointer=checkpointer)
+    runner.state = create_initial_state()
+    runner.run_player_turn_with_updates(1)
+    resumed = StreamlitGameRunner(FakeWerewolfLLM(seed=1), events=EventBus(), pacing="turbo",
+                                  checkpointer=checkpointer)
+    assert resumed.resume(runner.game_id)["history"] == runner.state["history"]
+    assert resumed.resume("missing") is None
+
+
+def test_runner_games_resume_on_the_graph():
+    """Test that a game saved by the live runner continues on the graph from its newest state."""
+    from game.checkpoint import SQLiteCheckpointer
+    from game.simulate import create_initial_state
+    from game.streamlit_game import StreamlitGameRunner
+    
+    checkpointer = SQLiteCheckpointer(":memory:")
+    config = {"recursion_limit": 500, "configurable": {"thread_id": "live1"}}
+    
+    # Crash a graph game, then let the runner play a turn of it
+    app = create_game_graph(FlakyLLM(seed=4, fail_after=5), events=EventBus(), checkpointer=checkpointer)
+    with pytest.raises(RuntimeError):
+        app.invoke(create_initial_state(), config=config, durability="sync")
+    runner = StreamlitGameRunner(FakeWerewolfLLM(seed=1), events=EventBus(), pacing="turbo",
+                                 checkpointer=checkpointer)
+    runner.resume("live1")
+    runner.run_player_turn_with_updates(runner.state["turn"] + 1)
+    
+    # The runner's state is newer than the graph checkpoints, so it is the
+    # input and the checkpoints are dropped
+    played = list(runner.state["history"])
+    assert checkpointer.latest_state("live1")["history"] == played
+    state = checkpointer.resume_input("live1")
+    assert state["history"] == played
+    assert checkpointer.get_tuple(config) is None
+    
+    app = create_game_graph(FakeWerewolfLLM(seed=4), events=EventBus(), checkpointer=checkpointer)
+    result = app.invoke(state, config=config, durability="sync")
+    assert result["history"][:len(played)] == played
+    assert next_node(result, events=EventBus()) == "to_end"
+    
+    # Now the graph checkpoint is the newest save: resume with no input
+    assert checkpointer.resume_input("live1") is None
+    assert checkpointer.latest_state("live1")["history"] == result["history"]
+
+
+def test_branches_share_the_transcript_prefix(tmp_path):
+    """Test that games forked at a round share their history and run side by side."""
+    from game.branching import Branch, SharedHistory, compare_branches, fork_state, run_branches, state_at_round
+    from game.checkpoint import SQLiteCheckpointer
+    from game.simulate import create_initial_state
+    
+    checkpointer = SQLiteCheckpointer(str(tmp_path / "games.sqlite"))
+    config = {"recursion_limit": 500, "configurable": {"thread_id": "g1"}}
+    create_game_graph(FakeWerewolfLLM(seed=3), events=EventBus(), checkpointer=checkpointer).invoke(
+        create_initial_state(), config=config)
+    state = state_at_round(checkpointer, "g1", 2)
+    assert state["current_iter"] == 2 and state["turn"] == 0
+    assert state_at_round(checkpointer, "g1", 99) is None
+    
+    # A fork stores only its own entries and never changes the parent
+    prefix = list(state["history"])
+    forked = fork_state(state)
+    forked["history"].append("player 1: hello")
+    assert state["history"] == prefix
+    assert forked["history"] == prefix + ["player 1: hello"]
+    assert forked["history"][-2:] == prefix[-1:] + ["player 1: hello"]
+    assert forked["history"].suffix == ["player 1: hello"]
+    with pytest.raises(TypeError):
+        forked["history"][0] = "rewritten"
+    nested = fork_state(forked)
+    nested["history"].append("player 2: hi")
+    assert nested["history"][-2:] == ["player 1: hello", "player 2: hi"] and len(forked["history"]) == len(prefix) + 1
+    
+    branches = [Branch("strict", FakeWerewolfLLM(seed=1), vote_threshold=0.99),
+                Branch("default", FakeWerewolfLLM(seed=1)),
+                Branch("single call", FakeWerewolfLLM(seed=2), settings={"single_call": True})]
+    results = run_branches(state, branches, recursion_limit=300)
+    assert [r["name"] for r in results] == ["strict", "default", "single call"]
+    for r in results:
+        assert isinstance(r["state"]["history"], SharedHistory)
+        assert r["state"]["history"][:len(prefix)] == prefix
+        assert r["new_messages"] == len(r["state"]["history"]) - len(prefix)
+    # Nobody reaches 99% agreement, so the strict branch never eliminates anyone
+    assert results[0]["eliminations"] == [] and results[0]["error"] == "recursion_limit"
+    assert results[1]["winner"] in ("villagers", "wolves")
+    rows = compare_branches(results)
+    assert rows[0][:2] == ("branch", "winner") and len(rows) == 4
+    assert state["history"] == prefix
+    
+    # The summary a HistoryContext trims in place is copied, not shared
+    from game.context import HistoryContext
+    state["history_summary"] = ["God: round 1 summary", "God: round 2 summary"]
+    forked = fork_state(state)
+    del forked["history_summary"][:1]
+    assert state["history_summary"] == ["God: round 1 summary", "God: round 2 summary"]
+    summarized = run_branches(state, [Branch("summarized", FakeWerewolfLLM(seed=1), settings={
+        "context": HistoryContext(keep_last=2, token_budget=200)})], recursion_limit=300)[0]
+    assert summarized["error"] in (None, "recursion_limit") and summarized["state"]["history_summary"]
+    assert state["history_summary"] == ["God: round 1 summary", "God: round 2 summary"]
+
+
+def test_god_runs_once_per_round():
+    """Test that players hand over directly and the game matches a god-after-every-turn loop."""
+    from game.players import create_player_functions
+    from game.simulate import create_initial_state
+    
+    quiet = EventBus()
+    app = create_game_graph(FakeWerewolfLLM(seed=3), events=quiet)
+    steps, final = [], None
+    for mode, chunk in app.stream(create_initial_state(), config={"recursion_limit": 500},
+                                  stream_mode=["updates", "values"]):
+        if mode == "updates":
+            steps.extend(chunk)
+        else:
+            final = chunk
+    speeches = sum(bool(re.match(r"player \d+: ", entry)) for entry in final["history"])
+    assert steps.count("god") == final["current_iter"]
+    assert len(steps) == speeches + final["current_iter"]
+    
+    # Same game when god is consulted after every turn
+    players = create_player_functions(FakeWerewolfLLM(seed=3), events=quiet)
+    state = create_initial_state()
+    while (route := next_node(god(state, events=quiet), events=quiet)) != "to_end":
+        state = players[f"player_{route[3:]}"](state)
+    assert state["history"] == final["history"]
+    assert state["dead_players"] == final["dead_players"]
+
+
+def test_nodes_return_only_their_changes():
+    """Test that graph nodes return deltas and never change the states they are given."""
+    from game.simulate import create_initial_state
+    from game.state import add_entries
+    from game.updates import as_node
+    
+    initial = create_initial_state()
+    app = create_game_graph(FakeWerewolfLLM(seed=3), events=EventBus())
+    updates = [update for chunk in app.stream(initial, config={"recursion_limit": 500}, stream_mode="updates")
+               for update in chunk.values()]
+    assert initial["history"] == [] and initial["alive_players"] == sorted(ROLES)
+    assert all(len(update.get("history", [])) <= 2 for update in updates)
+    speeches = [update for update in updates if "current_iter" not in update]
+    assert speeches and all(set(update) <= {"turn", "history", "voted_to_leave"} for update in speeches)
+    
+    # A node adds its entries to a new list
+    history = ["God: round 1"]
+    assert add_entries(history, ["player 1: hi"]) == ["God: round 1", "player 1: hi"]
+    assert history == ["God: round 1"]
+    
+    state = dict(initial, history=list(history), turn=6, voted_to_leave=[3, 3, 3, 5])
+    update = as_node(lambda s: god(s, events=EventBus()))(state)
+    assert update["voted_to_leave"] == [] and update["dead_players"] == [3]
+    assert update["history"][0].startswith("player 3 leaves") and len(update["history"]) == 2
+    assert "roles" not in update and "max_iter" not in update
+    assert state["history"] == history and state["voted_to_leave"] == [3, 3, 3, 5]
+
+
+def test_budget_governor_ends_games_cleanly():
+    """Test that round and token caps end a game with a budget_exhausted outcome and a usage report."""
+    from game.budget import Budget, BudgetGovernor
+    from game.simulate import create_initial_state
+    
+    log = RingBufferSink()
+    app = create_game_graph(FakeWerewolfLLM(seed=3), events=EventBus([log]))
+    governor = BudgetGovernor(Budget(rounds=2))
+    final = app.invoke(create_initial_state(), config=governor.attach({"recursion_limit": 500}))
+    assert final["outcome"] == "budget_exhausted" and game_winner(final) is None
+    assert final["usage"]["exhausted"] == "rounds" and final["usage"]["rounds"] == 2
+    assert [e.kind for e in log.events][-1] == "BudgetExhausted"
+    assert not any(e.kind == "GameEnd" for e in log.events)
+    
+    # The token cap is checked between turns, so at most one turn overshoots it
+    governor = BudgetGovernor(Budget(tokens=10_000))
+    final = create_game_graph(FakeWerewolfLLM(seed=3), events=EventBus()).invoke(
+        create_initial_state(), config=governor.attach({"recursion_limit": 500}))
+    usage = final["usage"]
+    assert usage["exhausted"] == "tokens" and usage["calls"] > 0
+    per_call = usage["tokens"] / usage["calls"]
+    # A turn is a speech and a vote call; allow for calls larger than average
+    assert 10_000 <= usage["tokens"] < 10_000 + 4 * per_call
+    assert usage["cost"] > 0 and usage["limits"]["tokens"] == 10_000
+    
+    # Simulations count games stopped by their budget; without one games
+    # end only when a team wins
+    summary = simulate(4, budget=Budget(rounds=1))
+    assert summary["budget_exhausted"] == 4 and summary["finished"] == 0
+    assert summary["usage"]["tokens"]["max"] >= summary["usage"]["tokens"]["mean"] > 0
+    assert simulate(2)["budget_exhausted"] == 0
+
+
 if __name__ == "__main__":
-    pytest.main([__file__]) 
\ No newline at end of file
+    pytest.main([__file__]) 